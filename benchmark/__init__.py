@@ -0,0 +1,68 @@
+"""
+Benchmarks for the Noodles data model and GUI. Each module in this package
+can be run as a script, for example:
+
+    python -m benchmark.compact
+
+The helpers in this module do the timing and memory bookkeeping.
+"""
+
+import time
+import tracemalloc
+
+
+def timed(f, *args, **kwargs):
+    """
+    Call `f` and measure the wall time.
+
+    Returns: (result, seconds)
+    """
+    t0 = time.perf_counter()
+    result = f(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def allocated(f, *args, **kwargs):
+    """
+    Call `f` and measure the memory that is still allocated by the
+    result once `f` returns.
+
+    Returns: (result, bytes)
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = f(*args, **kwargs)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+def peak(f, *args, **kwargs):
+    """
+    Call `f` and measure the most memory that was allocated at any time
+    during the call, in any thread.
+
+    Returns: (result, bytes)
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = f(*args, **kwargs)
+        top = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, top - before
+
+
+def print_table(header, rows):
+    """
+    Print rows of values in aligned columns.
+    """
+    rows = [[str(c) for c in r] for r in rows]
+    widths = [max(len(str(h)), *(len(r[k]) for r in rows))
+              for k, h in enumerate(header)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(header, widths)))
+    for r in rows:
+        print("  ".join(c.rjust(w) for c, w in zip(r, widths)))
@@ -0,0 +1,44 @@
+"""
+Building a model with `DataModel.extend` against one `add_node` and
+`add_link` call per node and link.
+
+    python -m benchmark.bulk [n_nodes ...]
+"""
+
+import sys
+
+from data.model import DataModel
+import data.bulk  # don't count importing NumPy
+
+from . import timed, print_table
+from .generate import links
+
+
+def per_call(nodes, edges):
+    model = DataModel()
+    for node in nodes:
+        model.add_node(node)
+    for a, b in edges:
+        model.add_link(a, b)
+    return model
+
+
+def bulk(nodes, edges):
+    model = DataModel()
+    model.extend(nodes, edges)
+    return model
+
+
+def run(n, shape='random_dag'):
+    nodes, edges = links(shape, n)
+    a, t_call = timed(per_call, nodes, edges)
+    b, t_bulk = timed(bulk, nodes, edges)
+    assert sorted(a.all_links()) == sorted(b.all_links())
+    return [shape, n, len(edges), "{0:.3f}".format(t_call),
+            "{0:.3f}".format(t_bulk), "{0:.1f}".format(t_call / t_bulk)]
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000]
+    print_table(["shape", "nodes", "links", "per call (s)", "extend (s)", "speed-up"],
+                [run(n) for n in sizes])
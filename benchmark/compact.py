@@ -0,0 +1,75 @@
+"""
+Compare the dict-of-sets `DataModel` with the array-backed
+`CompactDataModel`, in memory per graph and time per operation.
+
+    python -m benchmark.compact [n_nodes ...]
+"""
+
+import sys
+
+from data.model import DataModel
+from data.compact import CompactDataModel
+from testing.adder import AdderNode
+
+from . import timed, allocated, print_table
+
+
+def build(cls, n):
+    """
+    A binary tree of adders: node `k` feeds into node `(k - 1) // 2`, so
+    every node except the root has one outgoing link.
+    """
+    model = cls()
+    for k in range(n):
+        model.add_node(AdderNode.new())
+    for k in range(1, n):
+        model.add_link((k, "sum"), ((k - 1) // 2, "value-{0}".format(2 - k % 2)))
+    if hasattr(model, 'flush'):
+        model.flush()
+    return model
+
+
+def scan(model):
+    return sum(1 for _ in model.all_links())
+
+
+def query(model, n):
+    for k in range(n):
+        model.links_to((k, "value-1"))
+
+
+def churn(model, n):
+    for k in range(1, n, 10):
+        b = ((k - 1) // 2, "value-{0}".format(2 - k % 2))
+        model.delete_link((k, "sum"), b)
+        model.add_link((k, "sum"), b)
+
+
+def delete(model, n):
+    for k in range(0, n, 10):
+        model.delete_node(k)
+
+
+def run(n):
+    rows = []
+    for cls in (DataModel, CompactDataModel):
+        model, memory = allocated(build, cls, n)
+        _, t_build = timed(build, cls, n)
+        _, t_scan = timed(scan, model)
+        _, t_query = timed(query, model, n)
+        _, t_churn = timed(churn, model, n)
+        _, t_delete = timed(delete, model, n)
+        rows.append([cls.__name__, n, "{0:.1f}".format(memory / 2**20),
+                     "{0:.4f}".format(t_build), "{0:.4f}".format(t_scan),
+                     "{0:.4f}".format(t_query), "{0:.4f}".format(t_churn),
+                     "{0:.4f}".format(t_delete)])
+    return rows
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000]
+    rows = []
+    for n in sizes:
+        rows.extend(run(n))
+    print_table(["model", "nodes", "MiB", "build", "all_links",
+                 "links_to", "churn", "delete"], rows)
@@ -0,0 +1,68 @@
+"""
+Compiled against interpreted execution, on chains and fans of `AdderNode`s
+from `testing.adder`, which are so cheap that running them is all overhead.
+Shows the time to compile, to take the compiled function from the cache,
+to run it, and to run the same workflow with the `Executor`.
+
+    python -m benchmark.compiler [n_nodes ...]
+"""
+
+import sys
+
+from data.model import DataModel
+from engine.compiler import compile_model, CompileCache
+from engine.executor import Executor
+from testing.adder import AdderNode
+
+from . import timed, print_table
+
+
+def adders(shape, n):
+    """
+    A chain, where every adder adds one to the sum of the previous, or a
+    fan, where every adder adds one to the sum of the first.
+    """
+    nodes = []
+    for k in range(n):
+        node = AdderNode.new()
+        node.location = [k % 100 * 250, k // 100 * 150]
+        node.values = {"value-1": 1, "value-2": 1}
+        nodes.append(node)
+
+    if shape == 'chain':
+        links = [((k, "sum"), (k + 1, "value-1")) for k in range(n - 1)]
+    else:
+        links = [((0, "sum"), (k, "value-1")) for k in range(1, n)]
+
+    model = DataModel()
+    model.extend(nodes, links)
+    return model
+
+
+def run(shape, n):
+    model = adders(shape, n)
+    result, t_executor = timed(Executor(model).run)
+
+    cache = CompileCache()
+    f, t_compile = timed(compile_model, model, cache=cache)
+    g, t_cached = timed(compile_model, model, cache=cache)
+    assert g is f
+    values, t_call = timed(f)
+    assert all(result.values[b] == v for b, v in values.items())
+
+    # with only an input of the last node as a parameter, the nodes it
+    # doesn't depend on are folded
+    h, t_folding = timed(compile_model, model, inputs=[(n - 1, "value-2")], cache=cache)
+    _, t_folded = timed(h)
+
+    return [shape, n, "{0:.3f}".format(t_executor), "{0:.3f}".format(t_compile),
+            "{0:.4f}".format(t_cached), "{0:.4f}".format(t_call),
+            "{0:.0f}x".format(t_executor / t_call), len(h.folded),
+            "{0:.4f}".format(t_folded)]
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000]
+    print_table(["shape", "nodes", "executor (s)", "compile (s)", "cached (s)",
+                 "compiled (s)", "speed-up", "folded", "folded run (s)"],
+                [run(shape, n) for n in sizes for shape in ('chain', 'fan')])
@@ -0,0 +1,38 @@
+"""
+Composite nodes. Collapses the first `k` nodes of a chain into one
+composite node and expands it again, in workflows of different sizes: the
+time should follow `k`, not the size of the workflow. Also runs
+the workflow with the part collapsed, where the executor submits one task
+for the whole part instead of one per node.
+
+    python -m benchmark.composite [n_nodes ...]
+"""
+
+import sys
+
+from data.composite import collapse, expand
+from engine.executor import Executor
+
+from . import timed, print_table
+from .generate import generate
+
+
+def run(n, k):
+    model = generate('chain', n)
+    _, t_plain = timed(Executor(model).run)
+
+    c, t_collapse = timed(collapse, model, range(k))
+    table, t_expand = timed(expand, model, c)
+
+    collapse(model, table.values())
+    _, t_composite = timed(Executor(model).run)
+
+    return [n, k, "{0:.2f}".format(t_collapse * 1e3), "{0:.2f}".format(t_expand * 1e3),
+            "{0:.3f}".format(t_plain), "{0:.3f}".format(t_composite)]
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000]
+    print_table(["nodes", "collapsed", "collapse (ms)", "expand (ms)",
+                 "run (s)", "run collapsed (s)"],
+                [run(n, k) for n in sizes for k in (100, 1000, 5000)])
@@ -0,0 +1,82 @@
+"""
+Distributed execution on local worker processes. A workflow of parallel
+chains, each a `Payload` array passed through some `Scale` nodes and then
+reduced, runs with and without locality hints; with them, a chain should
+stay on one worker and move no bytes. Then a worker is killed halfway
+through a run, to show what is retried and what recovering costs.
+
+    python -m benchmark.distributed [megabytes ...]
+"""
+
+import sys
+import threading
+
+from data.model import NodeTemplate, SimpleNode, DataModel
+from engine.executor import Executor
+from engine.distributed import LocalCluster
+
+from .transport import Payload, Reduce
+from . import timed, print_table
+
+WORKERS = 4
+CHAINS = 8
+STAGES = 6
+
+
+class Scale(NodeTemplate):
+    name = "Scale"
+    input_vars = ["data"]
+    output_vars = ["data"]
+
+    @staticmethod
+    def compute(inputs):
+        return {"data": inputs["data"] * 2}
+
+
+def chains(nbytes, n=CHAINS, stages=STAGES):
+    nodes, links = [], []
+    for c in range(n):
+        source = SimpleNode(Payload)
+        source.values = {"nbytes": nbytes}
+        nodes.append(source)
+        for k in range(stages):
+            nodes.append(SimpleNode(Scale))
+            links.append(((len(nodes) - 2, "data"), (len(nodes) - 1, "data")))
+        nodes.append(SimpleNode(Reduce))
+        links.append(((len(nodes) - 2, "data"), (len(nodes) - 1, "data")))
+
+    model = DataModel()
+    model.extend(nodes, links)
+    return model
+
+
+def run(megabytes):
+    model = chains(megabytes * 2**20)
+    everything = Executor(model).run().values
+    expected = dict((k, v) for k, v in everything.items() if k[1] == "total")
+    row = [megabytes]
+    times = {}
+
+    for locality in (True, False):
+        with LocalCluster(WORKERS, locality=locality) as cluster:
+            cluster.run(model)      # warm up the workers
+            result, t = timed(cluster.run, model)
+        assert result.values == expected
+        row += ["{0:.3f}".format(t), result.fetched // 2**20]
+        times[locality] = t
+
+    with LocalCluster(WORKERS) as cluster:
+        cluster.run(model)
+        # worker-0 holds some of the chains by now
+        threading.Timer(times[True] / 2, cluster.kill, args=("worker-0",)).start()
+        result, t_lost = timed(cluster.run, model)
+    assert result.values == expected
+    row += ["{0:.3f}".format(t_lost), len(result.retries)]
+    return row
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1, 16]
+    print_table(["MB per array", "locality (s)", "moved (MB)", "round robin (s)",
+                 "moved (MB)", "worker killed (s)", "nodes retried"],
+                [run(mb) for mb in sizes])
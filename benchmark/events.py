@@ -0,0 +1,56 @@
+"""
+Coalescing of model edits by a `ChangeBus`. A scripted bulk edit adds
+links in one frame; the subscriber, standing in for the scene, should be
+called once, however many links are added. Also shows what the bus costs
+per edit.
+
+    python -m benchmark.events [n_links ...]
+"""
+
+import sys
+import random
+
+from data.events import ChangeBus
+
+from . import timed, print_table
+from .generate import generate
+
+
+def _bulk_edit(model, n, seed=0):
+    rng = random.Random(seed)
+    ids = list(model._nodes)
+    for _ in range(n):
+        i, j = rng.choice(ids), rng.choice(ids)
+        model.add_link((i, "x"), (j, "b"))
+
+
+def run(n, frames=1, n_nodes=10000):
+    """
+    Add `n` links, spread over `frames` frames, with and without a bus.
+    """
+    model = generate('random_dag', n_nodes)
+    _, t_plain = timed(_bulk_edit, model, n)
+
+    model = generate('random_dag', n_nodes)
+    bus = ChangeBus(model)
+    updates = []
+    bus.subscribe(updates.append)
+
+    def edit():
+        per_frame = n // frames
+        for k in range(frames):
+            _bulk_edit(model, per_frame, seed=k)
+            bus.flush()
+
+    _, t_bus = timed(edit)
+    stats = bus.stats()
+    return [n, frames, sum(stats['events'].values()), len(updates),
+            sum(stats['delivered'].values()), "{0:.1f}".format(stats['ratio']),
+            "{0:.3f}".format(t_plain), "{0:.3f}".format(t_bus)]
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [50000]
+    print_table(["links", "frames", "events", "updates", "delivered", "ratio",
+                 "no bus (s)", "bus (s)"],
+                [run(n, frames) for n in sizes for frames in (1, 10, 100)])
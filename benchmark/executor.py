@@ -0,0 +1,57 @@
+"""
+Throughput of the executor on a wide DAG: one source fanning out to many
+CPU-bound nodes, collected by a single sink. With a process pool, the wall
+time should go down with the number of workers.
+
+    python -m benchmark.executor [width]
+"""
+
+import os
+import sys
+
+from data.model import NodeTemplate, SimpleNode, DataModel
+from engine.executor import Executor
+
+from . import print_table
+
+
+class SpinNode(NodeTemplate):
+    name = "Spin"
+    input_vars = ["x"]
+    output_vars = ["y"]
+
+    @staticmethod
+    def compute(inputs):
+        x = inputs["x"]
+        if isinstance(x, list):
+            return {"y": sum(x)}
+        for k in range(200000):
+            x = (x * 31 + k) % 1000003
+        return {"y": x}
+
+
+def wide_dag(width):
+    model = DataModel()
+    source = model.add_node(SimpleNode(SpinNode))
+    model._nodes[source].values["x"] = 1
+    sink = model.add_node(SimpleNode(SpinNode))
+    for k in range(width):
+        i = model.add_node(SimpleNode(SpinNode))
+        model.add_link((source, "y"), (i, "x"))
+        model.add_link((i, "y"), (sink, "x"))
+    return model
+
+
+if __name__ == '__main__':
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    model = wide_dag(width)
+    rows = []
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        result = Executor(model, workers=workers, pool='process').run()
+        path, cost = result.critical_path()
+        rows.append([workers, "{0:.3f}".format(result.elapsed),
+                     "{0:.1f}".format(width / result.elapsed),
+                     "{0:.3f}".format(cost)])
+        workers *= 2
+    print_table(["workers", "seconds", "nodes/s", "critical path"], rows)
@@ -0,0 +1,88 @@
+"""
+Synthetic workflows of a configurable shape and size, built from a
+`NodeTemplate` through the public `DataModel` interface. Nodes are put on a
+grid, so that the workflows can also be shown in a scene.
+
+    model = generate('random_dag', 10000, seed=1)
+"""
+
+import random
+
+from data.model import NodeTemplate, SimpleNode, DataModel
+
+
+class SyntheticNode(NodeTemplate):
+    name = "Synthetic"
+    input_vars = ["a", "b"]
+    output_vars = ["x"]
+
+    @staticmethod
+    def compute(inputs):
+        total = 0
+        for v in inputs.values():
+            total += sum(v) if isinstance(v, list) else v
+        return {"x": total}
+
+
+def _nodes(model, n, template, columns=100):
+    for k in range(n):
+        node = SimpleNode(template)
+        node.location = [k % columns * 250, k // columns * 150]
+        node.values = {"a": 1, "b": 1}
+        model.add_node(node)
+
+
+def chain(n, template=SyntheticNode, model=None):
+    """
+    Every node feeds the next one.
+    """
+    model = model if model is not None else DataModel()
+    _nodes(model, n, template)
+    for k in range(1, n):
+        model.add_link((k - 1, "x"), (k, "a"))
+    return model
+
+
+def fan(n, template=SyntheticNode, model=None):
+    """
+    One source feeding all other nodes, which are collected by a sink.
+    """
+    model = model if model is not None else DataModel()
+    _nodes(model, n, template)
+    for k in range(1, n - 1):
+        model.add_link((0, "x"), (k, "a"))
+        model.add_link((k, "x"), (n - 1, "b"))
+    return model
+
+
+def random_dag(n, template=SyntheticNode, model=None, p=0.8, window=50, seed=0):
+    """
+    Every input is linked with probability `p` to the output of one of the
+    `window` nodes before it.
+    """
+    rng = random.Random(seed)
+    model = model if model is not None else DataModel()
+    _nodes(model, n, template)
+    for k in range(1, n):
+        for m in template.input_vars:
+            if rng.random() < p:
+                model.add_link((rng.randrange(max(0, k - window), k), "x"), (k, m))
+    return model
+
+
+SHAPES = {'chain': chain, 'fan': fan, 'random_dag': random_dag}
+
+
+def generate(shape, n, **kwargs):
+    return SHAPES[shape](n, **kwargs)
+
+
+def links(shape, n, **kwargs):
+    """
+    The nodes and links of a workflow as lists, without building a model;
+    handy for timing the construction itself.
+
+    Returns: (list of nodes, list of links)
+    """
+    model = generate(shape, n, **kwargs)
+    return [node for _, node in sorted(model.all_nodes())], list(model.all_links())
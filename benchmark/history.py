@@ -0,0 +1,90 @@
+"""
+Snapshots and undo/redo against copying the model, and the memory a
+`History` keeps per step, for each kind of edit.
+
+    python -m benchmark.history [n_nodes ...]
+"""
+
+import sys
+import copy
+import random
+
+from data.model import SimpleNode
+from data.history import History
+
+from . import timed, print_table
+from .generate import SyntheticNode, generate
+
+EDITS = 1000
+
+
+def _edits(model, rng):
+    """
+    One function per kind of edit, each doing a single random edit.
+    """
+    def add_node():
+        node = SimpleNode(SyntheticNode)
+        node.location = [rng.randrange(10000), rng.randrange(10000)]
+        model.add_node(node)
+
+    def add_link():
+        i, j = _pick(), _pick()
+        model.add_link((i, "x"), (j, "b"))
+
+    def delete_link():
+        a = (_pick(), "x")
+        for b in list(model._links[a])[:1]:
+            model.delete_link(a, b)
+
+    def move_node():
+        model.move_node(_pick(), [rng.randrange(10000), rng.randrange(10000)])
+
+    def set_value():
+        model.set_value((_pick(), "a"), rng.random())
+
+    def delete_node():
+        model.delete_node(_pick())
+
+    ids = list(model._nodes)
+
+    def _pick():
+        while True:
+            i = rng.choice(ids)
+            if i in model._nodes:
+                return i
+
+    return [add_node, add_link, delete_link, move_node, set_value, delete_node]
+
+
+def snapshot(n):
+    model = generate('random_dag', n)
+    _, t_copy = timed(copy.deepcopy, model)
+    _, t_snapshot = timed(model.snapshot)
+    return [n, "{0:.3f}".format(t_copy), "{0:.6f}".format(t_snapshot)]
+
+
+def steps(n, seed=0):
+    model = generate('random_dag', n)
+    rng = random.Random(seed)
+    rows = []
+    for edit in _edits(model, rng):
+        history = History(model, limit=EDITS)
+        _, t_edit = timed(lambda: [edit() for _ in range(EDITS)])
+        size = history.nbytes()
+        _, t_undo = timed(lambda: [history.undo() for _ in range(EDITS)])
+        _, t_redo = timed(lambda: [history.redo() for _ in range(EDITS)])
+        history.detach()
+        rows.append([edit.__name__, n,
+                     "{0:.1f}".format(t_edit / EDITS * 1e6),
+                     "{0:.1f}".format(t_undo / EDITS * 1e6),
+                     "{0:.1f}".format(t_redo / EDITS * 1e6),
+                     size // EDITS])
+    return rows
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000]
+    print_table(["nodes", "deepcopy (s)", "snapshot (s)"], [snapshot(n) for n in sizes])
+    print()
+    print_table(["edit", "nodes", "edit (us)", "undo (us)", "redo (us)", "bytes/step"],
+                [r for n in sizes for r in steps(n)])
@@ -0,0 +1,66 @@
+"""
+Import time of the headless entry points. Every entry point is imported in
+a fresh interpreter, which also checks that no Qt module was imported on
+the way. Exits with an error if an entry point is over its budget or pulls
+in Qt, so this can run as a check.
+
+    python -m benchmark.imports
+"""
+
+import sys
+import json
+import subprocess
+
+from . import print_table
+
+#: budget in seconds, per entry point
+BUDGET = {
+    'data.model': 0.05,
+    'engine.cli': 0.05,
+    'engine.executor': 0.1,
+    'data.storage': 0.5,
+}
+
+GUI_MODULES = ('PySide', 'pyqode', 'qnoodles')
+
+_probe = """
+import sys, time, json
+t0 = time.perf_counter()
+import {module}
+t = time.perf_counter() - t0
+gui = sorted(m for m in sys.modules if m.split('.')[0] in {gui!r})
+print(json.dumps([t, gui]))
+"""
+
+
+def import_time(module, repeat=5):
+    """
+    Best of `repeat` imports of `module`, each in a new interpreter.
+
+    Returns: (seconds, list of GUI modules that were imported)
+    """
+    best, gui = None, []
+    for _ in range(repeat):
+        out = subprocess.check_output(
+            [sys.executable, '-c', _probe.format(module=module, gui=GUI_MODULES)])
+        t, gui = json.loads(out.decode())
+        best = t if best is None else min(best, t)
+    return best, gui
+
+
+def run():
+    rows = []
+    ok = True
+    for module, budget in sorted(BUDGET.items()):
+        t, gui = import_time(module)
+        passed = t <= budget and not gui
+        ok &= passed
+        rows.append([module, "{0:.4f}".format(t), "{0:.2f}".format(budget),
+                     ",".join(gui) or "-", "ok" if passed else "FAIL"])
+    return rows, ok
+
+
+if __name__ == '__main__':
+    rows, ok = run()
+    print_table(["module", "import (s)", "budget (s)", "gui modules", ""], rows)
+    sys.exit(0 if ok else 1)
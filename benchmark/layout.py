@@ -0,0 +1,41 @@
+"""
+Time the layered layout on chains, fans and random DAGs, and check that
+it stays within a time budget.
+
+    python -m benchmark.layout [n_nodes ...]
+"""
+
+import sys
+
+from data.layout import layered_layout, relayout
+
+from . import timed, print_table
+from .generate import chain, fan, random_dag
+
+#: seconds allowed for laying out 10k nodes
+BUDGET = 10.0
+
+
+def run(n):
+    rows = []
+    for shape in (chain, fan, random_dag):
+        model = shape(n)
+        _, t_layout = timed(layered_layout, model)
+        edited = list(range(n // 2, n // 2 + 10))
+        _, t_relayout = timed(relayout, model, edited)
+        rows.append([shape.__name__, n, "{0:.3f}".format(t_layout),
+                     "{0:.4f}".format(t_relayout)])
+    return rows
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000]
+    rows = []
+    for n in sizes:
+        rows.extend(run(n))
+    print_table(["shape", "nodes", "layout (s)", "relayout (s)"], rows)
+
+    slow = [r for r in rows if r[1] <= 10000 and float(r[2]) > BUDGET]
+    if slow:
+        print("over budget of {0} s: {1}".format(BUDGET, slow))
+        sys.exit(1)
@@ -0,0 +1,90 @@
+"""
+Frame time while dragging a node with many links. The scene is built in
+'item' mode under the offscreen Qt platform; a hub node linked to a share
+of all other nodes is moved step by step, alone and as part of a selection
+of a hundred nodes, and every step renders the view. The 'drag' column is
+the time per step reported through the scene's `frame_hook`, which leaves
+out the rendering.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmark.links [n_links]
+"""
+
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide import QtGui, QtCore
+
+from data.model import DataModel
+from testing.adder import AdderNode
+from qnoodles.qnoodles import NodeScene, NodeView
+
+from . import print_table
+
+
+def hub_model(n_links, fan=500):
+    """
+    Chains of adders, plus one hub whose output feeds `fan` other nodes.
+    """
+    model = DataModel()
+    n = n_links
+    for k in range(n + 1):
+        node = AdderNode.new()
+        node.location = [k % 100 * 250, k // 100 * 150]
+        model.add_node(node)
+    for k in range(1, n - fan):
+        model.add_link((k, "sum"), (k + 1, "value-1"))
+    for k in range(1, fan + 1):
+        model.add_link((0, "sum"), (n - k, "value-2"))
+    return model
+
+
+def drag(scene, view, nodes=(0,), steps=60):
+    """
+    Drag `nodes` (the hub by default) and render every step.
+
+    Returns: (list of frame times with rendering, list of drag frame times
+        without, as reported through the scene's `frame_hook`)
+    """
+    image = QtGui.QImage(view.viewport().size(), QtGui.QImage.Format_ARGB32)
+    times = []
+    hook = []
+    scene.frame_hook = hook.append
+    scene.selected = set(nodes)
+
+    origin = QtCore.QPointF(0, 0)
+    scene.nodeDragStarted(nodes[0], origin)
+    for k in range(steps):
+        t0 = time.perf_counter()
+        scene.nodeDragMoved(origin + QtCore.QPointF(5 * k, 3 * k))
+        painter = QtGui.QPainter(image)
+        view.render(painter)
+        painter.end()
+        times.append(time.perf_counter() - t0)
+    scene.nodeDragFinished(nodes[0])
+    scene.frame_hook = None
+    return times, hook
+
+
+if __name__ == '__main__':
+    app = QtGui.QApplication(sys.argv)
+    n_links = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    model = hub_model(n_links)
+    scene = NodeScene(model, mode='item')
+    view = NodeView(scene)
+    view.resize(1024, 768)
+
+    rows = []
+    for nodes in [(0,), tuple(range(100))]:
+        times, hook = drag(scene, view, nodes)
+        times, hook = sorted(times), sorted(hook)
+        rows.append([n_links, len(nodes),
+                     "{0:.2f}".format(hook[len(hook) // 2] * 1e3),
+                     "{0:.2f}".format(times[len(times) // 2] * 1e3),
+                     "{0:.2f}".format(times[-1] * 1e3),
+                     "{0:.0f}".format(1 / times[len(times) // 2])])
+    print_table(["links", "dragged", "drag (ms)", "median (ms)", "worst (ms)", "fps"],
+                rows)
@@ -0,0 +1,59 @@
+"""
+Startup cost of building NodeBoxes. 'before' reproduces the old behaviour,
+where every NodeBox read the stylesheet from disk and set it on itself;
+'after' relies on the application-wide stylesheet and cached metrics.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmark.nodebox [n_nodes ...]
+"""
+
+import os
+import sys
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide import QtGui
+
+from data.model import DataModel
+from testing.adder import AdderNode
+from qnoodles.qnoodles import NodeScene
+from qnoodles.nodebox import NodeBox
+from qnoodles.style import STYLE_PATH, clear_cache
+
+from . import timed, print_table
+
+
+class OldNodeBox(NodeBox):
+    def __init__(self, node, scene, index=None):
+        super(OldNodeBox, self).__init__(node, scene, index)
+        self.setStyleSheet(str(open(STYLE_PATH, "r").read()))
+
+
+def grid(n):
+    model = DataModel()
+    for k in range(n):
+        node = AdderNode.new()
+        node.location = [k % 100 * 250, k // 100 * 150]
+        model.add_node(node)
+    return model
+
+
+def build(model, cls):
+    scene = NodeScene(DataModel())
+    for i, node in model.all_nodes():
+        scene.nodes[i] = cls(node, scene, i)
+    QtGui.QApplication.processEvents()
+    return scene
+
+
+if __name__ == '__main__':
+    app = QtGui.QApplication(sys.argv)
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 500, 1000]
+    rows = []
+    for n in sizes:
+        model = grid(n)
+        _, t_before = timed(build, model, OldNodeBox)
+        clear_cache()
+        _, t_after = timed(build, model, NodeBox)
+        rows.append([n, "{0:.3f}".format(t_before), "{0:.3f}".format(t_after),
+                     "{0:.1f}".format(t_before / t_after)])
+    print_table(["nodes", "before (s)", "after (s)", "speed-up"], rows)
@@ -0,0 +1,91 @@
+"""
+Micro-benchmarks for the spatial index: building it, range queries of the
+size of a viewport, nearest-node queries and moving nodes, compared to a
+linear scan over all nodes.
+
+    python -m benchmark.spatial [n_nodes ...]
+"""
+
+import sys
+import random
+
+from data.spatial import GridIndex, rect_distance
+
+from . import timed, print_table
+
+
+def scatter(n, seed=0):
+    """
+    Rectangles of roughly the size of a node, randomly spread out over a
+    square with about one node per 400x400 pixels.
+    """
+    rng = random.Random(seed)
+    side = int(n ** 0.5) * 400
+    rects = {}
+    for i in range(n):
+        x, y = rng.randrange(side), rng.randrange(side)
+        rects[i] = (x, y, x + 200, y + 150)
+    return rects, side
+
+
+def build(rects):
+    index = GridIndex()
+    for i, r in rects.items():
+        index.insert(i, r)
+    return index
+
+
+def queries(side, n, seed=1):
+    rng = random.Random(seed)
+    return [(rng.randrange(side), rng.randrange(side)) for _ in range(n)]
+
+
+def range_index(index, points):
+    for x, y in points:
+        index.query((x, y, x + 1024, y + 768))
+
+
+def range_scan(rects, points):
+    for x, y in points:
+        x1, y1 = x + 1024, y + 768
+        [i for i, r in rects.items()
+         if r[0] <= x1 and r[2] >= x and r[1] <= y1 and r[3] >= y]
+
+
+def nearest_index(index, points):
+    for x, y in points:
+        index.nearest(x, y)
+
+
+def nearest_scan(rects, points):
+    for x, y in points:
+        min(rects, key=lambda i: rect_distance(rects[i], x, y))
+
+
+def move(index, rects, points):
+    for k, (x, y) in enumerate(points):
+        index.move(k, (x, y, x + 200, y + 150))
+
+
+def run(n, n_queries=1000, n_scans=20):
+    rects, side = scatter(n)
+    points = queries(side, n_queries)
+    index, t_build = timed(build, rects)
+    _, t_range = timed(range_index, index, points)
+    _, t_nearest = timed(nearest_index, index, points)
+    _, t_move = timed(move, index, rects, points)
+    _, t_range_scan = timed(range_scan, rects, points[:n_scans])
+    _, t_nearest_scan = timed(nearest_scan, rects, points[:n_scans])
+
+    us = lambda t, k: "{0:.1f}".format(t / k * 1e6)
+    return [n, "{0:.3f}".format(t_build),
+            us(t_range, n_queries), us(t_range_scan, n_scans),
+            us(t_nearest, n_queries), us(t_nearest_scan, n_scans),
+            us(t_move, n_queries)]
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000]
+    print_table(["nodes", "build (s)", "range (us)", "range scan (us)",
+                 "nearest (us)", "nearest scan (us)", "move (us)"],
+                [run(n) for n in sizes])
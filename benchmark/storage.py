@@ -0,0 +1,54 @@
+"""
+Round trip of a workflow through the binary format and through YAML.
+For the binary format the time to open a file and the time to touch every
+node are reported separately, since nodes are materialised lazily.
+
+    python -m benchmark.storage [n_nodes ...]
+"""
+
+import os
+import sys
+import tempfile
+
+from data.model import DataModel
+from data.storage import save, load, save_yaml, load_yaml
+
+from . import timed, print_table
+from .compact import build
+
+
+def touch(model):
+    return sum(1 for _ in model.all_nodes()) + len(model._links)
+
+
+def run(n, directory, yaml=True):
+    model = build(DataModel, n)
+    for k in range(n):
+        model.move_node(k, [k % 100 * 200, k // 100 * 150])
+
+    binary = os.path.join(directory, "model.noodles")
+    _, t_save = timed(save, model, binary)
+    loaded, t_open = timed(load, binary)
+    _, t_touch = timed(touch, loaded)
+    rows = [["binary", n, "{0:.1f}".format(os.path.getsize(binary) / 2**10),
+             "{0:.4f}".format(t_save), "{0:.6f}".format(t_open),
+             "{0:.4f}".format(t_touch)]]
+
+    if yaml:
+        text = os.path.join(directory, "model.yaml")
+        _, t_save = timed(save_yaml, model, text)
+        loaded, t_open = timed(load_yaml, text)
+        _, t_touch = timed(touch, loaded)
+        rows.append(["yaml", n, "{0:.1f}".format(os.path.getsize(text) / 2**10),
+                     "{0:.4f}".format(t_save), "{0:.6f}".format(t_open),
+                     "{0:.4f}".format(t_touch)])
+    return rows
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000]
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            rows.extend(run(n, directory))
+    print_table(["format", "nodes", "KiB", "save", "open", "touch all"], rows)
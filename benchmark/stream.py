@@ -0,0 +1,107 @@
+"""
+Streaming execution. A source emits `n` records of 1 kB, a node transforms
+every record and a sink adds up their sizes. The same pipeline is run with
+the `StreamRunner`, where peak memory should depend on the queue capacity
+only, and with the `Executor`, which passes the whole dataset as one list.
+The per-node rates show where the stream is held up.
+
+    python -m benchmark.stream [n_records ...]
+"""
+
+import sys
+
+from data.model import NodeTemplate, SimpleNode, DataModel
+from engine.executor import Executor
+from engine.stream import StreamRunner
+
+from . import timed, peak, print_table
+
+RECORD = 1024
+
+
+class Records(NodeTemplate):
+    name = "Records"
+    input_vars = ["n"]
+    output_vars = ["record"]
+
+    @staticmethod
+    def stream(items):
+        for item in items:
+            for k in range(item["n"]):
+                yield {"record": bytes(RECORD)}
+
+    @staticmethod
+    def compute(inputs):
+        return {"record": [bytes(RECORD) for k in range(inputs["n"])]}
+
+
+class Transform(NodeTemplate):
+    name = "Transform"
+    input_vars = ["record"]
+    output_vars = ["record"]
+
+    @staticmethod
+    def compute(inputs):
+        r = inputs["record"]
+        if isinstance(r, list):
+            return {"record": [x.upper() for x in r]}
+        return {"record": r.upper()}
+
+
+class Total(NodeTemplate):
+    name = "Total"
+    input_vars = ["record"]
+    output_vars = ["bytes"]
+
+    @staticmethod
+    def stream(items):
+        total = 0
+        for item in items:
+            total += len(item["record"])
+        yield {"bytes": total}
+
+    @staticmethod
+    def compute(inputs):
+        return {"bytes": sum(len(r) for r in inputs["record"])}
+
+
+def pipeline(n):
+    model = DataModel()
+    source, transform, total = (SimpleNode(t) for t in (Records, Transform, Total))
+    source.values = {"n": n}
+    model.extend([source, transform, total],
+                 [((0, "record"), (1, "record")), ((1, "record"), (2, "record"))])
+    return model
+
+
+def run(n, capacity=64):
+    totals = []
+
+    def stream():
+        runner = StreamRunner(pipeline(n), capacity,
+                              on_output=lambda i, out: totals.append(out["bytes"]))
+        return runner.run()
+
+    def batch():
+        return Executor(pipeline(n)).run()
+
+    # timed without tracing memory, which slows down the threads a lot
+    result, t_stream = timed(stream)
+    _, peak_stream = peak(stream)
+    assert totals == [n * RECORD] * 2
+
+    values, t_batch = timed(batch)
+    _, peak_batch = peak(batch)
+    assert values.values[(2, "bytes")] == n * RECORD
+
+    rates = " ".join("{0:.0f}".format(s.rate()) for _, s in sorted(result.nodes.items()))
+    depth = max(link.max_depth for link in result.links.values())
+    return [n, capacity, "{0:.3f}".format(t_stream), peak_stream // 1024, depth,
+            rates, "{0:.3f}".format(t_batch), peak_batch // 1024]
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000]
+    print_table(["records", "capacity", "stream (s)", "peak (kB)", "max depth",
+                 "items/s per node", "executor (s)", "peak (kB)"],
+                [run(n, c) for n in sizes for c in (16, 256)])
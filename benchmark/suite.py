@@ -0,0 +1,133 @@
+"""
+Headless benchmark suite. Generates workflows of several shapes and sizes,
+times the `DataModel` operations and, if PySide is available, the
+construction of a `NodeScene` on the offscreen Qt platform. The results are
+written as JSON, so that runs of different releases can be compared.
+
+    python -m benchmark.suite --sizes 1000 10000 --output results.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+
+from data.model import DataModel
+
+from . import timed
+from .generate import SHAPES, links
+
+#: NodeBox widgets are too heavy to build beyond this size
+MAX_WIDGET_NODES = 5000
+
+
+def model_operations(shape, n):
+    """
+    Time the basic operations on a `DataModel`.
+
+    Yields: (operation, count, seconds)
+    """
+    nodes, edges = links(shape, n)
+
+    model = DataModel()
+    _, t = timed(lambda: [model.add_node(node) for node in nodes])
+    yield ('add_node', len(nodes), t)
+    _, t = timed(lambda: [model.add_link(a, b) for a, b in edges])
+    yield ('add_link', len(edges), t)
+
+    _, t = timed(lambda: sum(1 for _ in model.all_links()))
+    yield ('all_links', len(edges), t)
+
+    inputs = [(i, s.name) for i, node in model.all_nodes() for s in node.input_noodlets()]
+    _, t = timed(lambda: [model.links_to(b) for b in inputs])
+    yield ('links_to', len(inputs), t)
+
+    doomed = list(range(0, n, 10))
+    _, t = timed(lambda: [model.delete_node(i) for i in doomed])
+    yield ('delete_node', len(doomed), t)
+
+    doomed = [model._nodes[i] for i in range(5, n, 10)]
+    _, t = timed(model.delete_nodes, doomed)
+    yield ('delete_nodes', len(doomed), t)
+
+    _, t = timed(model._clean_indices)
+    yield ('_clean_indices', 1, t)
+
+
+
+def scene_construction(shape, n, modes=('item', 'widget')):
+    """
+    Time building a `NodeScene` in each mode.
+
+    Yields: (operation, count, seconds)
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PySide import QtGui
+    from qnoodles.qnoodles import NodeScene
+    from .generate import generate
+
+    app = QtGui.QApplication.instance() or QtGui.QApplication(sys.argv[:1])
+    model = generate(shape, n)
+    for mode in modes:
+        if mode == 'widget' and n > MAX_WIDGET_NODES:
+            continue
+        _, t = timed(lambda: (NodeScene(model, mode), app.processEvents()))
+        yield ('NodeScene({0})'.format(mode), n, t)
+
+
+def run(shapes, sizes, gui=True):
+    records = []
+
+    def record(shape, n, operations):
+        for op, count, seconds in operations:
+            records.append({'shape': shape, 'nodes': n, 'operation': op,
+                            'count': count, 'seconds': seconds,
+                            'us_per_item': seconds / max(count, 1) * 1e6})
+
+    def error(shape, n, op, e):
+        records.append({'shape': shape, 'nodes': n, 'operation': op,
+                        'error': "{0}: {1}".format(type(e).__name__, e)})
+
+    for shape in shapes:
+        for n in sizes:
+            try:
+                record(shape, n, model_operations(shape, n))
+            except Exception as e:
+                error(shape, n, 'model', e)
+
+            if gui:
+                try:
+                    record(shape, n, scene_construction(shape, n))
+                except ImportError as e:
+                    gui = False
+                    error(shape, n, 'scene', e)
+                except Exception as e:
+                    error(shape, n, 'scene', e)
+
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': records}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--shapes', nargs='+', default=sorted(SHAPES), choices=sorted(SHAPES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--no-gui', action='store_true', help="skip the NodeScene benchmarks")
+    parser.add_argument('--output', default='-', help="JSON file, or '-' for stdout")
+    args = parser.parse_args(argv)
+
+    report = run(args.shapes, args.sizes, gui=not args.no_gui)
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Cost of profiling. Runs chains and fans of `AdderNode`s, whose compute is
+next to nothing, with the `Executor` without a trace and with one, and
+times the export to Chrome trace JSON. To show what tracing costs when it
+is off, the same model also runs on `Untraced`, whose `Executor._traced`
+never starts a trace; the "us/node off" column is the difference per node
+between the two, which should be lost in the noise. What the two share
+is a test of the trace against None at each hook, a few nanoseconds per
+node.
+
+    python -m benchmark.trace [n_nodes ...]
+"""
+
+import os
+import sys
+import tempfile
+
+from engine.executor import Executor, _run_node
+from engine.trace import Trace
+
+from .compiler import adders
+from . import timed, print_table
+
+REPEAT = 5
+
+
+def best(f):
+    return min(timed(f)[1] for _ in range(REPEAT))
+
+
+class Untraced(Executor):
+    """
+    `Executor` that never traces, even when it is given a trace.
+    """
+    def _traced(self, ready):
+        return _run_node, None
+
+
+def run(shape, n):
+    model = adders(shape, n)
+    trace = Trace()
+    # a new executor every time; one that ran before only reruns dirty nodes
+    assert Untraced(model).run().values == Executor(model).run().values
+    t_plain = best(lambda: Untraced(model).run())
+    t_off = best(lambda: Executor(model).run())
+    t_on = best(lambda: Executor(model, trace=trace).run())
+    assert len(trace.nodes) == n
+
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    _, t_export = timed(trace.save, path)
+    size = os.path.getsize(path)
+    os.remove(path)
+
+    return [shape, n, "{0:.3f}".format(t_plain), "{0:.3f}".format(t_off),
+            "{0:.3f}".format(t_on), "{0:+.2f}".format((t_off - t_plain) / n * 1e6),
+            "{0:+.1f}".format((t_on - t_off) / n * 1e6), "{0:.3f}".format(t_export),
+            size // 1024]
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000]
+    print_table(["shape", "nodes", "untraced (s)", "off (s)", "on (s)", "us/node off",
+                 "us/node on", "export (s)", "json (kB)"],
+                [run(shape, n) for n in sizes for shape in ('chain', 'fan')])
@@ -0,0 +1,65 @@
+"""
+Large arrays between worker processes. A producer node makes an array of
+the given size and two consumers reduce it, in a process pool; with and
+without a `Transport`, which passes the array through shared memory
+instead of pickling it to the main process and back out.
+
+    python -m benchmark.transport [megabytes ...]
+"""
+
+import sys
+
+import numpy as np
+
+from data.model import NodeTemplate, SimpleNode, DataModel
+from engine.executor import Executor
+from engine.transport import Transport
+
+from . import timed, print_table
+
+
+class Payload(NodeTemplate):
+    name = "Payload"
+    input_vars = ["nbytes"]
+    output_vars = ["data"]
+
+    @staticmethod
+    def compute(inputs):
+        return {"data": np.ones(inputs["nbytes"], dtype=np.uint8)}
+
+
+class Reduce(NodeTemplate):
+    name = "Reduce"
+    input_vars = ["data"]
+    output_vars = ["total"]
+
+    @staticmethod
+    def compute(inputs):
+        return {"total": int(inputs["data"].sum(dtype=np.int64))}
+
+
+def workflow(nbytes):
+    payload = SimpleNode(Payload)
+    payload.values = {"nbytes": nbytes}
+    model = DataModel()
+    model.extend([payload, SimpleNode(Reduce), SimpleNode(Reduce)],
+                 [((0, "data"), (1, "data")), ((0, "data"), (2, "data"))])
+    return model
+
+
+def run(megabytes, workers=2):
+    nbytes = megabytes * 2**20
+    row = [megabytes]
+    for transport in (None, Transport()):
+        model = workflow(nbytes)
+        result, t = timed(Executor(model, workers, 'process', transport=transport).run)
+        assert result.values[(1, "total")] == result.values[(2, "total")] == nbytes
+        del result
+        row += ["{0:.3f}".format(t), "{0:.0f}".format(megabytes / t)]
+    return row
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1, 16, 256]
+    print_table(["MB", "pickled (s)", "MB/s", "shared (s)", "MB/s"],
+                [run(mb) for mb in sizes])
@@ -0,0 +1,103 @@
+"""
+Typed noodlets. Builds a workflow from templates with a mix of types, and
+compares two ways of finding the inputs a new link can go to: scanning
+every input and calling `compatible`, and looking the type up in the
+`CompatibilityIndex`, as the scene does while a link is being dragged. Also
+times validating all links at once with `mismatches` against checking them
+one by one.
+
+    python -m benchmark.types [n_nodes ...]
+"""
+
+import sys
+import random
+
+from data.model import NodeTemplate, SimpleNode, DataModel
+from data.types import (CompatibilityIndex, Choice, List, Table, Record, Dict,
+                        Any, compatible, port_type, mismatches)
+
+from . import timed, print_table
+
+TYPES = [int, float, complex, bool, str, "rational", Any,
+         Choice("a", "b"), Choice("a", "b", "c"), [int], [float], (int, str),
+         Dict(x=float), Dict(x=float, y=float), Table(Record(x=int, y=str))]
+
+
+def templates(k=20, seed=0):
+    """
+    `k` templates with two inputs and two outputs of random types.
+    """
+    rng = random.Random(seed)
+    return [type("Typed{0}".format(t), (NodeTemplate,), {
+                'name': "Typed {0}".format(t),
+                'input_vars': ["a", "b"], 'output_vars': ["x", "y"],
+                'input_types': {"a": rng.choice(TYPES), "b": rng.choice(TYPES)},
+                'output_types': {"x": rng.choice(TYPES), "y": rng.choice(TYPES)}})
+            for t in range(k)]
+
+
+def typed_model(n, n_links=None, seed=0):
+    """
+    A workflow of `n` typed nodes with about `n_links` links, all of which
+    fit.
+    """
+    rng = random.Random(seed)
+    kinds = templates(seed=seed)
+    model = DataModel()
+    for k in range(n):
+        node = SimpleNode(rng.choice(kinds))
+        node.location = [k % 100 * 250, k // 100 * 150]
+        model.add_node(node)
+
+    for _ in range(n_links if n_links is not None else 2 * n):
+        i, j = sorted(rng.sample(range(n), 2))
+        try:
+            model.add_link((i, rng.choice("xy")), (j, rng.choice("ab")))
+        except TypeError:
+            pass
+    return model
+
+
+def run(n):
+    model = typed_model(n, 8 * n)
+    nodes = model._nodes
+    index = CompatibilityIndex()
+    ports = [(i, name, port_type(node, name, 'in'))
+             for i, node in nodes.items() for name in ("a", "b")]
+    source = port_type(nodes[0], "x", 'out')
+
+    def scan():
+        return [(i, name) for i, name, t in ports if compatible(source, t)]
+
+    by_type = {}
+    for i, name, t in ports:
+        by_type.setdefault(index.id(t), []).append((i, name))
+
+    def lookup():
+        return [p for k in index.targets(source) for p in by_type.get(k, ())]
+
+    found, t_scan = timed(scan)
+    assert sorted(found) == sorted(lookup())
+    t_lookup = min(timed(lookup)[1] for _ in range(5))
+
+    links = list(model.all_links())
+
+    def one_by_one():
+        return [(a, b) for a, b in links
+                if not compatible(port_type(nodes[a[0]], a[1], 'out'),
+                                  port_type(nodes[b[0]], b[1], 'in'))]
+
+    bad, t_loop = timed(one_by_one)
+    assert bad == mismatches(model, index) == []
+    _, t_vec = timed(mismatches, model, index)
+
+    return [n, len(links), len(index), len(found),
+            "{0:.2f}".format(t_scan * 1e3), "{0:.3f}".format(t_lookup * 1e3),
+            "{0:.1f}".format(t_loop * 1e3), "{0:.1f}".format(t_vec * 1e3)]
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000]
+    print_table(["nodes", "links", "types", "targets", "scan (ms)", "lookup (ms)",
+                 "check loop (ms)", "check vectorised (ms)"],
+                [run(n) for n in sizes])
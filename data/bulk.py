@@ -0,0 +1,155 @@
+"""
+Bulk construction of a `DataModel`. Adding nodes and links one call at a
+time spends most of its time in Python overhead: every `add_node` walks the
+noodlet generators of the node, and every `add_link` is a separate method
+call. `extend` looks up the noodlets and their types once per template,
+checks all links in one go with NumPy, and only then fills in the link
+dictionaries.
+
+Links are given as `((k, name), (l, name))` pairs, where `k` and `l` are
+positions in the list of new nodes. The new nodes get consecutive indices;
+`extend` returns the range of them.
+"""
+
+import numpy as np
+
+from .spatial import node_rect
+from .types import INDEX, port_type, type_name
+from .util import gc_paused
+
+
+def _ports(nodes):
+    """
+    Names of the output and input noodlets of every node, computed once per
+    template.
+
+    Returns: (list of templates keys per node, dict of key -> (outputs, inputs))
+    """
+    keys = []
+    ports = {}
+    for node in nodes:
+        key = getattr(node, 'template', None)
+        if key is None:
+            key = ('node', id(node))
+        if key not in ports:
+            ports[key] = ([s.name for s in node.output_noodlets()],
+                          [s.name for s in node.input_noodlets()])
+        keys.append(key)
+    return keys, ports
+
+
+def validate(n, keys, ports, links):
+    """
+    Check that every link goes from an existing output noodlet to an
+    existing input noodlet of the new nodes.
+
+    Raises: KeyError naming the first bad link.
+    """
+    if not links:
+        return
+
+    templates = dict((key, t) for t, key in enumerate(ports))
+    names = {}
+    for outputs, inputs in ports.values():
+        for name in outputs + inputs:
+            names.setdefault(name, len(names))
+    m = len(names)
+
+    valid_out = np.array(sorted(templates[key] * m + names[name]
+                                for key, (outputs, _) in ports.items() for name in outputs),
+                         dtype=np.int64)
+    valid_in = np.array(sorted(templates[key] * m + names[name]
+                               for key, (_, inputs) in ports.items() for name in inputs),
+                        dtype=np.int64)
+
+    node_template = np.array([templates[key] for key in keys], dtype=np.int64)
+    src = np.array([a[0] for a, _ in links], dtype=np.int64)
+    dst = np.array([b[0] for _, b in links], dtype=np.int64)
+    src_name = np.array([names.get(a[1], -1) for a, _ in links], dtype=np.int64)
+    dst_name = np.array([names.get(b[1], -1) for _, b in links], dtype=np.int64)
+
+    ok = (src >= 0) & (src < n) & (dst >= 0) & (dst < n) \
+        & (src_name >= 0) & (dst_name >= 0)
+    src_c = np.where(ok, src, 0)
+    dst_c = np.where(ok, dst, 0)
+    ok &= np.isin(node_template[src_c] * m + src_name, valid_out)
+    ok &= np.isin(node_template[dst_c] * m + dst_name, valid_in)
+
+    if not ok.all():
+        bad = int(np.flatnonzero(~ok)[0])
+        raise KeyError(links[bad])
+
+
+def validate_types(nodes, keys, ports, links, index=INDEX):
+    """
+    Check that the types of the ends of every link fit, with one lookup in
+    the compatibility matrix of `index` for all links. The links should
+    have passed `validate`.
+
+    Raises: TypeError naming the first bad link.
+    """
+    if not links:
+        return
+
+    first = {}
+    for node, key in zip(nodes, keys):
+        first.setdefault(key, node)
+    ids = dict((key, (dict((name, index.id(port_type(node, name, 'out')))
+                           for name in ports[key][0]),
+                      dict((name, index.id(port_type(node, name, 'in')))
+                           for name in ports[key][1])))
+               for key, node in first.items())
+
+    src = [ids[keys[k]][0][a] for (k, a), _ in links]
+    dst = [ids[keys[l]][1][b] for _, (l, b) in links]
+    ok = index.check(src, dst)
+    if not ok.all():
+        bad = int(np.flatnonzero(~ok)[0])
+        raise TypeError("Can't link {0} of type {1} to {2} of type {3}.".format(
+            links[bad][0], type_name(index.types[src[bad]]),
+            links[bad][1], type_name(index.types[dst[bad]])))
+
+
+def extend(model, nodes, links=()):
+    """
+    Add many nodes and the links between them to `model` at once.
+
+    Returns: range of the new node indices.
+    """
+    nodes = list(nodes)
+    links = list(links)
+    n = len(nodes)
+    keys, ports = _ports(nodes)
+    validate(n, keys, ports, links)
+    validate_types(nodes, keys, ports, links)
+
+    first = model._counter
+    new = range(first, first + n)
+    model._counter += n
+    model._version += 1
+    if model._observers:
+        for i in new:
+            model._touch('touch_node', i)
+        for (k, n_), (l, m_) in links:
+            model._touch('touch_link', (first + k, n_), (first + l, m_))
+
+    with gc_paused():
+        model._nodes.update(zip(new, nodes))
+        model._index_of.update(zip(map(id, nodes), new))
+        model._by_name.update(zip((node.name for node in nodes), new))
+        model._spatial.insert_many((i, node_rect(node)) for i, node in zip(new, nodes)
+                                   if node.location is not None)
+
+        model._links.update({(i, name): set() for i, key in zip(new, keys)
+                             for name in ports[key][0]})
+        model._inverse_links.update({(i, name): set() for i, key in zip(new, keys)
+                                     for name in ports[key][1]})
+
+        forward = model._links
+        inverse = model._inverse_links
+        for (k, n_), (l, m_) in links:
+            a, b = (first + k, n_), (first + l, m_)
+            forward[a].add(b)
+            inverse[b].add(a)
+
+    return new
@@ -0,0 +1,296 @@
+"""
+A compact storage engine for the data model. The `DataModel` keeps its links
+in dictionaries of sets, keyed on `(int, str)` tuples. That is easy to work
+with, but costs a few hundred bytes per link. Once a workflow grows to tens of
+thousands of nodes we'd rather have the links in flat arrays.
+
+The `CompactDataModel` has the same interface as the `DataModel`. Internally
+the names of the noodlets are interned to integer port ids, so a link is just
+four integers: (source node, source port, target node, target port). The links
+are kept in NumPy arrays, sorted by source node (CSR) with a permutation that
+sorts them by target node (CSC). Searching the links from or to a node is then
+a slice into these arrays.
+
+Sorted arrays are expensive to insert into, so new links first go into an
+append buffer. Once the buffer is full, it is merged with the arrays in one
+go. Deleted links are marked dead and cleaned up during the next merge.
+"""
+
+import logging
+
+import numpy as np
+
+from .model import Node
+
+logger = logging.getLogger(__name__)
+
+
+class CompactDataModel:
+    """
+    Drop-in replacement for the `DataModel` with array-backed links.
+
+    Arguments:
+        buffer_size - number of links that are buffered before they are
+            merged into the sorted arrays.
+    """
+    def __init__(self, buffer_size=4096):
+        self._counter = 0
+        self._nodes = {}
+        self._ports = {}            # node index -> (output port ids, input port ids)
+        self._template_ports = {}   # cache of the above per template
+
+        self._port_ids = {}         # noodlet name -> port id
+        self._port_names = []       # port id -> noodlet name
+
+        # merged links; the edge arrays are sorted by (src, src_port)
+        self._src = np.empty(0, dtype=np.int32)
+        self._src_port = np.empty(0, dtype=np.int32)
+        self._dst = np.empty(0, dtype=np.int32)
+        self._dst_port = np.empty(0, dtype=np.int32)
+        self._alive = np.empty(0, dtype=bool)
+        self._n_dead = 0
+
+        self._csr_ptr = np.zeros(1, dtype=np.int64)     # by source node
+        self._csc_ptr = np.zeros(1, dtype=np.int64)     # by target node
+        self._csc_order = np.empty(0, dtype=np.int32)   # edge ids sorted by target
+
+        # append buffer, indexed both ways
+        self._buffer_size = buffer_size
+        self._buffer_out = {}       # (i, p) -> {(j, q)}
+        self._buffer_in = {}        # (j, q) -> {(i, p)}
+        self._n_buffered = 0
+
+    def _intern(self, name):
+        try:
+            return self._port_ids[name]
+        except KeyError:
+            p = len(self._port_names)
+            self._port_ids[name] = p
+            self._port_names.append(name)
+            return p
+
+    def _node_ports(self, node):
+        template = getattr(node, 'template', None)
+        if template is not None and template in self._template_ports:
+            return self._template_ports[template]
+
+        ports = (frozenset(self._intern(s.name) for s in node.output_noodlets()),
+                 frozenset(self._intern(s.name) for s in node.input_noodlets()))
+
+        if template is not None:
+            self._template_ports[template] = ports
+        return ports
+
+    def _port(self, noodlet, direction):
+        """
+        Translate an `(int, str)` noodlet into an `(int, int)` pair, raising
+        a `KeyError` if the node has no such noodlet, just like the
+        dictionaries in `DataModel` would.
+        """
+        i, name = noodlet
+        p = self._port_ids.get(name)
+        ports = self._ports.get(i)
+        if p is None or ports is None or p not in ports[direction]:
+            raise KeyError(noodlet)
+        return i, p
+
+    def all_nodes(self):
+        """
+        returns an iterator over all nodes.
+        """
+        return self._nodes.items()
+
+    def all_links(self):
+        """
+        Generator for a linear list of all links, see `DataModel.all_links`.
+        """
+        names = self._port_names
+        alive = np.flatnonzero(self._alive)
+        for i, p, j, q in zip(self._src[alive].tolist(), self._src_port[alive].tolist(),
+                              self._dst[alive].tolist(), self._dst_port[alive].tolist()):
+            yield ((i, names[p]), (j, names[q]))
+
+        for (i, p), lst in self._buffer_out.items():
+            for j, q in lst:
+                yield ((i, names[p]), (j, names[q]))
+
+    def add_node(self, node):
+        """
+        Adds a node to the data structure.
+
+        Returns: integer handler.
+        """
+        i = self._counter
+        self._counter += 1
+
+        self._nodes[i] = node
+        self._ports[i] = self._node_ports(node)
+        return i
+
+    def _out_edges(self, i):
+        """
+        Edge ids of the merged links leaving node `i`.
+        """
+        if i + 1 >= len(self._csr_ptr):
+            return np.empty(0, dtype=np.int64)
+        return np.arange(self._csr_ptr[i], self._csr_ptr[i+1])
+
+    def _in_edges(self, j):
+        """
+        Edge ids of the merged links arriving at node `j`.
+        """
+        if j + 1 >= len(self._csc_ptr):
+            return np.empty(0, dtype=np.int32)
+        return self._csc_order[self._csc_ptr[j]:self._csc_ptr[j+1]]
+
+    def _find_edge(self, i, p, j, q):
+        e = self._out_edges(i)
+        hit = e[(self._src_port[e] == p) & (self._dst[e] == j)
+                & (self._dst_port[e] == q) & self._alive[e]]
+        return int(hit[0]) if len(hit) else -1
+
+    def add_link(self, a, b):
+        i, p = self._port(a, 0)
+        j, q = self._port(b, 1)
+
+        if (j, q) in self._buffer_out.get((i, p), ()) or self._find_edge(i, p, j, q) >= 0:
+            return
+
+        self._buffer_out.setdefault((i, p), set()).add((j, q))
+        self._buffer_in.setdefault((j, q), set()).add((i, p))
+        self._n_buffered += 1
+
+        if self._n_buffered >= self._buffer_size:
+            self.flush()
+
+    def _unbuffer(self, i, p, j, q):
+        self._buffer_out[(i, p)].discard((j, q))
+        if not self._buffer_out[(i, p)]:
+            del self._buffer_out[(i, p)]
+        self._buffer_in[(j, q)].discard((i, p))
+        if not self._buffer_in[(j, q)]:
+            del self._buffer_in[(j, q)]
+        self._n_buffered -= 1
+
+    def _kill(self, edges):
+        edges = edges[self._alive[edges]]
+        self._alive[edges] = False
+        self._n_dead += len(edges)
+
+    def delete_link(self, a, b):
+        i, p = self._port(a, 0)
+        j, q = self._port(b, 1)
+
+        if (j, q) in self._buffer_out.get((i, p), ()):
+            self._unbuffer(i, p, j, q)
+            return
+
+        e = self._find_edge(i, p, j, q)
+        if e < 0:
+            raise KeyError(b)
+        self._kill(np.array([e]))
+
+    def links_to(self, b):
+        j, q = self._port(b, 1)
+        names = self._port_names
+
+        e = self._in_edges(j)
+        e = e[(self._dst_port[e] == q) & self._alive[e]]
+        result = set((i, names[p]) for i, p in
+                     zip(self._src[e].tolist(), self._src_port[e].tolist()))
+        result.update((i, names[p]) for i, p in self._buffer_in.get((j, q), ()))
+        return result
+
+    def sources(self, b):
+        """
+        The noodlets linked to `b` in sorted order; this model doesn't keep
+        other orders, see `DataModel.sources`.
+        """
+        return sorted(self.links_to(b))
+
+    def links_from(self, a):
+        i, p = self._port(a, 0)
+        names = self._port_names
+
+        e = self._out_edges(i)
+        e = e[(self._src_port[e] == p) & self._alive[e]]
+        result = set((j, names[q]) for j, q in
+                     zip(self._dst[e].tolist(), self._dst_port[e].tolist()))
+        result.update((j, names[q]) for j, q in self._buffer_out.get((i, p), ()))
+        return result
+
+    def delete_links_to(self, b):
+        j, q = self._port(b, 1)
+
+        e = self._in_edges(j)
+        self._kill(e[self._dst_port[e] == q])
+        for i, p in list(self._buffer_in.get((j, q), ())):
+            self._unbuffer(i, p, j, q)
+
+    def _delete_node_by_index(self, idx):
+        self._kill(self._out_edges(idx))
+        self._kill(self._in_edges(idx))
+
+        outputs, inputs = self._ports[idx]
+        for p in outputs:
+            for j, q in list(self._buffer_out.get((idx, p), ())):
+                self._unbuffer(idx, p, j, q)
+        for q in inputs:
+            for i, p in list(self._buffer_in.get((idx, q), ())):
+                self._unbuffer(i, p, idx, q)
+
+        del self._ports[idx]
+        del self._nodes[idx]
+
+    def delete_node(self, node):
+        """
+        Delete a node, given as `int` index, `Node` or `str` name, see
+        `DataModel.delete_node`.
+        """
+        idx = None
+        if isinstance(node, int):
+            idx = node if node in self._nodes else None
+        elif isinstance(node, Node):
+            idx = next((i for i, x in self._nodes.items() if x is node), None)
+        elif isinstance(node, str):
+            idx = next((i for i, x in self._nodes.items() if x.name == node), None)
+
+        if idx is None:
+            logger.warning("Tried to delete an non-existing node: '{name}'.".format(name=node))
+            return
+        self._delete_node_by_index(idx)
+
+    def flush(self):
+        """
+        Merge the append buffer into the sorted arrays, dropping dead links
+        on the way. This is called automatically when the buffer is full.
+        """
+        buffered = np.array([(i, p, j, q)
+                             for (i, p), lst in self._buffer_out.items()
+                             for j, q in lst], dtype=np.int32).reshape(-1, 4)
+        alive = self._alive
+
+        src = np.concatenate([self._src[alive], buffered[:, 0]])
+        src_port = np.concatenate([self._src_port[alive], buffered[:, 1]])
+        dst = np.concatenate([self._dst[alive], buffered[:, 2]])
+        dst_port = np.concatenate([self._dst_port[alive], buffered[:, 3]])
+
+        order = np.lexsort((dst_port, dst, src_port, src))
+        self._src = src[order]
+        self._src_port = src_port[order]
+        self._dst = dst[order]
+        self._dst_port = dst_port[order]
+        self._alive = np.ones(len(order), dtype=bool)
+        self._n_dead = 0
+
+        n = self._counter
+        self._csr_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._src, minlength=n), out=self._csr_ptr[1:])
+
+        self._csc_order = np.lexsort((self._dst_port, self._dst)).astype(np.int32)
+        self._csc_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._dst, minlength=n), out=self._csc_ptr[1:])
+
+        self._buffer_out = {}
+        self._buffer_in = {}
+        self._n_buffered = 0
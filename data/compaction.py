@@ -0,0 +1,126 @@
+"""
+Compaction of node indices. Node indices are handed out by a counter and
+never reused, so after many deletions they get sparse. Compaction renumbers
+the nodes to `0 .. n-1`, in the order of their indices, in a single pass
+over the nodes and links; that way links keep the order in which they pass
+their values to an input noodlet.
+
+Anything outside the model that holds node indices (the scene, the
+executor) can bring itself up to date with the returned remap table, a
+dictionary from old to new indices.
+
+Compacting a large model takes a while, so it can also be done in a
+background thread on a snapshot of the model:
+
+    job = model.compact(background=True)
+    ...
+    remap = job.apply()     # from the thread that edits the model
+
+`apply` swaps the compacted tables in, unless the model was edited since
+the snapshot was taken, in which case it returns None.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .util import gc_paused
+
+
+def snapshot(model):
+    """
+    Copy the tables of `model` that compaction needs. The link sets are
+    frozen, so later edits to the model don't show up in the snapshot.
+    """
+    with gc_paused():
+        return {'version': model._version,
+                'nodes': sorted(model._nodes.items(), key=lambda item: item[0]),
+                'links': dict(zip(model._links, map(frozenset, model._links.values()))),
+                'inverse_links': dict(zip(model._inverse_links,
+                                          map(frozenset, model._inverse_links.values()))),
+                'fan_in': dict(model._fan_in),
+                'rects': dict(model._spatial._rects),
+                'index_type': type(model._spatial),
+                'cell': model._spatial.cell}
+
+
+def compact_tables(tables):
+    """
+    Compute the compacted tables from a snapshot.
+
+    Returns: (new tables, remap)
+    """
+    remap = dict((old, new) for new, (old, _) in enumerate(tables['nodes']))
+
+    def f(noodlet):
+        return (remap[noodlet[0]], noodlet[1])
+
+    with gc_paused():
+        new = {'version': tables['version'],
+               'nodes': dict((remap[i], node) for i, node in tables['nodes']),
+               'links': dict((f(a), set(map(f, lst))) for a, lst in tables['links'].items()),
+               'inverse_links': dict((f(b), set(map(f, lst)))
+                                     for b, lst in tables['inverse_links'].items()),
+               'fan_in': dict((f(b), tuple(map(f, order)))
+                              for b, order in tables['fan_in'].items())}
+        nodes = new['nodes']
+        new['index_of'] = dict((id(node), i) for i, node in nodes.items())
+        new['by_name'] = dict((node.name, i) for i, node in nodes.items())
+        new['spatial'] = tables['index_type'](tables['cell'])
+        new['spatial'].insert_many((remap[i], r) for i, r in tables['rects'].items())
+    return new, remap
+
+
+def install(model, tables):
+    """
+    Replace the tables of `model` by compacted ones. This only assigns
+    attributes, so it is quick.
+    """
+    with gc_paused():
+        _install(model, tables)
+
+
+def _install(model, tables):
+    # snapshots and histories refer to the old indices
+    model._detach_observers()
+
+    nodes = tables['nodes']
+    model._nodes = nodes
+    model._links = tables['links']
+    model._inverse_links = tables['inverse_links']
+    model._fan_in = tables['fan_in']
+    model._counter = len(nodes)
+    model._index_of = tables['index_of']
+    model._by_name = tables['by_name']
+    model._spatial = tables['spatial']
+    model._version += 1
+
+
+class Compaction:
+    """
+    A compaction running in the background, see the module docstring.
+    """
+    _pool = None
+
+    def __init__(self, model):
+        if Compaction._pool is None:
+            Compaction._pool = ThreadPoolExecutor(1)
+
+        self.model = model
+        self.version = model._version
+        self.future = Compaction._pool.submit(compact_tables, snapshot(model))
+
+    def done(self):
+        return self.future.done()
+
+    def apply(self):
+        """
+        Wait for the compaction to finish and swap the result into the
+        model.
+
+        Returns: remap table, or None if the model changed in the mean time.
+        """
+        tables, remap = self.future.result()
+        if self.model._version != self.version:
+            return None
+
+        install(self.model, tables)
+        return remap
@@ -0,0 +1,330 @@
+"""
+Composite nodes. A connected part of a workflow can be collapsed into a
+single `CompositeNode`, whose noodlets are the boundary ports of the part:
+every input that is linked from outside, and every output that is linked to
+outside. The scene then shows one node instead of the whole part, and the
+executor runs the part as one task, see `CompositeNode.compute`.
+
+    c = collapse(model, [4, 5, 6])
+    expand(model, c)
+
+Boundary noodlets are named `"{name}@{i}"` after the inner noodlet `(i,
+name)` they stand for. Input noodlets with more than one link get their
+values in the same order before, while and after a part is collapsed;
+where that order is no longer the sorted one, it is set with
+`DataModel.set_order`. The part must be convex: a path that leaves it and
+comes back would become a cycle through the composite node, so `collapse`
+refuses such a part. Both operations take time in proportion to the size
+of the part and its boundary, not of the workflow, apart from that check:
+it walks downstream and upstream of the part at the same time, and stops
+with the shorter walk. Either operation is a series of edits; record it
+inside `History.group()` to undo it at once.
+
+Composite nodes have no template, so they can't be saved, in either
+format; `data.storage.save` raises a ValueError. Expand them first.
+"""
+
+from .model import Node, Noodlet
+from .types import port_type
+
+
+def port_name(noodlet):
+    i, name = noodlet
+    return "{0}@{1}".format(name, i)
+
+
+class CompositeNode(Node):
+    """
+    A part of a workflow as a single node.
+
+    Attributes:
+        nodes - dictionary of inner node index to node; the indices are
+            those the nodes had in the model
+        links - list of links between the inner nodes
+        inputs, outputs - lists of `(port name, inner noodlet)`
+        feeds - for every inner input that is a boundary port and also has
+            inner links, its sources in the order the executor would pass
+            them, with `None` for each link from outside
+        fan_in - for every other inner input with more than one link, its
+            sources in that order
+        order - inner node indices in topological order
+        anchor - location of the composite when it was made; when expanded
+            the inner nodes follow the composite by the distance it moved
+    """
+    def __init__(self, name, nodes, links, inputs, outputs, feeds, order, fan_in=None):
+        self.name = name
+        self.nodes = nodes
+        self.links = links
+        self.inputs = inputs
+        self.outputs = outputs
+        self.feeds = feeds
+        self.order = order
+        self.fan_in = fan_in or {}
+        self.values = {}
+        self.extent = None
+
+        locations = [n.location for n in nodes.values() if n.location is not None]
+        self.location = [min(x for x, _ in locations), min(y for _, y in locations)] \
+            if locations else None
+        self.anchor = self.location
+
+        self._types = dict(((port, 'in'), port_type(nodes[b[0]], b[1], 'in'))
+                           for port, b in inputs)
+        self._types.update(((port, 'out'), port_type(nodes[a[0]], a[1], 'out'))
+                           for port, a in outputs)
+
+    def all_nodes(self):
+        """
+        The inner nodes; with `all_links` a composite can be scheduled like
+        a workflow of its own.
+        """
+        return self.nodes.items()
+
+    def all_links(self):
+        return iter(self.links)
+
+    def input_noodlets(self):
+        for port, _ in self.inputs:
+            yield Noodlet(name=port, dtype=self._types[(port, 'in')], connector=True,
+                          direction='in', widget=False)
+
+    def output_noodlets(self):
+        for port, _ in self.outputs:
+            yield Noodlet(name=port, dtype=self._types[(port, 'out')], connector=True,
+                          direction='out', widget=False)
+
+    def compute(self, inputs):
+        """
+        Run the inner nodes one after the other, in a single call, passing
+        values between them the way the executor does.
+        """
+        sources = {}
+        for a, b in self.links:
+            sources.setdefault(b, []).append(a)
+        boundary = dict((b, port) for port, b in self.inputs)
+
+        values = {}
+        for i in self.order:
+            node = self.nodes[i]
+            node_inputs = {}
+            for s in node.input_noodlets():
+                b = (i, s.name)
+                if b in boundary and boundary[b] in inputs:
+                    node_inputs[s.name] = self._merge(b, inputs[boundary[b]], values)
+                elif b in sources:
+                    inner = self.fan_in.get(b) or sorted(sources[b])
+                    node_inputs[s.name] = values[inner[0]] if len(inner) == 1 \
+                        else [values[a] for a in inner]
+                elif s.name in getattr(node, 'values', {}):
+                    node_inputs[s.name] = node.values[s.name]
+                else:
+                    raise ValueError(
+                        "Input '{0}' of node {1} in {2} is not linked and has no value."
+                        .format(s.name, i, self.name))
+
+            for name, v in node.compute(node_inputs).items():
+                values[(i, name)] = v
+
+        return dict((port, values[a]) for port, a in self.outputs)
+
+    def _merge(self, b, value, values):
+        feed = self.feeds.get(b)
+        if feed is None:
+            return value
+
+        outer = iter([value] if feed.count(None) == 1 else value)
+        merged = [next(outer) if a is None else values[a] for a in feed]
+        merged.extend(outer)
+        return merged
+
+
+def collapse(model, indices, name=None):
+    """
+    Replace the nodes `indices` of `model`, which should be connected, by
+    one `CompositeNode`, and link it to the rest of the workflow.
+
+    Returns: index of the composite node.
+    Raises: ValueError if the nodes are not connected, or a path leaves
+        them and comes back.
+    """
+    sub = set(indices)
+    nodes = model._nodes
+    if not sub or not all(i in nodes for i in sub):
+        raise ValueError("Can only collapse existing nodes.")
+
+    inner, inputs, outputs, feeds, fan_in = [], [], [], {}, {}
+    outer_in, outer_out, orders = [], [], {}
+    neighbours = dict((i, set()) for i in sub)
+
+    for i in sorted(sub):
+        node = nodes[i]
+        for s in node.input_noodlets():
+            b = (i, s.name)
+            sources = model.sources(b)
+            if all(a[0] in sub for a in sources):
+                if len(sources) > 1:
+                    fan_in[b] = sources
+                continue
+            port = port_name(b)
+            inputs.append((port, b))
+            outer_in.append((port, [a for a in sources if a[0] not in sub]))
+            if any(a[0] in sub for a in sources):
+                feeds[b] = [a if a[0] in sub else None for a in sources]
+
+        for s in node.output_noodlets():
+            a = (i, s.name)
+            targets = model._links[a]
+            for b in targets:
+                if b[0] in sub:
+                    inner.append((a, b))
+                    neighbours[i].add(b[0])
+                    neighbours[b[0]].add(i)
+            if any(b[0] not in sub for b in targets):
+                port = port_name(a)
+                outputs.append((port, a))
+                for b in sorted(targets):
+                    if b[0] not in sub:
+                        outer_out.append((port, b))
+                        if b not in orders and len(model._inverse_links[b]) > 1:
+                            orders[b] = model.sources(b)
+
+    if not _connected(neighbours):
+        raise ValueError("Can only collapse a connected part of the workflow.")
+    if not _convex(model, sub, [b[0] for _, b in outer_out],
+                   [a[0] for _, sources in outer_in for a in sources]):
+        raise ValueError("Can only collapse a part of the workflow that no path"
+                         " leaves and comes back to.")
+
+    from engine.schedule import topological_order
+    part = CompositeNode(name or "Composite {0}".format(min(sub)),
+                         dict((i, nodes[i]) for i in sorted(sub)), inner,
+                         inputs, outputs, feeds, [], fan_in)
+    part.order = topological_order(part)
+
+    for port, b in inputs:
+        if b[1] in getattr(nodes[b[0]], 'values', {}):
+            part.values[port] = nodes[b[0]].values[b[1]]
+
+    model.delete_nodes(sub)
+    c = model.add_node(part)
+    for port, sources in outer_in:
+        for a in sources:
+            model.add_link(a, (c, port))
+        model.set_order((c, port), sources)
+    for port, b in outer_out:
+        model.add_link((c, port), b)
+    for b, sources in orders.items():
+        model.set_order(b, [(c, port_name(a)) if a[0] in sub else a for a in sources])
+    return c
+
+
+def expand(model, c):
+    """
+    Put the inner nodes of composite node `c` back in the workflow, under
+    new indices, and restore their links.
+
+    Returns: dictionary of the inner indices, as kept by the composite, to
+    the new indices.
+    """
+    part = model._nodes[c]
+    outer_in = [(b, model.sources((c, port))) for port, b in part.inputs]
+    outer_out = [(a, b) for port, a in part.outputs
+                 for b in sorted(model._links[(c, port)])]
+    orders = dict((b, model.sources(b)) for _, b in outer_out
+                  if len(model._inverse_links[b]) > 1)
+
+    dx, dy = 0, 0
+    if part.anchor is not None and part.location is not None:
+        dx, dy = part.location[0] - part.anchor[0], part.location[1] - part.anchor[1]
+    for port, (i, name) in part.inputs:
+        if port in part.values:
+            part.nodes[i].values[name] = part.values[port]
+
+    model.delete_node(c)
+    table = {}
+    for i, node in part.nodes.items():
+        if node.location is not None:
+            node.location = [node.location[0] + dx, node.location[1] + dy]
+        table[i] = model.add_node(node)
+
+    def f(noodlet):
+        return (table.get(noodlet[0], noodlet[0]), noodlet[1])
+
+    for a, b in part.links:
+        model.add_link(f(a), f(b))
+    for b, sources in outer_in:
+        for a in sources:
+            model.add_link(a, f(b))
+    for a, b in outer_out:
+        model.add_link(f(a), b)
+
+    # put the values on each input back in the order they had
+    for b, sources in part.fan_in.items():
+        model.set_order(f(b), [f(a) for a in sources])
+    for b, sources in outer_in:
+        outer = iter(sources)
+        order = [next(outer, None) if a is None else f(a)
+                 for a in part.feeds.get(b, [None])]
+        order = [a for a in order if a is not None] + list(outer)
+        if len(order) > 1:
+            model.set_order(f(b), order)
+    inner = dict(((c, port), f(a)) for port, a in part.outputs)
+    for b, sources in orders.items():
+        model.set_order(b, [inner.get(a, a) for a in sources])
+    return table
+
+
+def _connected(neighbours):
+    start = next(iter(neighbours))
+    seen = set([start])
+    stack = [start]
+    while stack:
+        for j in neighbours[stack.pop()]:
+            if j not in seen:
+                seen.add(j)
+                stack.append(j)
+    return len(seen) == len(neighbours)
+
+
+def _convex(model, sub, below, above):
+    """
+    Whether no path from the part `sub` to itself goes outside it, where
+    `below` are the outside nodes it links to, and `above` the outside
+    nodes that link to it. Either walk alone would find such a path; both
+    go one node at a time, and the first to finish decides.
+    """
+    nodes = model._nodes
+
+    def downstream(i):
+        for s in nodes[i].output_noodlets():
+            for b in model._links[(i, s.name)]:
+                yield b[0]
+
+    def upstream(i):
+        for s in nodes[i].input_noodlets():
+            for a in model._inverse_links[(i, s.name)]:
+                yield a[0]
+
+    walks = zip(_returns(below, downstream, sub), _returns(above, upstream, sub))
+    for down, up in walks:
+        if down or up:
+            return False
+    return True
+
+
+def _returns(start, step, sub):
+    """
+    Walk from the nodes `start` with `step`, outside `sub`. Yields False
+    for every node passed, or True once the walk gets back into `sub`.
+    """
+    seen = set(start)
+    stack = list(seen)
+    while stack:
+        for j in step(stack.pop()):
+            if j in sub:
+                yield True
+                return
+            if j not in seen:
+                seen.add(j)
+                stack.append(j)
+        yield False
@@ -0,0 +1,193 @@
+"""
+Change notification from a `DataModel` to views such as the scene.
+
+A `ChangeBus` observes the model (see `DataModel._observe`) and collects
+the nodes and links touched by edits, until it is flushed. Flushing hands
+the *net* effect of all those edits to the subscribers, as one `Changes`
+record: a link that was added and removed again between two flushes is
+not reported at all, and a node that was moved a hundred times is reported
+as moved once.
+
+The bus doesn't know about frames. A view passes a `schedule` function,
+which is called on the first edit after a flush; the scene uses it to start
+a timer that flushes the bus on the next frame:
+
+    bus = ChangeBus(model, schedule=start_frame_timer)
+    bus.subscribe(scene.modelChanged)
+
+Without one, call `flush` by hand. `stats` gives the number of raw edit
+events against the number of changes delivered, to see how well edits
+are coalesced.
+"""
+
+from collections import Counter
+
+
+class Changes:
+    """
+    Net changes to a model since the previous flush.
+
+    Attributes:
+        nodes_added - set of node indices
+        nodes_removed - set of node indices
+        nodes_moved - set of node indices whose location or extent changed
+        nodes_renamed - set of node indices whose name changed
+        links_added - set of `(a, b)` links
+        links_removed - set of `(a, b)` links
+        events - number of raw edit events that led to these changes
+    """
+    __slots__ = ('nodes_added', 'nodes_removed', 'nodes_moved', 'nodes_renamed',
+                 'links_added', 'links_removed', 'events')
+
+    def __init__(self, events=0):
+        self.nodes_added = set()
+        self.nodes_removed = set()
+        self.nodes_moved = set()
+        self.nodes_renamed = set()
+        self.links_added = set()
+        self.links_removed = set()
+        self.events = events
+
+    def __len__(self):
+        return len(self.nodes_added) + len(self.nodes_removed) + len(self.nodes_moved) \
+            + len(self.nodes_renamed) + len(self.links_added) + len(self.links_removed)
+
+    def counts(self):
+        return dict((name, len(getattr(self, name))) for name in self.__slots__[:-1])
+
+
+class ChangeBus:
+    """
+    Arguments:
+        model - the `DataModel` to observe
+        schedule - function called without arguments on the first edit
+            after a flush, to arrange for `flush` to be called
+    """
+    def __init__(self, model, schedule=None):
+        self.model = model
+        self.schedule = schedule
+        self._subscribers = []
+        self._nodes = {}        # i -> existed at the last flush
+        self._states = {}       # i -> (location, extent, name) at the last flush
+        self._links = {}        # (a, b) -> existed at the last flush
+        self._scheduled = False
+
+        self.events = Counter()     # raw events, by kind
+        self.delivered = Counter()  # changes delivered, by kind
+        self.frames = 0             # flushes that delivered anything
+        self._flushed = 0           # raw events up to the last flush
+        model._observe(self)
+
+    def subscribe(self, callback):
+        """
+        Call `callback(changes)` on every flush with changes.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def _pending(self):
+        if not self._scheduled:
+            self._scheduled = True
+            if self.schedule is not None:
+                self.schedule()
+
+    def touch_node(self, i):
+        self.events['node'] += 1
+        if i not in self._nodes:
+            self._nodes[i] = i in self.model._nodes
+            self._pending()
+
+    def touch_state(self, i):
+        self.events['state'] += 1
+        if i not in self._states:
+            node = self.model._nodes[i]
+            self._states[i] = (_frozen(node.location), _frozen(node.extent), node.name)
+            self._pending()
+
+    def touch_link(self, a, b):
+        self.events['link'] += 1
+        if (a, b) not in self._links:
+            self._links[(a, b)] = b in self.model._links.get(a, ())
+            self._pending()
+
+    def detach(self):
+        """
+        The model is about to be compacted: deliver the pending changes
+        while their indices are still valid, and keep observing.
+        """
+        self.flush()
+        self.model._observe(self)
+
+    def collect(self):
+        """
+        The net changes since the last flush, without delivering them.
+
+        Returns: Changes
+        """
+        model = self.model
+        nodes = model._nodes
+        changes = Changes(sum(self.events.values()) - self._flushed)
+
+        for i, existed in self._nodes.items():
+            exists = i in nodes
+            if exists and not existed:
+                changes.nodes_added.add(i)
+            elif existed and not exists:
+                changes.nodes_removed.add(i)
+
+        for i, (location, extent, name) in self._states.items():
+            if i in nodes and i not in changes.nodes_added:
+                node = nodes[i]
+                if _frozen(node.location) != location or _frozen(node.extent) != extent:
+                    changes.nodes_moved.add(i)
+                if node.name != name:
+                    changes.nodes_renamed.add(i)
+
+        for (a, b), existed in self._links.items():
+            exists = b in model._links.get(a, ())
+            if exists and not existed:
+                changes.links_added.add((a, b))
+            elif existed and not exists:
+                changes.links_removed.add((a, b))
+
+        return changes
+
+    def flush(self):
+        """
+        Deliver the net changes since the last flush to all subscribers.
+
+        Returns: Changes
+        """
+        changes = self.collect()
+        self._nodes = {}
+        self._states = {}
+        self._links = {}
+        self._scheduled = False
+        self._flushed += changes.events
+
+        if changes:
+            self.frames += 1
+            self.delivered.update(changes.counts())
+            for callback in list(self._subscribers):
+                callback(changes)
+        return changes
+
+    def stats(self):
+        """
+        Event counts for profiling: raw events by kind, changes delivered by
+        kind, the number of frames, and the coalescing ratio (raw events per
+        delivered change).
+        """
+        events = sum(self.events.values())
+        delivered = sum(self.delivered.values())
+        return {'events': dict(self.events),
+                'delivered': dict(self.delivered),
+                'frames': self.frames,
+                'events_per_frame': events / self.frames if self.frames else None,
+                'ratio': events / delivered if delivered else None}
+
+
+def _frozen(value):
+    return tuple(value) if value is not None else None
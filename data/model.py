@@ -18,9 +18,10 @@ passing a dictionary. Even then we will want to be able to merge two dicts
 selectively.
 """
 
-#import logging
+import logging
+import weakref
 
-#logger = logging.getLogger(__name__)
+logger = logging.getLogger(__name__)
 #_ch = logging.StreamHandler()
 #_ch.setLevel(logging.INFO)
 #_formatter = logging.Formatter("{asctime} - {levelname}: {message}", style="{")
@@ -30,12 +31,32 @@ selectively.
 class NodeTemplate:
 #    input_vars = []
 #    output_vars = []
+    input_types = {}    # noodlet name -> type, see `data.types`; untyped
+    output_types = {}   # noodlets accept anything
+    stream = None       # optional generator function, see `engine.stream`
+
     def __init__(self):
         pass
 
+    @staticmethod
+    def compute(inputs):
+        """
+        The compute hook of a node. Templates that can be executed override
+        this with a function that takes a dictionary of input values, keyed
+        on the names of the input noodlets, and returns a dictionary of
+        output values, keyed on the names of the output noodlets.
+
+        This is called by the workflow engine, possibly in another process,
+        so it should only depend on its arguments.
+        """
+        raise NotImplementedError
+
 from itertools import chain
 from collections import namedtuple
 
+from .spatial import GridIndex, node_rect
+from .types import Any, template_types, port_type, compatible, type_name
+
 Noodlet  = namedtuple('Noodlet', ['name', 'dtype', 'connector', 'direction', 'widget'])
       
 class Node:
@@ -82,6 +103,13 @@ class Node:
         
         """
         pass
+
+    def compute(self, inputs):
+        """
+        Compute the values on the output noodlets from those on the input
+        noodlets, see `NodeTemplate.compute`.
+        """
+        raise NotImplementedError
         
 class SimpleNode(Node):
     def __init__(self, template):
@@ -90,15 +118,23 @@ class SimpleNode(Node):
         self.extent = None          # auto-layout, table spanning
         self.location = None
         self.template = template
+        self.values = {}            # values of input noodlets that are not linked
         
     def input_noodlets(self):
+        types = template_types(self.template)[0]
         for v in self.template.input_vars:
-            yield Noodlet(name=v, dtype=int, connector=True, direction='in', widget=False)
+            yield Noodlet(name=v, dtype=types.get(v, Any), connector=True,
+                          direction='in', widget=False)
         
     def output_noodlets(self):
+        types = template_types(self.template)[1]
         for v in self.template.output_vars:
-            yield Noodlet(name=v, dtype=int, connector=True, direction='out', widget=False)
+            yield Noodlet(name=v, dtype=types.get(v, Any), connector=True,
+                          direction='out', widget=False)
         
+    def compute(self, inputs):
+        return self.template.compute(inputs)
+
     def items(self):
         for i in chain(iter(self.template.input_vars),
                         iter(self.template.output_vars)):
@@ -116,6 +152,7 @@ class DataModel:
     """
     def __init__(self):
         self._counter = 0
+        self._version = 0       # bumped on every edit of the tables below
         self._nodes = {}    # list of nodes with attributes of:
                             #    - location -- stored as integers in combination with auto-layout?
                             #    - extent -- also as integers? 
@@ -129,6 +166,17 @@ class DataModel:
                             # a type if they want.
                             
         self._inverse_links = {}   # speeds up searching
+
+        self._fan_in = {}   # input noodlet -> tuple of its sources, for the few
+                            # that don't take their values in sorted order
+
+        self._spatial = GridIndex() # node locations, for geometric queries
+
+        self._index_of = {}     # id(node) -> index, to find nodes by object
+        self._by_name = {}      # name -> index, see `rename_node`
+
+        self._observers = []    # weak references to snapshots and histories that
+                                # are told about every edit, see `data.history`
         
     def all_nodes(self):
         """
@@ -157,8 +205,19 @@ class DataModel:
         """
         i = self._counter
         self._counter += 1
-        
+        self._insert_node(i, node)
+        return i
+
+    def _insert_node(self, i, node):
+        self._version += 1
+        if self._observers:
+            self._touch('touch_node', i)
+
         self._nodes[i] = node
+        self._index_of[id(node)] = i
+        self._by_name[node.name] = i
+        if node.location is not None:
+            self._spatial.insert(i, node_rect(node))
         
         # make sure empty entries exists in the linking dicts
         for s in node.output_noodlets():
@@ -166,103 +225,388 @@ class DataModel:
         
         for s in node.input_noodlets():
             self._inverse_links[(i, s.name)] = set()
-            
-        return i
+
+    def extend(self, nodes, links=()):
+        """
+        Add many nodes, and links between them, at once. Links are given as
+        `((k, name), (l, name))`, where `k` and `l` are positions in `nodes`.
+        See `data.bulk`.
+
+        Returns: range of the new node indices.
+        """
+        from .bulk import extend
+        return extend(self, nodes, links)
 
     def add_link(self, a, b):
+        """
+        Link output noodlet `a` to input noodlet `b`, both given as
+        `(node index, name)`.
+
+        Raises: TypeError if the types of the noodlets don't fit, see
+            `data.types.compatible`.
+        """
+        src = port_type(self._nodes[a[0]], a[1], 'out')
+        dst = port_type(self._nodes[b[0]], b[1], 'in')
+        if not compatible(src, dst):
+            raise TypeError("Can't link {0} of type {1} to {2} of type {3}."
+                            .format(a, type_name(src), b, type_name(dst)))
+
+        self._version += 1
+        if self._observers:
+            self._touch('touch_link', a, b)
         self._links[a].add(b)
         self._inverse_links[b].add(a)
+        if b in self._fan_in:
+            self._fan_in[b] += (a,)
         #self._nodes[a].outbound.append(b)
         #self._nodes[b].inbound.append(a)
     
     def delete_link(self, a, b):
+        self._version += 1
+        if self._observers:
+            self._touch('touch_link', a, b)
         self._links[a].remove(b)
         self._inverse_links[b].remove(a)
+        if b in self._fan_in:
+            self._set_fan_in(b, [x for x in self._fan_in[b] if x != a])
 
     def links_to(self, b):
         return self._inverse_links[b]
+
+    def sources(self, b):
+        """
+        The output noodlets linked to input noodlet `b`, in the order in
+        which their values are passed to it: sorted, unless another order
+        was set with `set_order`. Links added later come last.
+        """
+        order = self._fan_in.get(b)
+        if order is not None:
+            return list(order)
+        return sorted(self._inverse_links[b])
+
+    def set_order(self, b, sources):
+        """
+        Set the order in which the values on the links to input noodlet
+        `b` are passed to it.
+
+        Raises: ValueError if `sources` are not the noodlets linked to `b`.
+        """
+        sources = list(sources)
+        if len(set(sources)) != len(sources) or set(sources) != self._inverse_links[b]:
+            raise ValueError("{0} are not the sources of {1}.".format(sources, b))
+
+        self._version += 1
+        if self._observers:
+            for a in sources:
+                self._touch('touch_link', a, b)
+        self._set_fan_in(b, sources)
+
+    def _set_fan_in(self, b, sources):
+        sources = tuple(sources)
+        if len(sources) > 1 and list(sources) != sorted(sources):
+            self._fan_in[b] = sources
+        else:
+            self._fan_in.pop(b, None)
                 
     def delete_links_to(self, b):
+        self._version += 1
         for a in self._inverse_links[b]:
+            if self._observers:
+                self._touch('touch_link', a, b)
             self._links[a].remove(b)
         self._inverse_links[b] = set()
-        
+        self._fan_in.pop(b, None)
+
+    def set_value(self, b, value):
+        """
+        Set the value of an input noodlet that is not linked, as when the
+        user edits it.
+        """
+        i, name = b
+        self._version += 1
+        if self._observers:
+            self._touch('touch_state', i)
+        self._nodes[i].values[name] = value
+
+    def move_node(self, i, location, extent=None):
+        """
+        Set the location (and optionally the extent) of node `i`, keeping
+        the spatial index up to date.
+        """
+        self._version += 1
+        if self._observers:
+            self._touch('touch_state', i)
+        node = self._nodes[i]
+        node.location = location
+        if extent is not None:
+            node.extent = extent
+        self._spatial.move(i, node_rect(node))
+
+    def move_nodes(self, locations):
+        """
+        Set the locations of many nodes at once, as a single edit, for
+        instance at the end of dragging a selection.
+
+        Arguments:
+            locations - dictionary of node index to location
+        """
+        self._version += 1
+        for i, location in locations.items():
+            if self._observers:
+                self._touch('touch_state', i)
+            node = self._nodes[i]
+            node.location = location
+            self._spatial.move(i, node_rect(node))
+
+    def set_state(self, i, location, extent, values):
+        """
+        Set the location, extent and input values of node `i` at once, as
+        when an edit is undone. Unlike with `move_node`, a location or
+        extent of `None` is set as well.
+        """
+        self._version += 1
+        if self._observers:
+            self._touch('touch_state', i)
+        node = self._nodes[i]
+        node.location = location
+        node.extent = extent
+        if getattr(node, 'values', values) != values:
+            node.values = dict(values)
+        if location is not None:
+            self._spatial.move(i, node_rect(node))
+        elif i in self._spatial:
+            self._spatial.remove(i)
+
+    def nodes_in(self, rect):
+        """
+        Find the nodes overlapping `rect`, given as `(x0, y0, x1, y1)`.
+
+        Returns: set of node indices.
+        """
+        return self._spatial.query(rect)
+
+    def nearest_node(self, x, y, max_distance=None):
+        """
+        Find the node closest to the point `(x, y)`.
+
+        Returns: (node index, distance) or (None, None).
+        """
+        return self._spatial.nearest(x, y, max_distance)
+
+    def _observe(self, observer):
+        """
+        Tell `observer` about every edit from now on, until it is garbage
+        collected or `_unobserve` is called. Before an edit changes
+        anything, one of these methods of the observer is called:
+
+            touch_node(i)       node `i` is added or removed
+            touch_state(i)      the location, extent, values or name of node `i` change
+            touch_link(a, b)    the link from `a` to `b` is added or removed
+
+        When the tables are replaced wholesale, as in compaction, the
+        observer is dropped and its `detach` method is called instead; it
+        may observe the model again from there.
+        """
+        observers = self._observers
+
+        def forget(r):
+            if r in observers:
+                observers.remove(r)
+
+        observers.append(weakref.ref(observer, forget))
+
+    def _unobserve(self, observer):
+        self._observers[:] = [r for r in self._observers if r() is not observer]
+
+    def _touch(self, method, *args):
+        for r in list(self._observers):
+            observer = r()
+            if observer is not None:
+                getattr(observer, method)(*args)
+
+    def _detach_observers(self):
+        observers = [r() for r in self._observers]
+        del self._observers[:]
+        for observer in observers:
+            if observer is not None:
+                observer.detach()
+
+    def snapshot(self):
+        """
+        A read-only view of the model as it is now, that doesn't change
+        when the model is edited. Taking a snapshot is constant time; see
+        `data.history`.
+
+        Returns: Snapshot
+        """
+        from .history import Snapshot
+        return Snapshot(self)
+
+    def index_of(self, node):
+        """
+        Find the index of a node object, in constant time.
+
+        Returns: int or None
+        """
+        i = self._index_of.get(id(node))
+        if i is not None and self._nodes.get(i) is node:
+            return i
+        return None
+
+    def find_node(self, name):
+        """
+        Find the index of a node by name, in constant time. A node that was
+        renamed other than with `rename_node` is only found by its old name.
+
+        Returns: int or None
+        """
+        i = self._by_name.get(name)
+        if i is not None and i in self._nodes and self._nodes[i].name == name:
+            return i
+        return None
+
+    def rename_node(self, i, name):
+        """
+        Rename node `i`, keeping the name index up to date.
+        """
+        node = self._nodes[i]
+        self._version += 1
+        if self._observers:
+            self._touch('touch_state', i)
+        if self._by_name.get(node.name) == i:
+            del self._by_name[node.name]
+        node.name = name
+        self._by_name[name] = i
+
+    def _resolve(self, node):
+        """
+        Turn an `int`, `Node` or `str` into a node index, see `delete_node`.
+        """
+        if isinstance(node, int):
+            if node in self._nodes:
+                return node
+        elif isinstance(node, Node):
+            i = self.index_of(node)
+            if i is not None:
+                return i
+        elif isinstance(node, str):
+            i = self.find_node(node)
+            if i is not None:
+                return i
+
+        logger.warning("Tried to delete an non-existing node: '{name}'.".format(name=node))
+        return None
+
     def _delete_node_by_index(self, idx):
-        # remove connections to the node
-        for s in self._nodes[idx].input_noodlets():
-            for j in self._inverse_links[(idx, s.name)]:
-                try:
-                    self._links[j].remove((idx, s.name))
-                except ValueError:
-                    logger.error(
-                        "Found a link in the `_inverse_links` dict" 
-                        " that is not represented in the `_links` dict.")
-                        
-            del self._inverse_links[(idx,s.name)]
-
-        # remove connections from the node
-        for s in self._nodes[idx].output_noodlets():
-            for j in self._links[(idx,s.name)]:
-                try:
-                    self._inverse_links[j].remove((idx,s.name))
-                except ValueError:
-                    logger.error(
-                        "Found a link in the `_links` dict" 
-                        " that is not represented in the `_inverse_links` dict.")                    
-
-            del self._links[(idx,s.name)]
-
-        # remove the node        
-        del self._nodes[idx]
+        self._delete_indices(set([idx]))
+
+    def _delete_indices(self, doomed):
+        """
+        Remove a set of nodes and all their links in one pass. Links between
+        two nodes that are both deleted are dropped without updating the
+        other side.
+        """
+        self._version += 1
+
+        if self._observers:
+            for idx in doomed:
+                node = self._nodes[idx]
+                for s in node.input_noodlets():
+                    b = (idx, s.name)
+                    for a in self._inverse_links[b]:
+                        self._touch('touch_link', a, b)
+                for s in node.output_noodlets():
+                    a = (idx, s.name)
+                    for b in self._links[a]:
+                        self._touch('touch_link', a, b)
+                self._touch('touch_node', idx)
+
+        for idx in doomed:
+            node = self._nodes[idx]
+
+            # remove connections to the node
+            for s in node.input_noodlets():
+                b = (idx, s.name)
+                self._fan_in.pop(b, None)
+                for a in self._inverse_links.pop(b):
+                    if a[0] in doomed:
+                        continue
+                    if b not in self._links[a]:
+                        logger.error(
+                            "Found a link in the `_inverse_links` dict"
+                            " that is not represented in the `_links` dict.")
+                    self._links[a].discard(b)
+
+            # remove connections from the node
+            for s in node.output_noodlets():
+                a = (idx, s.name)
+                for b in self._links.pop(a):
+                    if b[0] in doomed:
+                        continue
+                    if a not in self._inverse_links[b]:
+                        logger.error(
+                            "Found a link in the `_links` dict"
+                            " that is not represented in the `_inverse_links` dict.")
+                    self._inverse_links[b].discard(a)
+                    if b in self._fan_in:
+                        self._set_fan_in(b, [x for x in self._fan_in[b] if x != a])
+
+        # remove the nodes
+        for idx in doomed:
+            node = self._nodes.pop(idx)
+            self._index_of.pop(id(node), None)
+            if self._by_name.get(node.name) == idx:
+                del self._by_name[node.name]
+            if idx in self._spatial:
+                self._spatial.remove(idx)
             
     def delete_node(self, node):
         """
         Delete a node. This method covers three cases; where node is
             - `int`, index into the list of nodes
-            - `Node`, delete the node using list.remove
-            - `str`, search the node, then remove it
+            - `Node`, the node object itself
+            - `str`, the name of the node
+        Nodes are found through reverse indices, so this takes constant time
+        apart from removing the links.
         """
-        if isinstance(node, int):
-            self._delete_node_by_index(node)
-            return
-            
-        if isinstance(node, Node):
-            idx = self._nodes.index(node)
+        idx = self._resolve(node)
+        if idx is not None:
             self._delete_node_by_index(idx)
-            return
-            
-        if isinstance(node, str):
-            self._delete_node_by_name(node)
-            return
-            
+
+    def delete_nodes(self, nodes):
+        """
+        Delete many nodes at once; `nodes` can contain anything that
+        `delete_node` accepts.
+        """
+        doomed = set()
+        for node in nodes:
+            idx = self._resolve(node)
+            if idx is not None:
+                doomed.add(idx)
+        self._delete_indices(doomed)
+
     def _delete_node_by_name(self, name):
-        try:
-            self._delete_node_by_index(next(i for i,x 
-                in enumerate(self._nodes) 
-                if x.name == name))
-                
-        except StopIteration:
-            logger.warning("Tried to delete an non-existing node: '{name}'.".format(name=name))
+        self.delete_node(name)
     
     def _clean_indices(self):
         """
         Remap the indices to a compact range, makes for nicer storage.
+
+        Returns: dictionary mapping old to new indices.
         """
-        
-        # find the mapping between the indices and store it in a dict
-        old_to_new_d = dict((v, i) for i, v in enumerate(self._nodes.keys()))
-        
-        # to map the (int, str) tupled noodlets from old to new have a helper
-        old_to_new_f = lambda noodlet: (old_to_new_d[noodlet[0]], noodlet[1])
-        
-        # remap the nodes
-        self._nodes = dict((old_to_new_d[i], v) for i, v in self._nodes)
-        
-        # remap the links
-        self._links = dict((old_to_new_f(ndl1), [old_to_new_f(ndl2) for ndl2 in lst])
-                            for ndl1, lst in self._links)
-                            
-        # remap the inverse links
-        self._inverse_links = dict((old_to_new_f(ndl1), [old_to_new_f(ndl2) for ndl2 in lst])
-                            for ndl1, lst in self._inverse_links)
-        
+        from .compaction import snapshot, compact_tables, install
+
+        tables, remap = compact_tables(snapshot(self))
+        install(self, tables)
+        return remap
+
+    def compact(self, background=False):
+        """
+        Compact the node indices, see `data.compaction`.
+
+        Returns: remap table, or a `Compaction` if `background` is set.
+        """
+        if background:
+            from .compaction import Compaction
+            return Compaction(self)
+        return self._clean_indices()
@@ -0,0 +1,243 @@
+"""
+Spatial index over the locations of nodes. The plane is divided into square
+cells, and every node is registered in each cell its rectangle overlaps.
+Finding the nodes in a region then only has to look at the cells covering
+that region, instead of at every node in the model.
+
+Rectangles are given as `(x0, y0, x1, y1)` tuples in scene coordinates.
+
+The `DataModel` keeps one of these up to date as nodes are added, moved and
+deleted, so the scene can use it for culling, rubber-band selection and for
+finding the node under the cursor when a link is dropped.
+"""
+
+import math
+
+#: extent assumed for nodes that don't have one (yet)
+DEFAULT_EXTENT = (200, 150)
+
+
+def node_rect(node, default_extent=DEFAULT_EXTENT):
+    """
+    Bounding rectangle of a node from its `location` and `extent`.
+    """
+    x, y = node.location if node.location is not None else (0, 0)
+    w, h = node.extent if node.extent is not None else default_extent
+    return (x, y, x + w, y + h)
+
+
+def rect_distance(rect, x, y):
+    """
+    Distance from the point `(x, y)` to the rectangle; zero if the point
+    is inside.
+    """
+    x0, y0, x1, y1 = rect
+    dx = max(x0 - x, 0, x - x1)
+    dy = max(y0 - y, 0, y - y1)
+    return math.hypot(dx, dy)
+
+
+class GridIndex:
+    """
+    Grid-bucket spatial index.
+
+    Arguments:
+        cell - size of the grid cells in pixels. Should be in the order of
+            the size of a node.
+    """
+    def __init__(self, cell=256):
+        self.cell = cell
+        self._cells = {}    # (int, int) -> set of node indices
+        self._rects = {}    # node index -> rectangle
+        self._extent = None # range of occupied cells, only ever grows
+
+    @classmethod
+    def from_model(cls, model, cell=256, default_extent=DEFAULT_EXTENT):
+        index = cls(cell)
+        for i, node in model.all_nodes():
+            index.insert(i, node_rect(node, default_extent))
+        return index
+
+    def __len__(self):
+        return len(self._rects)
+
+    def __contains__(self, i):
+        return i in self._rects
+
+    def _span(self, rect):
+        x0, y0, x1, y1 = rect
+        c = self.cell
+        for cx in range(int(x0 // c), int(x1 // c) + 1):
+            for cy in range(int(y0 // c), int(y1 // c) + 1):
+                yield (cx, cy)
+
+    def insert(self, i, rect):
+        self._rects[i] = rect
+        for key in self._span(rect):
+            self._cells.setdefault(key, set()).add(i)
+
+        c = self.cell
+        cx0, cy0 = int(rect[0] // c), int(rect[1] // c)
+        cx1, cy1 = int(rect[2] // c), int(rect[3] // c)
+        if self._extent is None:
+            self._extent = [cx0, cy0, cx1, cy1]
+        else:
+            e = self._extent
+            e[0] = min(e[0], cx0); e[1] = min(e[1], cy0)
+            e[2] = max(e[2], cx1); e[3] = max(e[3], cy1)
+
+    def insert_many(self, items):
+        """
+        Insert many `(i, rect)` pairs at once. The cells are computed with
+        NumPy and filled one cell at a time, rather than one node at a time.
+        """
+        import numpy as np
+
+        items = list(items)
+        if not items:
+            return
+
+        ids = np.array([i for i, _ in items], dtype=np.int64)
+        rects = np.array([r for _, r in items], dtype=float).reshape(-1, 4)
+        self._rects.update(items)
+
+        cells = np.floor_divide(rects, self.cell).astype(np.int64)
+        cx0, cy0, cx1, cy1 = cells.T
+        nx, ny = cx1 - cx0 + 1, cy1 - cy0 + 1
+        count = nx * ny
+
+        # one entry per (node, cell) pair
+        k = np.arange(int(count.sum())) - np.repeat(np.cumsum(count) - count, count)
+        owner = np.repeat(np.arange(len(ids)), count)
+        x = cx0[owner] + k % nx[owner]
+        y = cy0[owner] + k // nx[owner]
+
+        order = np.lexsort((y, x))
+        x, y, members = x[order], y[order], ids[owner[order]]
+        edges = np.flatnonzero((np.diff(x) != 0) | (np.diff(y) != 0)) + 1
+        starts = np.concatenate([[0], edges]).tolist()
+        ends = np.concatenate([edges, [len(x)]]).tolist()
+        x, y, members = x.tolist(), y.tolist(), members.tolist()
+        for a, b in zip(starts, ends):
+            self._cells.setdefault((x[a], y[a]), set()).update(members[a:b])
+
+        lo = cells[:, :2].min(axis=0).tolist()
+        hi = cells[:, 2:].max(axis=0).tolist()
+        if self._extent is None:
+            self._extent = lo + hi
+        else:
+            e = self._extent
+            e[0] = min(e[0], lo[0]); e[1] = min(e[1], lo[1])
+            e[2] = max(e[2], hi[0]); e[3] = max(e[3], hi[1])
+
+    def remove(self, i):
+        rect = self._rects.pop(i)
+        for key in self._span(rect):
+            bucket = self._cells[key]
+            bucket.discard(i)
+            if not bucket:
+                del self._cells[key]
+
+    def move(self, i, rect):
+        """
+        Update the rectangle of node `i`, inserting it if needed.
+        """
+        if i in self._rects:
+            self.remove(i)
+        self.insert(i, rect)
+
+    def rect(self, i):
+        return self._rects[i]
+
+    def query(self, rect):
+        """
+        Find all nodes whose rectangle overlaps `rect`.
+
+        Returns: set of node indices
+        """
+        x0, y0, x1, y1 = rect
+        if self._extent is None:
+            return set()
+
+        # only the occupied part of the grid can hold anything
+        c = self.cell
+        e = self._extent
+        cx0, cy0 = max(int(x0 // c), e[0]), max(int(y0 // c), e[1])
+        cx1, cy1 = min(int(x1 // c), e[2]), min(int(y1 // c), e[3])
+        found = set()
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):
+            # zoomed out, or a sparse grid: fewer occupied cells than in the span
+            for (cx, cy), bucket in self._cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    found.update(bucket)
+        else:
+            cells = self._cells
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket:
+                        found.update(bucket)
+
+        rects = self._rects
+        return set(i for i in found
+                   if rects[i][0] <= x1 and rects[i][2] >= x0
+                   and rects[i][1] <= y1 and rects[i][3] >= y0)
+
+    def _ring(self, cx, cy, r):
+        if r == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-r, r + 1):
+            yield (cx + dx, cy - r)
+            yield (cx + dx, cy + r)
+        for dy in range(-r + 1, r):
+            yield (cx - r, cy + dy)
+            yield (cx + r, cy + dy)
+
+    def nearest(self, x, y, max_distance=None):
+        """
+        Find the node whose rectangle is closest to the point `(x, y)`.
+        The search visits rings of cells around the point, and stops as soon
+        as no cell further out can hold anything closer.
+
+        Returns: (node index, distance), or (None, None) if nothing is found
+            within `max_distance`.
+        """
+        if self._extent is None:
+            return None, None
+
+        c = self.cell
+        cx, cy = int(x // c), int(y // c)
+        e = self._extent
+        r_max = max(abs(cx - e[0]), abs(cx - e[2]), abs(cy - e[1]), abs(cy - e[3]))
+        if max_distance is not None:
+            r_max = min(r_max, int(max_distance // c) + 1)
+
+        best, best_d = None, None
+        seen = set()
+        for r in range(r_max + 1):
+            # anything in ring r is at least (r - 1) * c away
+            if best_d is not None and best_d <= (r - 1) * c:
+                break
+            for key in self._ring(cx, cy, r):
+                for i in self._cells.get(key, ()):
+                    if i in seen:
+                        continue
+                    seen.add(i)
+                    d = rect_distance(self._rects[i], x, y)
+                    if best_d is None or d < best_d:
+                        best, best_d = i, d
+
+        if best is None or (max_distance is not None and best_d > max_distance):
+            return None, None
+        return best, best_d
+
+    def bounds(self):
+        """
+        Rectangle enclosing all nodes, or None if the index is empty.
+        """
+        if not self._rects:
+            return None
+        r = list(self._rects.values())
+        return (min(a[0] for a in r), min(a[1] for a in r),
+                max(a[2] for a in r), max(a[3] for a in r))
@@ -0,0 +1,456 @@
+"""
+Saving and opening a `DataModel`. The primary format is a binary file that
+can be memory-mapped, so that opening even a very large workflow only reads
+the header. Nodes are materialised when they are first looked up, and the
+link dictionaries are built when they are first needed.
+
+Layout of the binary file (little-endian, sections aligned to 8 bytes):
+
+    header      magic, version, node counter, number of nodes, links,
+                strings and orders, the offsets of the sections below, and
+                the size of the values
+    strings     `n_strings + 1` offsets (u4) into a blob of utf-8 text
+    nodes       one 32-byte record per node, sorted by index:
+                index, name, template, flags, location (2 x i4), extent (2 x i4)
+    links       one 16-byte record per link:
+                source node, source noodlet, target node, target noodlet
+    orders      the explicit orders of the links into an input noodlet (see
+                `DataModel.set_order`), as link records, one order after
+                the other
+    values      pickled dictionary of node index to the values set on its
+                input noodlets, for the nodes that have any
+
+Names of nodes, noodlets and templates are stored in the string table. A
+template is referenced by `module:qualname`, and imported when a node using
+it is materialised. The values are unpickled when the first node is
+materialised; as they are pickled, only open files you trust.
+
+A human-readable YAML version of the same information can be written with
+`save_yaml` and read back with `load_yaml`. There the values have to be
+plain data; NumPy arrays are written as lists.
+"""
+
+import mmap
+import pickle
+import struct
+import importlib
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from .model import DataModel, SimpleNode
+from .spatial import GridIndex, DEFAULT_EXTENT
+
+MAGIC = b"NOODLES\0"
+VERSION = 1
+
+_header = struct.Struct('<8sIIIIII7Q')
+
+_node_dtype = np.dtype([('index', '<u4'), ('name', '<u4'), ('template', '<u4'),
+                        ('flags', '<u4'), ('location', '<i4', 2), ('extent', '<i4', 2)])
+
+_link_dtype = np.dtype([('src', '<u4'), ('src_port', '<u4'),
+                        ('dst', '<u4'), ('dst_port', '<u4')])
+
+_HAS_LOCATION = 1
+_HAS_EXTENT = 2
+
+
+def template_reference(template):
+    return "{0}:{1}".format(template.__module__, template.__qualname__)
+
+
+def resolve_template(reference):
+    module, _, qualname = reference.partition(':')
+    obj = importlib.import_module(module)
+    for name in qualname.split('.'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def _new_node(template, name, location, extent):
+    node = SimpleNode(template)
+    node.name = name
+    node.location = location
+    node.extent = extent
+    return node
+
+
+def _templated(items):
+    """
+    Check that every node in `items` has a template, and can be saved.
+
+    Raises: ValueError naming the first node without one, such as a
+        `CompositeNode`.
+    """
+    for i, node in items:
+        if getattr(node, 'template', None) is None:
+            raise ValueError(
+                "Node {0} ('{1}') has no template, so it can't be saved; if it is a "
+                "composite node, expand it first.".format(i, node.name))
+    return items
+
+
+def save(model, path):
+    """
+    Write `model` to `path` in the binary format.
+
+    Raises: ValueError if a node has no `template` attribute, like a
+        `CompositeNode`; expand those first.
+    """
+    strings = {}
+
+    def intern(s):
+        return strings.setdefault(s, len(strings))
+
+    items = _templated(sorted(model.all_nodes()))
+    nodes = np.zeros(len(items), dtype=_node_dtype)
+    for k, (i, node) in enumerate(items):
+        nodes['index'][k] = i
+        nodes['name'][k] = intern(node.name)
+        nodes['template'][k] = intern(template_reference(node.template))
+        if node.location is not None:
+            nodes['flags'][k] |= _HAS_LOCATION
+            nodes['location'][k] = node.location
+        if node.extent is not None:
+            nodes['flags'][k] |= _HAS_EXTENT
+            nodes['extent'][k] = node.extent
+
+    links = np.array([(i, intern(n), j, intern(m))
+                      for (i, n), (j, m) in model.all_links()],
+                     dtype=_link_dtype)
+    orders = np.array([(i, intern(n), j, intern(m))
+                       for (j, m), order in sorted(getattr(model, '_fan_in', {}).items())
+                       for i, n in order],
+                      dtype=_link_dtype)
+    values = dict((i, dict(node.values)) for i, node in items
+                  if getattr(node, 'values', None))
+    pickled = pickle.dumps(values, pickle.HIGHEST_PROTOCOL) if values else b""
+
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+    np.cumsum([len(s) for s in encoded], out=offsets[1:])
+    blob = b"".join(encoded)
+
+    off_index = _align(_header.size)
+    off_blob = _align(off_index + offsets.nbytes)
+    off_nodes = _align(off_blob + len(blob))
+    off_links = _align(off_nodes + nodes.nbytes)
+    off_orders = _align(off_links + links.nbytes)
+    off_values = _align(off_orders + orders.nbytes)
+
+    with open(path, 'wb') as f:
+        f.write(_header.pack(MAGIC, VERSION, model._counter, len(nodes),
+                             len(links), len(encoded), len(orders),
+                             off_index, off_blob, off_nodes, off_links, off_orders,
+                             off_values, len(pickled)))
+        for offset, data in ((off_index, offsets.tobytes()), (off_blob, blob),
+                             (off_nodes, nodes.tobytes()), (off_links, links.tobytes()),
+                             (off_orders, orders.tobytes()), (off_values, pickled)):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(data)
+
+
+class _StringTable:
+    def __init__(self, buffer, offset, blob, count):
+        self._offsets = np.frombuffer(buffer, dtype='<u4', count=count + 1, offset=offset)
+        self._buffer = buffer
+        self._blob = blob
+        self._cache = {}
+
+    def __getitem__(self, k):
+        try:
+            return self._cache[k]
+        except KeyError:
+            a = self._blob + int(self._offsets[k])
+            b = self._blob + int(self._offsets[k + 1])
+            s = self._cache[k] = self._buffer[a:b].decode('utf-8')
+            return s
+
+
+class LazyNodes(MutableMapping):
+    """
+    Dictionary of nodes backed by the node records in a mapped file. A
+    node object is only created the first time it is looked up.
+
+    Arguments:
+        records - node records
+        strings - the string table
+        values - function that returns the saved values, see `saved_values`
+        index_of - dictionary to enter `id(node) -> index` in, for every
+            node that is materialised
+    """
+    def __init__(self, records, strings, values=dict, index_of=None):
+        self._records = records
+        self._strings = strings
+        self._values = values
+        self._index_of = index_of if index_of is not None else {}
+        self._templates = {}
+        self._cache = {}
+        self._deleted = set()
+        self._added = set()
+
+    def template(self, k):
+        """
+        The template class for string id `k`.
+        """
+        try:
+            return self._templates[k]
+        except KeyError:
+            t = self._templates[k] = resolve_template(self._strings[k])
+            return t
+
+    def saved_values(self):
+        """
+        Dictionary of node index to the saved values of its input noodlets.
+        """
+        if callable(self._values):
+            self._values = self._values()
+        return self._values
+
+    def _find(self, i):
+        k = int(np.searchsorted(self._records['index'], i))
+        if k < len(self._records) and self._records['index'][k] == i:
+            return k
+        return None
+
+    def __getitem__(self, i):
+        try:
+            return self._cache[i]
+        except KeyError:
+            pass
+
+        k = None if i in self._deleted else self._find(i)
+        if k is None:
+            raise KeyError(i)
+
+        r = self._records[k]
+        node = _new_node(
+            self.template(int(r['template'])), self._strings[int(r['name'])],
+            r['location'].tolist() if r['flags'] & _HAS_LOCATION else None,
+            r['extent'].tolist() if r['flags'] & _HAS_EXTENT else None)
+        node.values = dict(self.saved_values().get(i, {}))
+        self._cache[i] = node
+        self._index_of[id(node)] = i
+        return node
+
+    def __setitem__(self, i, node):
+        self._cache[i] = node
+        if i in self._deleted:
+            self._deleted.discard(i)
+        elif self._find(i) is None:
+            self._added.add(i)
+
+    def __delitem__(self, i):
+        self[i]
+        del self._cache[i]
+        if i in self._added:
+            self._added.discard(i)
+        else:
+            self._deleted.add(i)
+
+    def __iter__(self):
+        for i in self._records['index'].tolist():
+            if i not in self._deleted:
+                yield i
+        for i in sorted(self._added):
+            yield i
+
+    def __len__(self):
+        return len(self._records) - len(self._deleted) + len(self._added)
+
+    def __contains__(self, i):
+        return i in self._cache or (i not in self._deleted and self._find(i) is not None)
+
+
+class MappedDataModel(DataModel):
+    """
+    A `DataModel` opened from a binary file with `load`. The links, the
+    name index and the spatial index are built on first use.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version = struct.unpack_from('<8sI', self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError("'{0}' is not a Noodles workflow.".format(path))
+        if version > VERSION:
+            raise ValueError("'{0}' has format version {1}, we only know up to {2}."
+                             .format(path, version, VERSION))
+
+        _, _, counter, n_nodes, n_links, n_strings, n_orders, \
+            off_index, off_blob, off_nodes, off_links, off_orders, off_values, n_values = \
+            _header.unpack_from(self._mmap, 0)
+
+        self._counter = counter
+        self._version = 0
+        self._index_of = {}
+        self._observers = []
+        self._strings = _StringTable(self._mmap, off_index, off_blob, n_strings)
+        self._nodes = LazyNodes(
+            np.frombuffer(self._mmap, dtype=_node_dtype, count=n_nodes, offset=off_nodes),
+            self._strings,
+            lambda: pickle.loads(self._mmap[off_values:off_values + n_values])
+            if n_values else {},
+            self._index_of)
+        self._link_records = np.frombuffer(
+            self._mmap, dtype=_link_dtype, count=n_links, offset=off_links)
+
+        self._fan_in = {}
+        names = self._strings
+        for i, n, j, m in np.frombuffer(self._mmap, dtype=_link_dtype, count=n_orders,
+                                         offset=off_orders).tolist():
+            b = (j, names[m])
+            self._fan_in[b] = self._fan_in.get(b, ()) + ((i, names[n]),)
+
+    def __getattr__(self, name):
+        if name in ('_links', '_inverse_links'):
+            self._build_links()
+            return self.__dict__[name]
+        if name == '_spatial':
+            self._build_spatial()
+            return self.__dict__[name]
+        if name == '_by_name':
+            self._build_names()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    def _build_names(self):
+        """
+        Build the name index straight from the node records.
+        """
+        nodes = self._nodes
+        records = nodes._records
+        names = self._strings
+        self._by_name = dict((names[k], i) for i, k in zip(records['index'].tolist(),
+                                                           records['name'].tolist())
+                             if i not in nodes._deleted)
+
+    def _build_spatial(self):
+        """
+        Build the spatial index straight from the node records.
+        """
+        nodes = self._nodes
+        records = nodes._records
+        located = (records['flags'] & _HAS_LOCATION) != 0
+        extent = np.where(((records['flags'] & _HAS_EXTENT) != 0)[:, None],
+                          records['extent'], np.array(DEFAULT_EXTENT))
+        corner = records['location'] + extent
+
+        index = GridIndex()
+        for i, (x0, y0), (x1, y1) in zip(records['index'][located].tolist(),
+                                         records['location'][located].tolist(),
+                                         corner[located].tolist()):
+            if i not in nodes._deleted:
+                index.insert(i, (x0, y0, x1, y1))
+        self._spatial = index
+
+    def _build_links(self):
+        """
+        Build the link dictionaries from the link records. The noodlets of
+        each node are taken from its template, so this does not materialise
+        the nodes.
+        """
+        nodes = self._nodes
+        ports = {}
+        for k in np.unique(nodes._records['template']).tolist():
+            prototype = SimpleNode(nodes.template(k))
+            ports[k] = ([s.name for s in prototype.output_noodlets()],
+                        [s.name for s in prototype.input_noodlets()])
+
+        links = {}
+        inverse_links = {}
+        records = nodes._records
+        for i, k in zip(records['index'].tolist(), records['template'].tolist()):
+            if i in nodes._deleted:
+                continue
+            for n in ports[k][0]:
+                links[(i, n)] = set()
+            for n in ports[k][1]:
+                inverse_links[(i, n)] = set()
+
+        names = self._strings
+        for i, n, j, m in self._link_records.tolist():
+            a, b = (i, names[n]), (j, names[m])
+            links[a].add(b)
+            inverse_links[b].add(a)
+
+        self._links = links
+        self._inverse_links = inverse_links
+
+
+def load(path):
+    """
+    Open a workflow saved with `save`.
+
+    Returns: MappedDataModel
+    """
+    return MappedDataModel(path)
+
+
+def to_dict(model):
+    """
+    Plain data version of the model, as written by `save_yaml`.
+
+    Raises: ValueError if a node has no `template` attribute, see `save`.
+    """
+    items = _templated(sorted(model.all_nodes()))
+    return {
+        'version': VERSION,
+        'counter': model._counter,
+        'nodes': [{'index': i, 'name': node.name,
+                   'template': template_reference(node.template),
+                   'location': list(node.location) if node.location is not None else None,
+                   'extent': list(node.extent) if node.extent is not None else None,
+                   'values': dict((name, _plain(v)) for name, v in
+                                  getattr(node, 'values', {}).items())}
+                  for i, node in items],
+        'links': [[list(a), list(b)] for a, b in model.all_links()],
+        'orders': [[list(b), [list(a) for a in order]]
+                   for b, order in sorted(getattr(model, '_fan_in', {}).items())]}
+
+
+def _plain(value):
+    # NumPy arrays and scalars, as lists and numbers
+    return value.tolist() if hasattr(value, 'tolist') else value
+
+
+def from_dict(data):
+    """
+    Rebuild a `DataModel` from the output of `to_dict`, keeping the node
+    indices.
+    """
+    model = DataModel()
+    templates = {}
+    for n in data['nodes']:
+        if n['template'] not in templates:
+            templates[n['template']] = resolve_template(n['template'])
+        model._counter = n['index']
+        node = _new_node(templates[n['template']], n['name'], n['location'], n['extent'])
+        node.values = dict(n.get('values') or {})
+        model.add_node(node)
+    model._counter = data['counter']
+
+    for a, b in data['links']:
+        model.add_link(tuple(a), tuple(b))
+    for b, order in data.get('orders', ()):
+        model.set_order(tuple(b), [tuple(a) for a in order])
+    return model
+
+
+def save_yaml(model, path):
+    import yaml
+    data = to_dict(model)
+    with open(path, 'w') as f:
+        yaml.safe_dump(data, f, default_flow_style=None, sort_keys=False)
+
+
+def load_yaml(path):
+    import yaml
+    with open(path, 'r') as f:
+        return from_dict(yaml.safe_load(f))
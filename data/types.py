@@ -0,0 +1,377 @@
+"""
+Types of noodlets. A `NodeTemplate` gives the type of each of its noodlets
+in `input_types` and `output_types`; noodlets without one accept anything.
+Following the list in the docstring of `Node.inuput_noodlets`, a type is one
+of:
+
+    int, float, ...         a primitive: any Python class
+    "integer", "string"     a primitive by keyword, see `KEYWORDS`
+    Choice("A", "B", "C")   list-selector
+    Dict(name=type, ...)    dictionary with these keys (at least)
+    List(type)              list
+    Tuple(type, ...)        tuple
+    Record(name=type, ...)  named tuple
+    Table(Record(...))      list of named tuples
+    Any                     anything
+
+Plain containers are short-hands: `[int]` is `List(int)`, `(int, str)` is
+`Tuple(int, str)` and `{'x': float}` is `Dict(x=float)`.
+
+An output can be linked to an input if `compatible(output type, input
+type)`: the types are equal, the input is `Any`, a number is widened
+(int to rational to float to complex), a choice goes into a wider
+choice or a string, or containers are compatible item by item. A dict or
+record may have more fields than the input asks for.
+
+To check many links at once, and to find all valid targets of a noodlet
+without looking at every port, the `CompatibilityIndex` numbers the types
+it has seen and keeps a boolean matrix of which type goes into which.
+"""
+
+import numbers
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
+
+
+class DType:
+    """
+    Base class of the structured types. Types are immutable and compare by
+    value, so they can be used as dictionary keys.
+    """
+    __slots__ = ('args',)
+
+    def __init__(self, *args):
+        self.args = args
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.args == other.args
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.args))
+
+    def __repr__(self):
+        return "{0}({1})".format(type(self).__name__, ", ".join(map(type_name, self.args)))
+
+    def __str__(self):
+        return repr(self)
+
+
+class _Any(DType):
+    def __repr__(self):
+        return "Any"
+
+
+Any = _Any()
+
+
+class Choice(DType):
+    def __init__(self, *options):
+        super(Choice, self).__init__(*options)
+
+    def __str__(self):
+        return " | ".join(repr(o) for o in self.args)
+
+
+class List(DType):
+    def __init__(self, item):
+        super(List, self).__init__(dtype(item))
+
+    @property
+    def item(self):
+        return self.args[0]
+
+    def __str__(self):
+        return "[{0}]".format(type_name(self.item))
+
+
+class Table(List):
+    def __init__(self, record):
+        super(Table, self).__init__(record)
+
+    def __str__(self):
+        return "table {0}".format(type_name(self.item))
+
+
+class Tuple(DType):
+    def __init__(self, *items):
+        super(Tuple, self).__init__(*(dtype(t) for t in items))
+
+    def __str__(self):
+        return "({0})".format(", ".join(map(type_name, self.args)))
+
+
+class Dict(DType):
+    def __init__(self, fields=None, **kwargs):
+        fields = dict(fields or (), **kwargs)
+        super(Dict, self).__init__(*sorted((k, dtype(t)) for k, t in fields.items()))
+
+    @property
+    def fields(self):
+        return dict(self.args)
+
+    def __repr__(self):
+        return "{0}({1})".format(type(self).__name__, ", ".join(
+            "{0}={1}".format(k, type_name(t)) for k, t in self.args))
+
+    def __str__(self):
+        return "{{{0}}}".format(", ".join(
+            "{0}: {1}".format(k, type_name(t)) for k, t in self.args))
+
+
+class Record(Dict):
+    def __str__(self):
+        return "({0})".format(", ".join(
+            "{0}: {1}".format(k, type_name(t)) for k, t in self.args))
+
+
+#: primitive types by keyword
+KEYWORDS = {'integer': int, 'float': float, 'complex': complex,
+            'rational': numbers.Rational, 'char': str, 'string': str}
+
+#: numbers can be widened from left to right
+NUMBERS = [numbers.Integral, numbers.Rational, numbers.Real, numbers.Complex]
+
+
+def dtype(spec):
+    """
+    Normalise a type given in any of the forms in the module docstring.
+    """
+    if spec is None:
+        return Any
+    if isinstance(spec, (DType, type)):
+        return spec
+    if isinstance(spec, str):
+        return KEYWORDS[spec]
+    if isinstance(spec, list) and len(spec) == 1:
+        return List(spec[0])
+    if isinstance(spec, tuple):
+        return Tuple(*spec)
+    if isinstance(spec, dict):
+        return Dict(spec)
+    raise TypeError("Not a noodlet type: {0!r}".format(spec))
+
+
+def type_name(t):
+    """
+    Short name of a type, as shown on a noodlet.
+    """
+    if isinstance(t, type):
+        return t.__name__
+    return str(t)
+
+
+@lru_cache(maxsize=None)
+def compatible(src, dst):
+    """
+    Can an output of type `src` be linked to an input of type `dst`? Both
+    should be normalised with `dtype`.
+    """
+    if dst is Any or src is Any or src == dst:
+        return True
+
+    if isinstance(src, type) and isinstance(dst, type):
+        if dst is not bool and _rank(src) is not None and _rank(dst) is not None:
+            return _rank(src) <= _rank(dst)
+        return issubclass(src, dst)
+
+    if isinstance(src, Choice):
+        if isinstance(dst, Choice):
+            return set(src.args) <= set(dst.args)
+        return dst is str and all(isinstance(o, str) for o in src.args)
+
+    if isinstance(src, List) and isinstance(dst, List):
+        return compatible(src.item, dst.item)
+
+    if isinstance(src, Tuple) and isinstance(dst, Tuple):
+        return len(src.args) == len(dst.args) \
+            and all(compatible(a, b) for a, b in zip(src.args, dst.args))
+
+    if isinstance(src, Dict) and isinstance(dst, Dict):
+        fields = src.fields
+        return all(k in fields and compatible(fields[k], t) for k, t in dst.args)
+
+    return False
+
+
+def _rank(t):
+    for k, abc in enumerate(NUMBERS):
+        if issubclass(t, abc):
+            return k
+    return None
+
+
+_template_types = {}
+
+
+def template_types(template):
+    """
+    The normalised input and output types of a template, computed once.
+
+    Returns: (dict of input types, dict of output types)
+    """
+    try:
+        return _template_types[template]
+    except KeyError:
+        inputs = getattr(template, 'input_types', {})
+        outputs = getattr(template, 'output_types', {})
+        types = _template_types[template] = (
+            dict((name, dtype(t)) for name, t in inputs.items()),
+            dict((name, dtype(t)) for name, t in outputs.items()))
+        return types
+
+
+def port_type(node, name, direction):
+    """
+    Type of noodlet `name` of `node`, where `direction` is 'in' or 'out'.
+    """
+    template = getattr(node, 'template', None)
+    if template is not None:
+        return template_types(template)[direction == 'out'].get(name, Any)
+
+    noodlets = node.input_noodlets() if direction == 'in' else node.output_noodlets()
+    for s in noodlets:
+        if s.name == name:
+            return dtype(s.dtype)
+    return Any
+
+
+class CompatibilityIndex:
+    """
+    Numbers types, and keeps `matrix[i, j]`, which tells if type number `i`
+    can be linked to type number `j`. The matrix grows by one row and column
+    per new type.
+    """
+    def __init__(self):
+        self.types = []
+        self._ids = {}
+        self._matrix = None
+        self._targets = {}
+        self._sources = {}
+
+    def __len__(self):
+        return len(self.types)
+
+    def id(self, t):
+        """
+        The number of type `t`, adding it if it's new.
+        """
+        try:
+            return self._ids[t]
+        except KeyError:
+            pass
+
+        import numpy as np
+
+        k = len(self.types)
+        self.types.append(t)
+        self._ids[t] = k
+        matrix = np.zeros((k + 1, k + 1), dtype=bool)
+        if self._matrix is not None:
+            matrix[:k, :k] = self._matrix
+        matrix[k, :] = [compatible(t, u) for u in self.types]
+        matrix[:, k] = [compatible(u, t) for u in self.types]
+        self._matrix = matrix
+        self._targets.clear()
+        self._sources.clear()
+        return k
+
+    @property
+    def matrix(self):
+        return self._matrix
+
+    def targets(self, t):
+        """
+        Numbers of all types that an output of type `t` can be linked to.
+
+        Returns: frozenset
+        """
+        k = self.id(t)
+        try:
+            return self._targets[k]
+        except KeyError:
+            s = self._targets[k] = frozenset(self._matrix[k].nonzero()[0].tolist())
+            return s
+
+    def sources(self, t):
+        """
+        Numbers of all types that can be linked to an input of type `t`.
+
+        Returns: frozenset
+        """
+        k = self.id(t)
+        try:
+            return self._sources[k]
+        except KeyError:
+            s = self._sources[k] = frozenset(self._matrix[:, k].nonzero()[0].tolist())
+            return s
+
+    def check(self, src, dst):
+        """
+        Check many links at once, given the type numbers of their ends as
+        integer arrays.
+
+        Returns: boolean array
+        """
+        import numpy as np
+        return self._matrix[np.asarray(src, dtype=np.intp), np.asarray(dst, dtype=np.intp)]
+
+
+#: the index shared by the model, the scene and validation
+INDEX = CompatibilityIndex()
+
+
+def mismatches(model, index=INDEX):
+    """
+    All links in `model` whose types don't fit, checked in one pass: the
+    link dictionaries are flattened into arrays of node indices and
+    noodlet names without a Python loop over the links, which are mapped
+    to type numbers through a table per template, and checked against the
+    compatibility matrix at once.
+
+    Returns: list of `(a, b)` links
+    """
+    import numpy as np
+
+    forward = model._links
+    counts = np.fromiter(map(len, forward.values()), dtype=np.intp, count=len(forward))
+    if not counts.sum():
+        return []
+
+    # number the templates (or nodes without one) and the noodlet names
+    nodes = model._nodes
+    keys = [getattr(node, 'template', None) or id(node) for node in nodes.values()]
+    kinds = dict(zip(keys, nodes.values()))
+    number = dict((key, k) for k, key in enumerate(kinds))
+    kind_of = np.zeros(max(nodes) + 1, dtype=np.intp)
+    kind_of[np.fromiter(nodes, dtype=np.intp, count=len(nodes))] = \
+        np.fromiter(map(number.__getitem__, keys), dtype=np.intp, count=len(keys))
+
+    names = {}
+    tables = ([], [])
+    for node in kinds.values():
+        for table, direction, noodlets in ((tables[0], 'out', node.output_noodlets()),
+                                           (tables[1], 'in', node.input_noodlets())):
+            table.append(dict((names.setdefault(s.name, len(names)),
+                               index.id(port_type(node, s.name, direction)))
+                              for s in noodlets))
+
+    def type_ids(table, noodlets):
+        ids = np.full((len(kinds), len(names)), -1, dtype=np.intp)
+        for k, row in enumerate(table):
+            for name, t in row.items():
+                ids[k, name] = t
+        n = len(noodlets)
+        i = np.fromiter(map(itemgetter(0), noodlets), dtype=np.intp, count=n)
+        name = np.fromiter(map(names.__getitem__, map(itemgetter(1), noodlets)),
+                           dtype=np.intp, count=n)
+        return ids[kind_of[i], name]
+
+    src = np.repeat(type_ids(tables[0], forward), counts)
+    dst = type_ids(tables[1], list(chain.from_iterable(forward.values())))
+
+    bad = (~index.check(src, dst)).nonzero()[0].tolist()
+    if not bad:
+        return []
+    links = list(model.all_links())
+    return [links[k] for k in bad]
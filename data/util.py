@@ -0,0 +1,22 @@
+"""
+Small helpers shared by the data model modules.
+"""
+
+import gc
+from contextlib import contextmanager
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector. Building many containers at once
+    triggers collections over and over, while none of the new objects can
+    be garbage yet.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
@@ -0,0 +1,132 @@
+"""
+A memory-bounded cache of node results. Results are keyed on what the node
+computes, see `node_key`, and a hash of its input values, so a node that sees the same inputs again doesn't
+need to run. When the cache grows beyond its budget, the least recently used
+results are evicted.
+
+The size of a result is estimated with `sizeof`; for arrays this uses
+`nbytes`, for containers it adds up the items.
+"""
+
+import sys
+import pickle
+import hashlib
+from collections import OrderedDict
+
+
+def sizeof(value):
+    """
+    Estimate the memory footprint of `value` in bytes.
+    """
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def input_hash(inputs):
+    """
+    Hash a dictionary of input values. Values that can't be pickled are
+    hashed by their `repr`.
+    """
+    items = sorted(inputs.items())
+    try:
+        data = pickle.dumps(items, protocol=4)
+    except Exception:
+        data = repr(items).encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def node_key(node):
+    """
+    What identifies the computation of `node` apart from its inputs: its
+    template as `module:qualname` and its values. A composite node is
+    identified by the nodes inside it, their links and its ports; other
+    nodes without a template only by themselves.
+    """
+    template = getattr(node, 'template', None)
+    if template is not None:
+        kind = "{0}:{1}".format(template.__module__, template.__qualname__)
+    elif hasattr(node, 'all_nodes'):
+        kind = input_hash({'': (
+            sorted((i, node_key(n)) for i, n in node.all_nodes()),
+            sorted(node.all_links()), node.inputs, node.outputs,
+            sorted(node.feeds.items()), sorted(node.fan_in.items()))})
+    else:
+        kind = "{0}:{1}@{2:x}".format(type(node).__module__, type(node).__qualname__, id(node))
+    return "{0}/{1}".format(kind, input_hash(getattr(node, 'values', {})))
+
+
+class ResultCache:
+    """
+    LRU cache of node outputs.
+
+    Arguments:
+        max_bytes - memory budget for the cached results
+
+    Attributes:
+        hits, misses, evictions - counters
+        size - current estimated size in bytes
+    """
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (outputs, size)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Look up the outputs for `key`, a `(node, input hash)` pair.
+
+        Returns: outputs or None
+        """
+        try:
+            outputs, _ = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return outputs
+
+    def put(self, key, outputs):
+        """
+        Store outputs. A result that is larger than the entire budget is
+        not stored.
+        """
+        size = sizeof(outputs)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self.size -= self._entries.pop(key)[1]
+
+        self._entries[key] = (outputs, size)
+        self.size += size
+
+        while self.size > self.max_bytes:
+            _, (_, s) = self._entries.popitem(last=False)
+            self.size -= s
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self):
+        """
+        Returns: dictionary with the counters and the current size.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'entries': len(self._entries),
+                'bytes': self.size}
@@ -0,0 +1,279 @@
+"""
+Command line interface. Everything but the `gui` command runs without Qt:
+the GUI is only imported when it is asked for, so workers that load and
+run workflows don't pay for it.
+
+    python -m engine.cli info workflow.noodles
+    python -m engine.cli validate workflow.yaml
+    python -m engine.cli run workflow.noodles --pool process --workers 8
+    python -m engine.cli run workflow.noodles --trace trace.json
+    python -m engine.cli run workflow.noodles --compile
+    python -m engine.cli run workflow.noodles --stream --capacity 16
+    python -m engine.cli run workflow.noodles --cluster 4
+    python -m engine.cli run workflow.noodles --listen 0.0.0.0:7313 --workers 8
+    python -m engine.cli worker coordinator-host:7313 --host 10.0.0.5
+    python -m engine.cli export workflow.noodles workflow.yaml
+    python -m engine.cli gui testing.adder:test_model --mode item
+
+A workflow is given as a file in the binary format (see `data.storage`),
+a `.yaml`/`.yml` file, or a `module:attribute` reference to a `DataModel`
+in Python.
+"""
+
+import os
+import sys
+import argparse
+import importlib
+
+YAML_EXTENSIONS = ('.yaml', '.yml')
+
+
+def load(source):
+    """
+    Load a workflow from a file or a `module:attribute` reference.
+
+    Returns: DataModel
+    """
+    if not os.path.exists(source) and ':' in source:
+        module, _, attribute = source.partition(':')
+        obj = importlib.import_module(module)
+        for name in attribute.split('.'):
+            obj = getattr(obj, name)
+        return obj
+
+    from data import storage
+    if os.path.splitext(source)[1].lower() in YAML_EXTENSIONS:
+        return storage.load_yaml(source)
+    return storage.load(source)
+
+
+def info(args):
+    model = load(args.workflow)
+    n_nodes = sum(1 for _ in model.all_nodes())
+    n_links = sum(1 for _ in model.all_links())
+    print("{0}: {1} nodes, {2} links".format(args.workflow, n_nodes, n_links))
+    return 0
+
+
+def validate(args):
+    from .validate import problems
+
+    found = list(problems(load(args.workflow)))
+    for p in found:
+        print(p)
+    if not found:
+        print("{0}: ok".format(args.workflow))
+    return 1 if found else 0
+
+
+def run(args):
+    from .executor import Executor
+
+    model = load(args.workflow)
+    if args.compile:
+        return run_compiled(model, args)
+    if args.stream:
+        return run_stream(model, args)
+    if args.cluster or args.listen:
+        return run_distributed(model, args)
+    transport = None
+    if args.shared_memory:
+        from .transport import Transport
+        transport = Transport()
+    trace = None
+    if args.trace:
+        from .trace import Trace
+        trace = Trace()
+    try:
+        result = Executor(model, workers=args.workers, pool=args.pool,
+                          transport=transport, trace=trace).run()
+    except ValueError as e:
+        # a cycle, or an input without a value; see `validate`
+        print(e, file=sys.stderr)
+        return 1
+
+    sinks = set(i for i, _ in model.all_nodes())
+    for (i, _), _ in model.all_links():
+        sinks.discard(i)
+    for (i, name), value in sorted(result.values.items()):
+        if args.all or i in sinks:
+            print("{0} {1}: {2!r}".format(model._nodes[i].name, name, value))
+
+    if args.profile:
+        path, total = result.critical_path()
+        print("ran {0} nodes in {1:.3f}s, critical path {2:.3f}s through {3}"
+              .format(len(result.computed), result.elapsed, total, path))
+    if trace is not None:
+        trace.save(args.trace)
+    return 0
+
+
+def run_compiled(model, args):
+    from .compiler import compile_model
+
+    outputs = [(i, s.name) for i, node in sorted(model.all_nodes())
+               for s in node.output_noodlets()] if args.all else None
+    try:
+        values = compile_model(model, outputs=outputs)()
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    for (i, name), value in sorted(values.items()):
+        print("{0} {1}: {2!r}".format(model._nodes[i].name, name, value))
+    return 0
+
+
+def run_stream(model, args):
+    from .stream import StreamRunner
+
+    def show(i, outputs):
+        for name, value in sorted(outputs.items()):
+            print("{0} {1}: {2!r}".format(model._nodes[i].name, name, value))
+
+    try:
+        result = StreamRunner(model, args.capacity, on_output=show).run()
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    if args.profile:
+        for i, s in sorted(result.nodes.items()):
+            print("{0}: {1} items, {2:.0f} items/s, busy {3:.3f}s"
+                  .format(model._nodes[i].name, s.items_out, s.rate(), s.busy))
+    return 0
+
+
+def run_distributed(model, args):
+    from .distributed import Coordinator, LocalCluster, authkey_from_env, parse_address
+
+    if args.listen:
+        authkey = authkey_from_env()
+        if authkey is None:
+            print("Set NOODLES_AUTHKEY to a hex key shared with the workers.", file=sys.stderr)
+            return 1
+        cluster = Coordinator(parse_address(args.listen), authkey)
+        cluster.wait_for_workers(args.workers or 1, timeout=600)
+    else:
+        cluster = LocalCluster(args.cluster)
+
+    try:
+        result = cluster.run(model, collect='all' if args.all else 'sinks')
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        cluster.close()
+
+    for (i, name), value in sorted(result.values.items()):
+        print("{0} {1}: {2!r}".format(model._nodes[i].name, name, value))
+
+    if args.profile:
+        workers = {}
+        for i, w in result.placement.items():
+            workers[w] = workers.get(w, 0) + 1
+        print("ran {0} nodes in {1:.3f}s on {2}, {3} bytes moved, {4} retried"
+              .format(len(result.computed), result.elapsed, workers, result.fetched,
+                      len(result.retries)))
+    return 0
+
+
+def worker(args):
+    from .distributed import main
+
+    argv = [args.coordinator]
+    if args.name:
+        argv += ['--name', args.name]
+    if args.host:
+        argv += ['--host', args.host]
+    return main(argv)
+
+
+def export(args):
+    from data import storage
+
+    model = load(args.workflow)
+    try:
+        if os.path.splitext(args.output)[1].lower() in YAML_EXTENSIONS:
+            storage.save_yaml(model, args.output)
+        else:
+            storage.save(model, args.output)
+    except ValueError as e:
+        # a node without a template, see `storage.save`
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+def gui(args):
+    from qnoodles.qnoodles import main
+
+    main(load(args.workflow), args.mode, args.lazy)
+    return 0
+
+
+def parser():
+    p = argparse.ArgumentParser(prog='noodles', description="Noodles workflows.")
+    commands = p.add_subparsers(dest='command')
+    commands.required = True
+
+    c = commands.add_parser('info', help="count the nodes and links")
+    c.add_argument('workflow')
+    c.set_defaults(command=info)
+
+    c = commands.add_parser('validate', help="check that a workflow can run")
+    c.add_argument('workflow')
+    c.set_defaults(command=validate)
+
+    c = commands.add_parser('run', help="run a workflow and print its results")
+    c.add_argument('workflow')
+    c.add_argument('--pool', choices=['thread', 'process'], default='thread')
+    c.add_argument('--workers', type=int, default=None)
+    c.add_argument('--all', action='store_true',
+                   help="print all outputs, not only those of the last nodes")
+    c.add_argument('--profile', action='store_true',
+                   help="print timings and the critical path")
+    c.add_argument('--trace', default=None, metavar='FILE',
+                   help="save a Chrome trace of the run, for chrome://tracing")
+    c.add_argument('--shared-memory', action='store_true',
+                   help="pass large arrays between processes in shared memory")
+    c.add_argument('--compile', action='store_true',
+                   help="run the workflow as one compiled function, in this process")
+    c.add_argument('--stream', action='store_true',
+                   help="run the workflow as a stream, with a bounded queue on every link")
+    c.add_argument('--capacity', type=int, default=64,
+                   help="size of the queues when streaming")
+    c.add_argument('--cluster', type=int, default=0, metavar='N',
+                   help="run on N local worker processes, see engine.distributed")
+    c.add_argument('--listen', default=None, metavar='HOST:PORT',
+                   help="run on the --workers that connect here")
+    c.set_defaults(command=run)
+
+    c = commands.add_parser('worker', help="work for a distributed run")
+    c.add_argument('coordinator', help="host:port of the coordinator")
+    c.add_argument('--name', default=None)
+    c.add_argument('--host', default=None,
+                   help="address other workers reach this one on, when not the host name")
+    c.set_defaults(command=worker)
+
+    c = commands.add_parser('export', help="save a workflow in another format")
+    c.add_argument('workflow')
+    c.add_argument('output', help="binary file, or .yaml")
+    c.set_defaults(command=export)
+
+    c = commands.add_parser('gui', help="open a workflow in the editor")
+    c.add_argument('workflow', nargs='?', default='testing.adder:test_model')
+    c.add_argument('--mode', choices=['widget', 'item'], default='widget')
+    c.add_argument('--lazy', action='store_true')
+    c.set_defaults(command=gui)
+
+    return p
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    return args.command(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
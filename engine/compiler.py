@@ -0,0 +1,305 @@
+"""
+Compiles a workflow into a single Python function. Where the `Executor`
+looks up the links and collects the inputs of every node in dictionaries
+keyed on `(int, str)` noodlets, the compiled function calls the nodes in
+topological order and passes values in local variables:
+
+    def workflow(p):
+        v0_0 = c0({'value-1': p[0], 'value-2': p[1]})['sum']
+        v1_0 = c1({'value-1': v0_0, 'value-2': p[2]})['sum']
+        ...
+        return (v1_0,)
+
+    f = compile_model(model)
+    f()                                 # {(1, "sum"): ...}
+    f({(0, "value-1"): 5})
+
+The input noodlets in `inputs` are the parameters of the function; by
+default these are all input noodlets without a link, and they default to
+their value in `node.values`. Nodes that don't depend on any parameter are
+constant: they are run once, at compile time, and their outputs are put in
+the function as constants. Only the nodes that contribute to `outputs`
+(by default the outputs of the nodes that are not linked to anything) are
+called, and only the outputs that are used get a variable.
+
+Compiled functions are cached on a structural hash of the nodes, their
+templates and values, and the links, so compiling a workflow that didn't
+change returns the same function. The hash itself is only recomputed when
+the model's `_version` changes.
+"""
+
+import hashlib
+import weakref
+from collections import OrderedDict
+
+from data.model import SimpleNode
+
+from .schedule import topological_order
+from .cache import input_hash
+
+_PLAIN = (int, float, complex, bool, str, bytes, type(None))
+
+
+def _kind(node):
+    template = getattr(node, 'template', None)
+    if template is not None:
+        return "{0}:{1}".format(template.__module__, template.__qualname__)
+    # nodes without a template carry their own structure, see `CompositeNode`
+    return "{0}:{1}@{2:x}".format(type(node).__module__, type(node).__qualname__, id(node))
+
+
+def _value_key(v):
+    return repr(v) if isinstance(v, _PLAIN) else input_hash({'': v})
+
+
+_hashes = weakref.WeakKeyDictionary()   # model -> (version, hash)
+
+
+def structural_hash(model):
+    """
+    Hash of everything that the compiled function depends on: the index,
+    template and input values of every node, and the links with the order
+    of the values on inputs that have more than one.
+
+    Returns: str
+    """
+    version = getattr(model, '_version', None)
+    try:
+        seen, h = _hashes[model]
+        if version is not None and seen == version:
+            return h
+    except (KeyError, TypeError):
+        pass
+
+    h = hashlib.blake2b(digest_size=16)
+    for i in sorted(model._nodes):
+        node = model._nodes[i]
+        values = sorted((k, _value_key(v)) for k, v in getattr(node, 'values', {}).items())
+        h.update(repr((i, _kind(node), values)).encode())
+    for a in sorted(model._links):
+        h.update(repr((a, sorted(model._links[a]))).encode())
+    h.update(repr(sorted(getattr(model, '_fan_in', {}).items())).encode())
+    h = h.hexdigest()
+
+    try:
+        _hashes[model] = (version, h)
+    except TypeError:
+        pass
+    return h
+
+
+def _compute(node):
+    """
+    The function to call for `node`, skipping `SimpleNode.compute` for the
+    template's own.
+    """
+    if isinstance(node, SimpleNode) and type(node).compute is SimpleNode.compute:
+        return node.template.compute
+    return node.compute
+
+
+class CompiledWorkflow:
+    """
+    A compiled workflow, see `compile_model`.
+
+    Attributes:
+        function - the generated function, taking the list of parameters
+        source - its source code
+        inputs - the input noodlets that are parameters, in order
+        outputs - the output noodlets that are returned, in order
+        defaults - the values of the parameters at compile time
+        folded - set of nodes that were run at compile time
+    """
+    def __init__(self, function, source, inputs, outputs, defaults, folded, missing):
+        self.function = function
+        self.source = source
+        self.inputs = inputs
+        self.outputs = outputs
+        self.defaults = defaults
+        self.folded = folded
+        self._position = dict((b, k) for k, b in enumerate(inputs))
+        self._required = set(b for b, d in zip(inputs, defaults) if d is missing)
+
+    def __call__(self, values=None):
+        """
+        Run the workflow, with `values` for some of the parameters, given
+        as a dictionary keyed on input noodlet.
+
+        Returns: dictionary of output noodlets to their value
+        Raises: ValueError if a parameter without a default is not given.
+        """
+        params = list(self.defaults)
+        if values:
+            for b, v in values.items():
+                params[self._position[b]] = v
+        if self._required and not self._required <= set(values or ()):
+            b = min(self._required - set(values or ()))
+            raise ValueError(
+                "Input '{0}' of node {1} is not linked and has no value."
+                .format(b[1], b[0]))
+        return dict(zip(self.outputs, self.function(params)))
+
+
+def _sinks(model):
+    linked = set(i for (i, _), targets in model._links.items() if targets)
+    return [(i, s.name) for i, node in sorted(model._nodes.items()) if i not in linked
+            for s in node.output_noodlets()]
+
+
+def generate(model, inputs=None, outputs=None):
+    """
+    Compile `model` without looking in the cache.
+
+    Returns: CompiledWorkflow
+    Raises: schedule.CycleError if the workflow contains a cycle;
+        ValueError if an input that is not a parameter has no link or value.
+    """
+    nodes = model._nodes
+    inverse = model._inverse_links
+    order = topological_order(model)
+
+    if inputs is None:
+        inputs = [(i, s.name) for i in order for s in nodes[i].input_noodlets()
+                  if not inverse[(i, s.name)]]
+    inputs = list(inputs)
+    outputs = list(outputs) if outputs is not None else _sinks(model)
+    param = dict((b, k) for k, b in enumerate(inputs))
+    missing = object()
+    defaults = [getattr(nodes[i], 'values', {}).get(name, missing) for i, name in inputs]
+
+    def sources(i, name):
+        return model.sources((i, name))
+
+    # nodes that depend on a parameter, and those that the outputs need
+    live = set(i for i, _ in inputs)
+    for i in order:
+        if i not in live and any(a[0] in live for s in nodes[i].input_noodlets()
+                                 for a in inverse[(i, s.name)]):
+            live.add(i)
+
+    used = dict((i, set()) for i in nodes)
+    for i, name in outputs:
+        used[i].add(name)
+    for i in reversed(order):
+        if used[i]:
+            for s in nodes[i].input_noodlets():
+                for a in inverse[(i, s.name)]:
+                    used[a[0]].add(a[1])
+
+    namespace = {}
+    consts = {}
+
+    def constant(value):
+        name = consts.get(id(value))
+        if name is None:
+            name = consts[id(value)] = "k{0}".format(len(consts))
+            namespace[name] = value
+        return name
+
+    out_index = dict((i, dict((s.name, k) for k, s in enumerate(node.output_noodlets())))
+                     for i, node in nodes.items() if used[i])
+    folded = {}
+
+    def var(a):
+        i, name = a
+        if i in folded:
+            return constant(folded[i][name])
+        return "v{0}_{1}".format(i, out_index[i][name])
+
+    def arguments(i):
+        items = []
+        for s in nodes[i].input_noodlets():
+            b = (i, s.name)
+            src = sources(i, s.name)
+            if b in param:
+                expr = "p[{0}]".format(param[b])
+            elif len(src) == 1:
+                expr = var(src[0])
+            elif src:
+                expr = "[{0}]".format(", ".join(var(a) for a in src))
+            elif s.name in getattr(nodes[i], 'values', {}):
+                expr = constant(nodes[i].values[s.name])
+            else:
+                raise ValueError(
+                    "Input '{0}' of node {1} is not linked and has no value."
+                    .format(s.name, i))
+            items.append("{0!r}: {1}".format(s.name, expr))
+        return "{{{0}}}".format(", ".join(items))
+
+    lines = ["def workflow(p):"]
+    for i in order:
+        if not used[i]:
+            continue
+        if i not in live:
+            # constant: run it now, with the same argument expressions
+            folded[i] = _compute(nodes[i])(eval(arguments(i), dict(namespace)))
+            continue
+
+        call = "c{0}".format(i)
+        namespace[call] = _compute(nodes[i])
+        names = sorted(used[i], key=out_index[i].get)
+        if len(names) == 1:
+            lines.append("    {0} = {1}({2})[{3!r}]".format(
+                var((i, names[0])), call, arguments(i), names[0]))
+        else:
+            lines.append("    r = {0}({1})".format(call, arguments(i)))
+            lines.extend("    {0} = r[{1!r}]".format(var((i, name)), name) for name in names)
+
+    lines.append("    return ({0}{1})".format(", ".join(var(a) for a in outputs),
+                                              "," if len(outputs) == 1 else ""))
+    source = "\n".join(lines) + "\n"
+    exec(compile(source, "<workflow>", "exec"), namespace)
+    return CompiledWorkflow(namespace['workflow'], source, inputs, outputs,
+                            defaults, set(folded), missing)
+
+
+class CompileCache:
+    """
+    LRU cache of compiled workflows, keyed on the structural hash of the
+    model and the chosen inputs and outputs.
+
+    Attributes:
+        hits, misses - counters
+    """
+    def __init__(self, size=64):
+        self.size = size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, model, inputs=None, outputs=None):
+        key = (structural_hash(model),
+               None if inputs is None else tuple(inputs),
+               None if outputs is None else tuple(outputs))
+        try:
+            compiled = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            compiled = self._entries[key] = generate(model, inputs, outputs)
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+            return compiled
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return compiled
+
+    def clear(self):
+        self._entries.clear()
+
+
+#: the cache used by `compile_model`
+CACHE = CompileCache()
+
+
+def compile_model(model, inputs=None, outputs=None, cache=CACHE):
+    """
+    Compile `model` into a `CompiledWorkflow`, or take it from `cache` if
+    the same workflow was compiled before; see the module docstring.
+    """
+    if cache is None:
+        return generate(model, inputs, outputs)
+    return cache.get(model, inputs, outputs)
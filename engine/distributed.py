@@ -0,0 +1,626 @@
+"""
+Distributed execution. A `Coordinator` schedules the nodes of a workflow
+on worker processes, which may run on other hosts; they talk over sockets
+with `multiprocessing.connection`, which pickles the messages and checks a
+shared `authkey`. Workers connect to the coordinator, and keep the outputs
+of the nodes they ran. A node's inputs are fetched directly from the
+workers that hold them, so the coordinator only moves descriptions of work:
+
+    worker -> coordinator   ('hello', name, data address)
+    coordinator -> worker   ('run', task, i, node, inputs)
+    worker -> coordinator   ('done', task, output sizes, seconds, bytes fetched)
+                            ('error', task, exception)
+                            ('lost', task, noodlet)     an input was unreachable
+    coordinator -> worker   ('drop', noodlets)          no longer needed
+                            ('stop',)
+
+Each worker serves its outputs on a data address of its own. A ready node
+goes to the free worker that already holds most of the bytes of its
+inputs. Outputs are dropped once all consumers are done, and the outputs
+of the nodes that are not linked to anything are collected into
+`Result.values` (or all outputs, with `collect='all'`). When a node fails,
+its exception is raised after the workers are told to drop everything
+they hold for the run, also the outputs of tasks that finish later.
+Workers that connect with a name that is taken get `-2`, `-3`, ...
+appended to it.
+
+When a worker dies, the nodes it was running are queued again, and so is
+every finished node whose outputs were lost and are still needed, up to
+`max_retries` times per node. When a worker can't fetch an input from
+another one, only that input is taken as lost: the node that made it runs
+again, and the worker holding it is only given up on once its own
+connection to the coordinator fails. Status changes are passed to `on_status(i,
+state, worker)`, where state is 'running', 'done' or 'retry'; the
+`NodeScene.statusChanged` signal can be used for it.
+
+To try this on one machine, a `LocalCluster` starts workers as local
+processes:
+
+    with LocalCluster(4) as cluster:
+        result = cluster.run(model)
+
+On other hosts, start workers with the same `NOODLES_AUTHKEY` (hex) in the
+environment as the coordinator:
+
+    python -m engine.distributed coordinator-host:7313
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+import multiprocessing
+from multiprocessing.connection import Listener, Client, wait
+
+from .schedule import dependencies, topological_order
+from .executor import Result
+from .cache import sizeof
+
+#: errors that mean the other side is gone
+GONE = (EOFError, OSError)
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+
+def nodelay(conn):
+    """
+    Send small messages right away; a 'drop' followed by a 'run' would
+    otherwise wait for the acknowledgement of the first.
+    """
+    s = socket.socket(fileno=os.dup(conn.fileno()))
+    try:
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        pass
+    finally:
+        s.close()
+    return conn
+
+
+def authkey_from_env():
+    key = os.environ.get('NOODLES_AUTHKEY')
+    return bytes.fromhex(key) if key else None
+
+
+class DataServer:
+    """
+    Serves the outputs kept by a worker to other workers and to the
+    coordinator; every request is a list of noodlets, and the reply a
+    dictionary of those that were found.
+    """
+    def __init__(self, host, authkey):
+        self.values = {}
+        self.lock = threading.Lock()
+        self.listener = Listener((host, 0), authkey=authkey)
+        self.address = self.listener.address
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn = nodelay(self.listener.accept())
+            except GONE:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                keys = conn.recv()
+                with self.lock:
+                    found = dict((k, self.values[k]) for k in keys if k in self.values)
+                conn.send(found)
+        except GONE:
+            conn.close()
+
+
+class Worker:
+    """
+    A worker process: runs the nodes the coordinator sends, one at a time.
+    """
+    def __init__(self, address, authkey, name=None, host=None):
+        self.address = tuple(address)
+        self.authkey = authkey
+        self.name = name or "{0}-{1}".format(socket.gethostname(), os.getpid())
+        if host is None:
+            host = '127.0.0.1' if self.address[0] in ('127.0.0.1', 'localhost') \
+                else socket.gethostbyname(socket.gethostname())
+        self.data = DataServer(host, authkey)
+        self.peers = {}
+
+    def _get(self, key, address):
+        """
+        An output from this worker or another one.
+
+        Returns: (found, value)
+        """
+        if tuple(address) == tuple(self.data.address):
+            with self.data.lock:
+                return key in self.data.values, self.data.values.get(key)
+        try:
+            conn = self.peers.get(address)
+            if conn is None:
+                conn = self.peers[address] = nodelay(Client(tuple(address), authkey=self.authkey))
+            conn.send([key])
+            found = conn.recv()
+        except GONE:
+            self.peers.pop(address, None)
+            return False, None
+        return key in found, found.get(key)
+
+    def _run(self, conn, task, i, node, spec):
+        inputs = {}
+        fetched = 0
+        for name, (kind, payload) in spec.items():
+            if kind == 'value':
+                inputs[name] = payload
+                continue
+            values = []
+            for key, address in payload:
+                found, value = self._get(key, address)
+                if not found:
+                    conn.send(('lost', task, key))
+                    return
+                if tuple(address) != tuple(self.data.address):
+                    fetched += sizeof(value)
+                values.append(value)
+            inputs[name] = values[0] if len(values) == 1 else values
+
+        t0 = time.perf_counter()
+        try:
+            outputs = node.compute(inputs)
+        except Exception as e:
+            try:
+                conn.send(('error', task, e))
+            except Exception:
+                conn.send(('error', task, RuntimeError(repr(e))))
+            return
+        elapsed = time.perf_counter() - t0
+
+        with self.data.lock:
+            for name, value in outputs.items():
+                self.data.values[(i, name)] = value
+        sizes = dict((name, sizeof(value)) for name, value in outputs.items())
+        conn.send(('done', task, sizes, elapsed, fetched))
+
+    def serve(self):
+        """
+        Connect to the coordinator and work until it says stop or goes away.
+        """
+        conn = nodelay(Client(self.address, authkey=self.authkey))
+        conn.send(('hello', self.name, self.data.address))
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == 'run':
+                    self._run(conn, *message[1:])
+                elif message[0] == 'drop':
+                    with self.data.lock:
+                        for key in message[1]:
+                            self.data.values.pop(key, None)
+                elif message[0] == 'stop':
+                    break
+        except GONE:
+            pass
+        finally:
+            conn.close()
+            self.data.listener.close()
+
+
+def run_worker(address, authkey, name=None, host=None):
+    Worker(address, authkey, name, host).serve()
+
+
+class _Handle:
+    """
+    The coordinator's view of a worker.
+    """
+    def __init__(self, name, conn, data_address):
+        self.name = name
+        self.conn = conn
+        self.data_address = data_address
+        self.data_conn = None
+        self.task = None
+
+    def fetch(self, authkey, keys):
+        if self.data_conn is None:
+            self.data_conn = nodelay(Client(tuple(self.data_address), authkey=authkey))
+        self.data_conn.send(keys)
+        return self.data_conn.recv()
+
+    def close(self):
+        for conn in (self.conn, self.data_conn):
+            if conn is not None:
+                try:
+                    conn.close()
+                except GONE:
+                    pass
+
+
+class Coordinator:
+    """
+    Arguments:
+        address - `(host, port)` to listen on for workers; port 0 picks one
+        authkey - shared secret, random by default
+        on_status - called with `(i, state, worker name)`
+        max_retries - how often a node is run again after losing a worker
+        locality - send a node where its inputs are; else take turns
+    """
+    def __init__(self, address=('127.0.0.1', 0), authkey=None, on_status=None, max_retries=3,
+                 locality=True):
+        self.authkey = authkey or os.urandom(16)
+        self.listener = Listener(tuple(address), authkey=self.authkey)
+        self.address = self.listener.address
+        self.on_status = on_status
+        self.max_retries = max_retries
+        self.locality = locality
+        self.workers = {}
+        self._joining = []
+        self._lock = threading.Lock()
+        self._tasks = 0
+        self._abandoned = {}    # task of a failed run -> outputs to drop once done
+        self._closed = False
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn = nodelay(self.listener.accept())
+                kind, name, data_address = conn.recv()
+            except GONE:
+                if self._closed:
+                    return
+                continue
+            with self._lock:
+                self._joining.append(_Handle(name, conn, data_address))
+
+    def _admit(self):
+        with self._lock:
+            joining, self._joining = self._joining, []
+        for h in joining:
+            # two workers started with the same `--name`
+            name, k = h.name, 1
+            while h.name in self.workers:
+                k += 1
+                h.name = "{0}-{1}".format(name, k)
+            self.workers[h.name] = h
+
+    def wait_for_workers(self, n, timeout=30.0):
+        """
+        Wait until at least `n` workers have connected.
+
+        Raises: RuntimeError on time out.
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            self._admit()
+            if len(self.workers) >= n:
+                return
+            if time.perf_counter() > deadline:
+                raise RuntimeError("Only {0} of {1} workers connected.".format(len(self.workers), n))
+            time.sleep(0.01)
+
+    def _status(self, i, state, worker):
+        if self.on_status is not None:
+            self.on_status(i, state, worker)
+
+    def run(self, model, collect='sinks', timeout=30.0):
+        """
+        Run the workflow on the workers.
+
+        Returns: `executor.Result`, with the extra attributes `placement`
+            (node index to the worker that ran it last), `retries` (node
+            index to how often it was run again) and `fetched` (bytes of
+            inputs that came from another worker).
+        Raises: schedule.CycleError, ValueError for an input without a link
+            or value, the exception of a failing node, or RuntimeError if
+            no worker is left for `timeout` seconds or a node was retried
+            too often.
+        """
+        topological_order(model)    # fail early on cycles
+        predecessors, successors = dependencies(model)
+        nodes = model._nodes
+        sinks = set(i for i, s in successors.items() if not s)
+
+        pending = set(nodes)        # nodes still to run, or running
+        ready = set()               # pending nodes with all inputs available
+        running = {}                # task -> node
+        available = {}              # node -> name of the worker holding its outputs
+        missing = dict((i, len(p)) for i, p in predecessors.items())
+        node_bytes = {}
+        values = {}
+        timings = {}
+        placement = {}
+        retries = dict((i, 0) for i in nodes)
+        fetched = [0]
+        computed = set()
+        ready.update(i for i in pending if missing[i] == 0)
+
+        def spec(j):
+            inputs = {}
+            node = nodes[j]
+            for s in node.input_noodlets():
+                sources = model.sources((j, s.name))
+                if sources:
+                    inputs[s.name] = ('links', [
+                        (a, self.workers[available[a[0]]].data_address) for a in sources])
+                elif s.name in getattr(node, 'values', {}):
+                    inputs[s.name] = ('value', node.values[s.name])
+                else:
+                    raise ValueError(
+                        "Input '{0}' of node {1} is not linked and has no value."
+                        .format(s.name, j))
+            return inputs
+
+        def make_available(i, worker):
+            available[i] = worker
+            for j in successors[i]:
+                missing[j] -= 1
+                if missing[j] == 0 and j in pending and j not in running.values():
+                    ready.add(j)
+
+        def make_unavailable(i):
+            del available[i]
+            for j in successors[i]:
+                missing[j] += 1
+                ready.discard(j)
+
+        def requeue(i, worker):
+            retries[i] += 1
+            if retries[i] > self.max_retries:
+                raise RuntimeError("Node {0} was lost {1} times.".format(i, retries[i]))
+            pending.add(i)
+            if missing[i] == 0:
+                ready.add(i)
+            self._status(i, 'retry', worker)
+
+        def lose(name):
+            """
+            Worker `name` is gone: run its tasks again, and whatever it
+            held that is still needed.
+            """
+            h = self.workers.pop(name, None)
+            if h is None:
+                return
+            h.close()
+            for task, i in list(running.items()):
+                if h.task == task:
+                    del running[task]
+                    requeue(i, name)
+            for i in [i for i, w in available.items() if w == name]:
+                make_unavailable(i)
+            recover(name)
+
+        def recover(name):
+            """
+            Queue again every finished node whose outputs are gone and
+            still needed.
+            """
+            stack = list(pending)
+            while stack:
+                j = stack.pop()
+                for p in predecessors[j]:
+                    if p not in available and p not in pending:
+                        requeue(p, name)
+                        stack.append(p)
+
+        def drop(p):
+            """
+            Tell the worker holding the outputs of `p` to let them go.
+            """
+            h = self.workers.get(available[p])
+            if h is not None:
+                try:
+                    h.conn.send(('drop', [(p, s.name) for s in nodes[p].output_noodlets()]))
+                except GONE:
+                    pass
+            make_unavailable(p)
+
+        def drop_inputs(j):
+            for p in predecessors[j]:
+                if p in available and not any(s in pending for s in successors[p]):
+                    drop(p)
+
+        def finished(h, task, sizes, elapsed, remote):
+            i = running.pop(task)
+            h.task = None
+            if i in sinks or collect == 'all':
+                try:
+                    values.update(h.fetch(self.authkey, [(i, name) for name in sizes]))
+                except GONE:
+                    lose(h.name)
+                    requeue(i, h.name)
+                    return
+            pending.discard(i)
+            computed.add(i)
+            timings[i] = elapsed
+            placement[i] = h.name
+            node_bytes[i] = sum(sizes.values())
+            fetched[0] += remote
+            make_available(i, h.name)
+            self._status(i, 'done', h.name)
+            drop_inputs(i)
+
+        def assign():
+            free = [h for h in self.workers.values() if h.task is None]
+            for j in sorted(ready):
+                if not free:
+                    return
+                near = dict((h.name, 0) for h in free)
+                for p in predecessors[j]:
+                    if available.get(p) in near:
+                        near[available[p]] += node_bytes.get(p, 0)
+                if self.locality:
+                    h = max(free, key=lambda h: near[h.name])
+                else:
+                    h = free[self._tasks % len(free)]
+
+                self._tasks += 1
+                try:
+                    h.conn.send(('run', self._tasks, j, nodes[j], spec(j)))
+                except GONE:
+                    lose(h.name)
+                    return
+                free.remove(h)
+                ready.discard(j)
+                running[self._tasks] = j
+                h.task = self._tasks
+                self._status(j, 'running', h.name)
+
+        def release():
+            """
+            Tell the workers to let go of all outputs they hold for this
+            run, also those of tasks still running after a failure.
+            """
+            for task, j in running.items():
+                self._abandoned[task] = [(j, s.name) for s in nodes[j].output_noodlets()]
+            for i, w in list(available.items()):
+                h = self.workers.get(w)
+                if h is not None:
+                    try:
+                        h.conn.send(('drop', [(i, s.name) for s in nodes[i].output_noodlets()]))
+                    except GONE:
+                        pass
+
+        t0 = time.perf_counter()
+        try:
+            idle_since = None
+            while pending:
+                self._admit()
+                assign()
+                handles = dict((h.conn, h) for h in self.workers.values())
+                if not handles:
+                    idle_since = idle_since or time.perf_counter()
+                    if time.perf_counter() - idle_since > timeout:
+                        raise RuntimeError("No workers left to run the workflow.")
+                    time.sleep(0.01)
+                    continue
+                idle_since = None
+
+                for conn in wait(list(handles), timeout=0.05):
+                    h = handles[conn]
+                    if h.name not in self.workers:
+                        continue
+                    try:
+                        message = conn.recv()
+                    except GONE:
+                        lose(h.name)
+                        continue
+                    if message[1] not in running:
+                        # left over from a run that failed
+                        h.task = None
+                        keys = self._abandoned.pop(message[1], None)
+                        if keys and message[0] == 'done':
+                            try:
+                                conn.send(('drop', keys))
+                            except GONE:
+                                pass
+                        continue
+
+                    if message[0] == 'done':
+                        finished(h, *message[1:])
+                    elif message[0] == 'error':
+                        running.pop(message[1], None)
+                        h.task = None
+                        raise message[2]
+                    elif message[0] == 'lost':
+                        # the holder may be fine and only out of this worker's
+                        # reach, so make the input again rather than lose it
+                        i = running.pop(message[1])
+                        h.task = None
+                        p = message[2][0]
+                        owner = available.get(p)
+                        if owner is not None:
+                            drop(p)
+                            requeue(p, owner)
+                        requeue(i, h.name)
+                        recover(h.name)
+        finally:
+            release()
+
+        result = Result(model, values, timings, time.perf_counter() - t0, computed, set())
+        result.placement = placement
+        result.retries = dict((i, k) for i, k in retries.items() if k)
+        result.fetched = fetched[0]
+        return result
+
+    def close(self):
+        """
+        Tell the workers to stop, and stop listening.
+        """
+        self._admit()
+        for h in self.workers.values():
+            try:
+                h.conn.send(('stop',))
+            except GONE:
+                pass
+            h.close()
+        self.workers = {}
+        self._closed = True
+        self.listener.close()
+
+
+class LocalCluster:
+    """
+    A coordinator with `n` workers in local processes, standing in for
+    hosts. Workers are named `worker-0`, `worker-1`, ...; `kill` one to see
+    its work being redone.
+    """
+    def __init__(self, n=2, **kwargs):
+        self.coordinator = Coordinator(**kwargs)
+        self.processes = {}
+        for k in range(n):
+            self.add_worker()
+        self.coordinator.wait_for_workers(n)
+
+    def add_worker(self, name=None):
+        name = name or "worker-{0}".format(len(self.processes))
+        p = multiprocessing.Process(
+            target=run_worker, args=(self.coordinator.address, self.coordinator.authkey, name),
+            daemon=True)
+        p.start()
+        self.processes[name] = p
+        return name
+
+    def kill(self, name):
+        self.processes[name].kill()
+
+    def run(self, model, **kwargs):
+        return self.coordinator.run(model, **kwargs)
+
+    def close(self):
+        self.coordinator.close()
+        for p in self.processes.values():
+            p.join(5)
+            if p.is_alive():
+                p.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Run a Noodles worker.")
+    p.add_argument('coordinator', help="host:port of the coordinator")
+    p.add_argument('--name', default=None)
+    p.add_argument('--host', default=None, help="address other workers reach this one on")
+    args = p.parse_args(argv)
+
+    authkey = authkey_from_env()
+    if authkey is None:
+        print("Set NOODLES_AUTHKEY to the coordinator's key.", file=sys.stderr)
+        return 1
+    run_worker(parse_address(args.coordinator), authkey, args.name, args.host)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
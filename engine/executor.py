@@ -0,0 +1,311 @@
+"""
+Runs the workflow described by a data model. Nodes are submitted to a thread
+or process pool as soon as all the nodes they depend on are done, so that
+independent nodes run at the same time.
+
+The value on an output noodlet is passed to every input noodlet it is linked
+to. An input noodlet with more than one link receives a list of the values,
+in the order of `DataModel.sources`. Input noodlets without a link take
+their value from `node.values`.
+
+    result = Executor(model, pool='process').run()
+    result.values[(2, "sum")]
+    result.critical_path()
+
+Running the same executor again only recomputes the nodes that were edited
+since its last run, and everything downstream of them; the outputs of the
+other nodes are reused. Every executor follows the edits of the model
+itself, as an observer (see `DataModel._observe`), so that executors on
+the same model don't interfere. Moving a node doesn't make it dirty.
+If the executor has a `ResultCache`, dirty nodes whose inputs were seen
+before are also taken from the cache.
+
+With a `transport.Transport`, large arrays go from one worker process to
+the next through shared memory instead of being pickled twice; results
+that went through shared memory, or were computed from values that did,
+are not cached.
+
+With a `trace.Trace`, the run is recorded for profiling.
+"""
+
+import time
+from collections import deque
+from concurrent.futures import (
+    ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait)
+
+from .schedule import dependencies, topological_order, critical_path
+from .cache import input_hash, node_key
+
+
+def _run_node(node, inputs, transport=None):
+    """
+    Runs in the worker, returns the outputs and the wall time spent.
+    """
+    t0 = time.perf_counter()
+    if transport is not None:
+        outputs = transport.run(node, inputs)
+    else:
+        outputs = node.compute(inputs)
+    return outputs, time.perf_counter() - t0
+
+
+class Result:
+    """
+    The outcome of running a workflow.
+
+    Attributes:
+        values - dictionary of `(int, str)` output noodlets to their value
+        timings - dictionary of node indices to wall time in seconds
+        elapsed - wall time of the entire run
+        computed - set of nodes that were actually run
+        cached - set of nodes that were taken from the result cache
+    """
+    def __init__(self, model, values, timings, elapsed, computed, cached):
+        self.model = model
+        self.values = values
+        self.timings = timings
+        self.elapsed = elapsed
+        self.computed = computed
+        self.cached = cached
+
+    def critical_path(self):
+        """
+        Returns: (list of node indices, total seconds), see
+        `schedule.critical_path`.
+        """
+        return critical_path(self.model, self.timings)
+
+
+class Executor:
+    """
+    Arguments:
+        model - the `DataModel` to run
+        workers - size of the pool, defaults to the number of cores
+        pool - 'thread', 'process', or an existing
+            `concurrent.futures.Executor`
+        cache - optional `ResultCache`
+        transport - optional `transport.Transport` for large arrays
+        trace - optional `trace.Trace` to record the run in
+    """
+    def __init__(self, model, workers=None, pool='thread', cache=None, transport=None,
+                 trace=None):
+        self.model = model
+        self.workers = workers
+        self.pool = pool
+        self.cache = cache
+        self.transport = transport
+        self.trace = trace
+        self.values = {}        # outputs of the last run, reused for clean nodes
+        self._stale = set()     # nodes edited since the last run
+        self._before = {}       # node -> hash of its values before the first edit
+        self._observing = False
+
+    def _make_pool(self):
+        if self.pool == 'thread':
+            return ThreadPoolExecutor(self.workers), True
+        if self.pool == 'process':
+            return ProcessPoolExecutor(self.workers), True
+        return self.pool, False
+
+    def inputs(self, i, values):
+        """
+        Collect the input values for node `i` from the values computed so
+        far.
+        """
+        node = self.model._nodes[i]
+        inputs = {}
+
+        for s in node.input_noodlets():
+            sources = self.model.sources((i, s.name))
+            if len(sources) == 1:
+                inputs[s.name] = values[sources[0]]
+            elif sources:
+                inputs[s.name] = [values[a] for a in sources]
+            elif s.name in getattr(node, 'values', {}):
+                inputs[s.name] = node.values[s.name]
+            else:
+                raise ValueError(
+                    "Input '{0}' of node {1} is not linked and has no value."
+                    .format(s.name, i))
+
+        return inputs
+
+    def remap(self, table):
+        """
+        Apply a table of old to new node indices to the results of the last
+        run, after the model was compacted.
+        """
+        self.values = dict(((table[i], name), v) for (i, name), v in self.values.items()
+                           if i in table)
+        self._stale = set(table[i] for i in self._stale if i in table)
+        self._before = dict((table[i], h) for i, h in self._before.items() if i in table)
+        self._observe()
+
+    def touch_node(self, i):
+        self._stale.add(i)
+
+    def touch_state(self, i):
+        if i not in self._before:
+            self._before[i] = input_hash(getattr(self.model._nodes[i], 'values', {}))
+
+    def touch_link(self, a, b):
+        self._stale.add(b[0])
+
+    def detach(self):
+        """
+        The model was compacted; the results are useless until `remap`.
+        """
+        self._observing = False
+
+    def _observe(self):
+        if not self._observing and hasattr(self.model, '_observe'):
+            self.model._observe(self)
+            self._observing = True
+
+    def _traced(self, ready):
+        """
+        Start tracing the run, if there is a trace; `ready` are the nodes
+        that are ready now. This is where `run` looks at `self.trace`.
+
+        Returns: (function to run a node with in the worker, trace or None)
+        """
+        if self.trace is None:
+            return _run_node, None
+        from .trace import run_traced
+        self.trace.begin(self.model, ready)
+        return run_traced, self.trace
+
+    def _dirty(self, successors):
+        """
+        The nodes to recompute: those edited since the last run and
+        everything downstream, or None for all of them.
+        """
+        if not self._observing:
+            return None
+        nodes = self.model._nodes
+        stack = [i for i in self._stale if i in nodes]
+        stack.extend(i for i, h in self._before.items() if i in nodes and
+                     input_hash(getattr(nodes[i], 'values', {})) != h)
+        dirty = set()
+        while stack:
+            i = stack.pop()
+            if i not in dirty:
+                dirty.add(i)
+                stack.extend(successors[i])
+        return dirty
+
+    def _is_clean(self, i, dirty):
+        if dirty is None or i in dirty:
+            return False
+        return all((i, s.name) in self.values
+                   for s in self.model._nodes[i].output_noodlets())
+
+    def run(self):
+        """
+        Run all dirty nodes in the model.
+
+        Returns: Result
+        Raises: schedule.CycleError if the workflow contains a cycle.
+        """
+        topological_order(self.model)   # fail early on cycles
+        predecessors, successors = dependencies(self.model)
+        waiting = dict((i, len(p)) for i, p in predecessors.items())
+        dirty = self._dirty(successors)
+
+        values = {}
+        timings = {}
+        running = {}
+        computed = set()
+        cached = set()
+        ready = deque(sorted(i for i, n in waiting.items() if n == 0))
+        shared = None
+        if self.transport is not None:
+            from .transport import SharedValues
+            shared = SharedValues()
+            self.transport.prepare()
+        run_node, trace = self._traced(ready)
+        pool, owned = self._make_pool()
+        t0 = time.perf_counter()
+
+        def finish(i, outputs):
+            if shared is not None:
+                # node `i` has read its inputs
+                for s in self.model._nodes[i].input_noodlets():
+                    for a in self.model.links_to((i, s.name)):
+                        v = shared.release(a)
+                        if v is not None:
+                            values[a] = v
+                outputs = dict((name, shared.add((i, name), v, len(self.model._links[(i, name)])))
+                               for name, v in outputs.items())
+            for name, v in outputs.items():
+                values[(i, name)] = v
+            if trace is not None:
+                trace.passed(self.model, i, outputs)
+            for j in sorted(successors[i]):
+                waiting[j] -= 1
+                if waiting[j] == 0:
+                    ready.append(j)
+                    if trace is not None:
+                        trace.ready(j)
+
+        def start(i):
+            node = self.model._nodes[i]
+            if self._is_clean(i, dirty):
+                finish(i, dict((s.name, self.values[(i, s.name)])
+                               for s in node.output_noodlets()))
+                return
+
+            inputs = self.inputs(i, values)
+            # shared inputs have fresh segment names every run: never a hit
+            if self.cache is not None and not (shared is not None and shared.holds(inputs)):
+                key = (node_key(node), input_hash(inputs))
+                outputs = self.cache.get(key)
+                if outputs is not None:
+                    cached.add(i)
+                    finish(i, outputs)
+                    return
+            else:
+                key = None
+
+            future = pool.submit(run_node, node, inputs, self.transport)
+            running[future] = (i, key)
+
+        try:
+            while ready or running:
+                while ready:
+                    start(ready.popleft())
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, key = running.pop(future)
+                    if trace is None:
+                        outputs, timings[i] = future.result()
+                    else:
+                        outputs, timings[i], started, worker = future.result()
+                        trace.ran(i, started, timings[i], worker)
+                    computed.add(i)
+                    if key is not None and not (shared is not None and shared.holds(outputs)):
+                        self.cache.put(key, outputs)
+                    finish(i, outputs)
+        finally:
+            if running and shared is not None:
+                # a node failed; the nodes still running may share outputs
+                for future in running:
+                    future.cancel()
+                for future in running:
+                    if not future.cancelled() and future.exception() is None:
+                        shared.discard(future.result()[0])
+            if owned:
+                pool.shutdown(wait=not running, cancel_futures=True)
+            if shared is not None:
+                shared.clear()
+
+        self.values = values
+        self._stale = set()
+        self._before = {}
+        self._observe()
+
+        return Result(self.model, values, timings, time.perf_counter() - t0,
+                      computed, cached)
@@ -0,0 +1,94 @@
+"""
+Scheduling of a workflow. The links in the data model connect noodlets, the
+scheduler only cares about the nodes: node `j` depends on node `i` if any
+output of `i` is linked to an input of `j`. From these dependencies we build a
+topological order, in which every node comes after all the nodes it depends
+on. If no such order exists, the workflow contains a cycle and can't be run.
+"""
+
+from collections import deque
+
+
+class CycleError(ValueError):
+    """
+    Raised when a workflow contains a cycle. The `nodes` attribute has the
+    indices of the nodes that could not be scheduled.
+    """
+    def __init__(self, nodes):
+        super(CycleError, self).__init__(
+            "The workflow contains a cycle through nodes {0}.".format(sorted(nodes)))
+        self.nodes = nodes
+
+
+def dependencies(model):
+    """
+    Collect the dependencies between nodes from `model.all_links()`.
+
+    Returns: (predecessors, successors), both dictionaries mapping a node
+    index to the set of node indices it depends on, or that depend on it.
+    """
+    predecessors = dict((i, set()) for i, _ in model.all_nodes())
+    successors = dict((i, set()) for i in predecessors)
+
+    for (i, _), (j, _) in model.all_links():
+        predecessors[j].add(i)
+        successors[i].add(j)
+
+    return predecessors, successors
+
+
+def topological_order(model):
+    """
+    Kahn's algorithm over the node dependencies of `model`.
+
+    Returns: list of node indices.
+    Raises: CycleError if the workflow contains a cycle.
+    """
+    predecessors, successors = dependencies(model)
+    waiting = dict((i, len(p)) for i, p in predecessors.items())
+    ready = deque(sorted(i for i, n in waiting.items() if n == 0))
+    order = []
+
+    while ready:
+        i = ready.popleft()
+        order.append(i)
+        for j in sorted(successors[i]):
+            waiting[j] -= 1
+            if waiting[j] == 0:
+                ready.append(j)
+
+    if len(order) != len(waiting):
+        raise CycleError(set(waiting) - set(order))
+
+    return order
+
+
+def critical_path(model, timings):
+    """
+    Find the most expensive chain of dependent nodes, given the wall time
+    spent in each node.
+
+    Arguments:
+        model - the data model
+        timings - dictionary mapping node indices to seconds
+
+    Returns: (list of node indices, total seconds)
+    """
+    predecessors, _ = dependencies(model)
+    cost = {}
+    via = {}
+
+    for i in topological_order(model):
+        before = max(predecessors[i], key=lambda k: cost[k], default=None)
+        via[i] = before
+        cost[i] = timings.get(i, 0.0) + (cost[before] if before is not None else 0.0)
+
+    if not cost:
+        return [], 0.0
+
+    last = max(cost, key=lambda k: cost[k])
+    path = [last]
+    while via[path[-1]] is not None:
+        path.append(via[path[-1]])
+
+    return path[::-1], cost[last]
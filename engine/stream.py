@@ -0,0 +1,343 @@
+"""
+Streaming execution. Where the `Executor` runs every node once, here every
+link of the data model is a bounded queue and every node runs in its own
+thread, taking items from its input noodlets and putting items on its
+output noodlets for as long as items keep coming. When a queue is full, the
+node putting items on it waits (backpressure), so the memory in use is
+bounded by the capacity of the queues, not by the size of the data.
+
+A node processes one item from each linked input at a time; an input with
+more than one link gets a list, as with the `Executor`, and an input
+without a link takes its value from `node.values`. By default every item is
+passed through `node.compute`. A template can instead give a generator
+function `stream(items)`, which gets an iterator of input dictionaries and
+yields output dictionaries, to keep state between items, filter, or split
+them. A node without linked inputs sees a single item with its values, so
+a source node is a `stream` that yields many outputs for it.
+
+A node stops when any of its inputs ends, and its outputs end in turn. It
+also stops when every node it puts items to has stopped, and then the nodes
+upstream of it stop in turn, so that a node that takes only the first few
+items of an endless source ends the whole stream.
+
+    runner = StreamRunner(model, capacity=64, on_output=print)
+    runner.start()
+    runner.stats()          # while running, for instance from a GUI timer
+    result = runner.join()
+
+The outputs of nodes that are not linked to anything are given to
+`on_output(i, outputs)` as they come; they are not kept.
+"""
+
+import time
+import queue
+import threading
+
+from .schedule import topological_order
+
+#: put on a queue after the last item
+END = object()
+
+#: seconds between checks for a stop while waiting on a queue
+POLL = 0.05
+
+
+class Stopped(Exception):
+    pass
+
+
+class Closed(Stopped):
+    """
+    Raised by `Link.put` when the node at the other end stopped taking items.
+    """
+
+
+class Link:
+    """
+    A bounded queue for the link from noodlet `a` to noodlet `b`.
+
+    Attributes:
+        capacity - maximum number of items in the queue
+        count - number of items that went through
+        max_depth - the most items that were ever waiting
+    """
+    def __init__(self, a, b, capacity, stop):
+        self.a = a
+        self.b = b
+        self.capacity = capacity
+        self.count = 0
+        self.max_depth = 0
+        self.closed = False     # the consumer stopped taking items
+        self._queue = queue.Queue(capacity)
+        self._stop = stop
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def put(self, item):
+        while True:
+            if self._stop.is_set():
+                raise Stopped
+            if self.closed:
+                raise Closed
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                try:
+                    self._queue.put(item, timeout=POLL)
+                except queue.Full:
+                    continue
+            if item is not END:
+                self.count += 1
+                self.max_depth = max(self.max_depth, self._queue.qsize())
+            return
+
+    def get(self):
+        while True:
+            if self._stop.is_set():
+                raise Stopped
+            try:
+                return self._queue.get_nowait()
+            except queue.Empty:
+                try:
+                    return self._queue.get(timeout=POLL)
+                except queue.Empty:
+                    continue
+
+
+class NodeStats:
+    """
+    Counters of one node.
+
+    Attributes:
+        items_in, items_out - number of input and output items
+        busy - seconds spent computing
+        waiting_in - seconds spent waiting for input
+        waiting_out - seconds spent waiting for room downstream
+        started, finished - `time.perf_counter()` values, or None
+    """
+    def __init__(self):
+        self.items_in = 0
+        self.items_out = 0
+        self.busy = 0.0
+        self.waiting_in = 0.0
+        self.waiting_out = 0.0
+        self.started = None
+        self.finished = None
+
+    def rate(self, now=None):
+        """
+        Items per second put out since the node started.
+        """
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else (now or time.perf_counter())
+        return self.items_out / max(end - self.started, 1e-9)
+
+
+def _stream_function(node):
+    template = getattr(node, 'template', None)
+    return getattr(template if template is not None else node, 'stream', None)
+
+
+class StreamResult:
+    """
+    The outcome of a streaming run.
+
+    Attributes:
+        elapsed - wall time of the run
+        nodes - dictionary of node index to `NodeStats`
+        links - dictionary of link to `Link`
+    """
+    def __init__(self, elapsed, nodes, links):
+        self.elapsed = elapsed
+        self.nodes = nodes
+        self.links = links
+
+
+class StreamRunner:
+    """
+    Arguments:
+        model - the `DataModel` to run
+        capacity - size of the queue on every link
+        on_output - called with `(i, outputs)` for every output item of a
+            node that is not linked to anything
+    """
+    def __init__(self, model, capacity=64, on_output=None):
+        topological_order(model)    # fail early on cycles
+        self.model = model
+        self.capacity = capacity
+        self.on_output = on_output
+        self._stop = threading.Event()
+        self.links = dict(((a, b), Link(a, b, capacity, self._stop))
+                          for a, b in model.all_links())
+        self.nodes = dict((i, NodeStats()) for i, _ in model.all_nodes())
+        self._threads = []
+        self._errors = []
+        self._t0 = None
+
+    def _inputs(self, i):
+        """
+        The links into every input noodlet of node `i`, in the order of
+        `DataModel.sources`, and the values of the inputs without a link.
+        """
+        node = self.model._nodes[i]
+        linked, fixed = [], {}
+        for s in node.input_noodlets():
+            sources = self.model.sources((i, s.name))
+            if sources:
+                linked.append((s.name, [self.links[(a, (i, s.name))] for a in sources]))
+            elif s.name in getattr(node, 'values', {}):
+                fixed[s.name] = node.values[s.name]
+            else:
+                raise ValueError(
+                    "Input '{0}' of node {1} is not linked and has no value."
+                    .format(s.name, i))
+        return linked, fixed
+
+    def _items(self, i, linked, fixed):
+        stats = self.nodes[i]
+        if not linked:
+            stats.items_in += 1
+            yield dict(fixed)
+            return
+
+        while True:
+            t0 = time.perf_counter()
+            item = dict(fixed)
+            for name, links in linked:
+                values = [link.get() for link in links]
+                if any(v is END for v in values):
+                    stats.waiting_in += time.perf_counter() - t0
+                    return
+                item[name] = values[0] if len(values) == 1 else values
+            stats.waiting_in += time.perf_counter() - t0
+            stats.items_in += 1
+            yield item
+
+    def _run_node(self, i):
+        node = self.model._nodes[i]
+        stats = self.nodes[i]
+        outgoing = {}
+        for s in node.output_noodlets():
+            outgoing[s.name] = [self.links[((i, s.name), b)]
+                                for b in sorted(self.model._links[(i, s.name)])]
+        sink = not any(outgoing.values())
+        linked = []
+
+        try:
+            linked, fixed = self._inputs(i)
+            stream = _stream_function(node)
+            items = self._items(i, linked, fixed)
+            outputs = stream(items) if stream is not None \
+                else (node.compute(item) for item in items)
+
+            stats.started = time.perf_counter()
+            t0, w0 = stats.started, stats.waiting_in
+            for out in outputs:
+                t1 = time.perf_counter()
+                stats.busy += t1 - t0 - (stats.waiting_in - w0)
+                stats.items_out += 1
+                if sink and self.on_output is not None:
+                    self.on_output(i, out)
+                for name, value in out.items():
+                    for link in outgoing.get(name, ()):
+                        try:
+                            link.put(value)
+                        except Closed:
+                            pass
+                if not sink and all(link.closed for links in outgoing.values()
+                                    for link in links):
+                    break       # nobody takes the outputs any more
+                t0, w0 = time.perf_counter(), stats.waiting_in
+                stats.waiting_out += t0 - t1
+        except Stopped:
+            pass
+        except Exception as e:
+            self._errors.append((i, e))
+            self._stop.set()
+        finally:
+            stats.finished = time.perf_counter()
+            for _, links in linked:
+                for link in links:
+                    link.closed = True
+            for links in outgoing.values():
+                for link in links:
+                    try:
+                        link.put(END)
+                    except Stopped:
+                        pass
+
+    def start(self):
+        """
+        Start a thread for every node.
+        """
+        self._t0 = time.perf_counter()
+        for i in self.nodes:
+            t = threading.Thread(target=self._run_node, args=(i,), daemon=True,
+                                 name="noodles-stream-{0}".format(i))
+            self._threads.append(t)
+            t.start()
+
+    def stop(self):
+        """
+        Stop all nodes, as soon as they next touch a queue.
+        """
+        self._stop.set()
+
+    def join(self, timeout=None):
+        """
+        Wait for all nodes to finish.
+
+        Returns: StreamResult
+        Raises: the first exception raised by a node.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for t in self._threads:
+            t.join(None if deadline is None else max(deadline - time.perf_counter(), 0))
+        if self._errors:
+            i, e = self._errors[0]
+            raise e
+        return StreamResult(time.perf_counter() - self._t0, self.nodes, self.links)
+
+    def run(self):
+        self.start()
+        return self.join()
+
+    def stats(self):
+        """
+        The state of the run, safe to call while it's going on.
+
+        Returns: dictionary with
+            'nodes': node index -> dict of items_in, items_out, rate
+                (items per second), busy, waiting_in, waiting_out
+            'links': link -> dict of depth, capacity, count, max_depth
+        """
+        now = time.perf_counter()
+        nodes = dict((i, {'items_in': s.items_in, 'items_out': s.items_out,
+                          'rate': s.rate(now), 'busy': s.busy,
+                          'waiting_in': s.waiting_in, 'waiting_out': s.waiting_out})
+                     for i, s in self.nodes.items())
+        links = dict((k, {'depth': l.depth(), 'capacity': l.capacity,
+                          'count': l.count, 'max_depth': l.max_depth})
+                     for k, l in self.links.items())
+        return {'nodes': nodes, 'links': links}
+
+    def bottleneck(self):
+        """
+        The node that holds up the stream: of the nodes whose inputs are
+        fuller than their outputs, the one that spent the most time
+        computing.
+
+        Returns: node index or None
+        """
+        inbound, outbound = {}, {}
+        for (a, b), link in self.links.items():
+            fill = link.depth() / link.capacity
+            inbound[b[0]] = max(inbound.get(b[0], 0.0), fill)
+            outbound[a[0]] = max(outbound.get(a[0], 0.0), fill)
+
+        candidates = [i for i in self.nodes if inbound.get(i, 0.0) >= outbound.get(i, 0.0)]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda i: self.nodes[i].busy)
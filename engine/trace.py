@@ -0,0 +1,165 @@
+"""
+Profiling of workflow runs. Give the `Executor` a `Trace`, and it records
+for every node it computes when the node became ready, when a worker
+started and finished it, and on which process and thread; and for every
+link, how many bytes of output passed over it. The difference between
+ready and start is the time the node waited in the queue of the pool.
+
+    trace = Trace()
+    Executor(model, trace=trace).run()
+    trace.save('run.json')      # open in chrome://tracing or ui.perfetto.dev
+    scene.showTrace(trace)      # heat map in the editor
+
+The export is the Chrome trace-event format: a slice per node on the
+thread that ran it, an async slice for its wait in the queue, and a flow
+arrow per link, with the bytes it carried. Without a trace the executor
+measures nothing more than it always does.
+"""
+
+import os
+import json
+import time
+import threading
+
+from .cache import sizeof
+
+
+def run_traced(node, inputs, transport=None):
+    """
+    Runs in the worker, like `executor._run_node`; also returns when the
+    node started and where.
+    """
+    from .executor import _run_node
+
+    outputs, elapsed = _run_node(node, inputs, transport)
+    return outputs, elapsed, time.perf_counter() - elapsed, \
+        (os.getpid(), threading.get_ident())
+
+
+class Span:
+    """
+    The run of one node, in `time.perf_counter()` seconds, which is the
+    same clock in every process on a host.
+    """
+    __slots__ = ('ready', 'start', 'end', 'worker')
+
+    def __init__(self, ready, start, end, worker):
+        self.ready = ready
+        self.start = start
+        self.end = end
+        self.worker = worker
+
+    @property
+    def wait(self):
+        return self.start - self.ready
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+class Trace:
+    """
+    Attributes:
+        nodes - dictionary of node index to `Span`
+        links - dictionary of link to the bytes passed over it
+        names - dictionary of node index to name, for the export
+    """
+    def __init__(self):
+        self.nodes = {}
+        self.links = {}
+        self.names = {}
+        self.t0 = None
+        self.pid = os.getpid()
+        self._ready = {}
+
+    def begin(self, model, sources):
+        """
+        Start recording a run, forgetting the last one; `sources` are
+        ready now.
+        """
+        self.nodes = {}
+        self.links = {}
+        self.names = dict((i, node.name) for i, node in model.all_nodes())
+        self.t0 = time.perf_counter()
+        self._ready = dict((i, self.t0) for i in sources)
+
+    def ready(self, i):
+        self._ready[i] = time.perf_counter()
+
+    def ran(self, i, start, elapsed, worker):
+        self.nodes[i] = Span(self._ready.get(i, start), start, start + elapsed, worker)
+
+    def passed(self, model, i, outputs):
+        """
+        The outputs of node `i` are on their links.
+        """
+        for name, value in outputs.items():
+            targets = model._links[(i, name)]
+            if targets:
+                n = sizeof(value)
+                for b in targets:
+                    self.links[((i, name), b)] = n
+
+    def heat(self):
+        """
+        Returns: dictionary of node index to its run time relative to the
+        slowest node, between 0 and 1.
+        """
+        longest = max((s.duration for s in self.nodes.values()), default=0.0)
+        if longest <= 0:
+            return dict((i, 0.0) for i in self.nodes)
+        return dict((i, s.duration / longest) for i, s in self.nodes.items())
+
+    def chrome_events(self):
+        """
+        Returns: list of trace events, see the "Trace Event Format" document
+        of the Chromium project.
+        """
+        def us(t):
+            return round((t - self.t0) * 1e6, 3)
+
+        events = []
+        threads = {}
+        bytes_in = {}
+        for (a, b), n in self.links.items():
+            bytes_in[b[0]] = bytes_in.get(b[0], 0) + n
+
+        for i, s in sorted(self.nodes.items()):
+            pid, tid = s.worker
+            threads.setdefault(pid, set()).add(tid)
+            name = self.names.get(i, str(i))
+            events.append({
+                'name': name, 'cat': 'node', 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': us(s.start), 'dur': round(s.duration * 1e6, 3),
+                'args': {'node': i, 'wait (ms)': s.wait * 1e3, 'bytes in': bytes_in.get(i, 0)}})
+            if s.wait > 0:
+                wait = {'name': name, 'cat': 'queue', 'id': i, 'pid': self.pid, 'tid': 0}
+                events.append(dict(wait, ph='b', ts=us(s.ready)))
+                events.append(dict(wait, ph='e', ts=us(s.start)))
+
+        for k, ((a, b), n) in enumerate(sorted(self.links.items())):
+            if a[0] not in self.nodes or b[0] not in self.nodes:
+                continue
+            src, dst = self.nodes[a[0]], self.nodes[b[0]]
+            flow = {'name': a[1], 'cat': 'link', 'id': k, 'args': {'bytes': n}}
+            events.append(dict(flow, ph='s', pid=src.worker[0], tid=src.worker[1],
+                               ts=us(src.end) - 0.001))
+            events.append(dict(flow, ph='f', bp='e', pid=dst.worker[0], tid=dst.worker[1],
+                               ts=us(dst.start)))
+
+        for pid, tids in threads.items():
+            label = "main" if pid == self.pid else "worker {0}".format(pid)
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                           'args': {'name': label}})
+            for k, tid in enumerate(sorted(tids)):
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                               'args': {'name': "thread {0}".format(k)}})
+        return events
+
+    def save(self, path):
+        """
+        Write the trace as Chrome trace-event JSON.
+        """
+        with open(path, 'w') as f:
+            f.write(json.dumps({'traceEvents': self.chrome_events(), 'displayTimeUnit': 'ms'}))
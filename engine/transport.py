@@ -0,0 +1,244 @@
+"""
+Passing large arrays between processes without pickling them. When nodes
+run in a process pool, every value on a link is pickled from the worker
+that made it to the main process and again from there to the worker that
+needs it. With a `Transport`, a worker puts every NumPy array of at least
+`threshold` bytes that a node outputs into a `multiprocessing.shared_memory`
+segment (or a memory-mapped file in `directory`), and only a small
+`SharedArray` descriptor travels through the pool. The consumer maps the
+same memory; no bytes are copied on the way.
+
+The `Executor` counts, for every shared output, the links that leave its
+noodlet in `_links`; when the last node at the end of one of them is done,
+the array is copied into the main process for `Result.values` and the
+segment is freed. Values that are small, not arrays, or arrays of Python
+objects are pickled as before.
+
+    Executor(model, pool='process', transport=Transport()).run()
+"""
+
+import os
+import uuid
+
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+
+class SharedArray:
+    """
+    Descriptor of an array in shared memory or in a file, small enough to
+    pickle.
+    """
+    def __init__(self, name, shape, dtype, path=None):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.path = path
+        self._shm = None
+
+    def __getstate__(self):
+        return (self.name, self.shape, self.dtype, self.path)
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype, self.path = state
+        self._shm = None
+
+    def __repr__(self):
+        return "SharedArray({0!r}, {1}, {2})".format(self.name, self.shape, self.dtype)
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape, dtype=np.int64)) * np.dtype(self.dtype).itemsize
+
+    def attach(self):
+        """
+        The array, mapped from shared memory without copying.
+        """
+        if self.path is not None:
+            return np.memmap(self.path, dtype=self.dtype, mode='r+', shape=self.shape)
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(self.name)
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    def close(self):
+        """
+        Drop this process's mapping; fails quietly while arrays from
+        `attach` are still alive.
+        """
+        if self._shm is not None:
+            try:
+                self._shm.close()
+                self._shm = None
+            except BufferError:
+                pass
+
+    def materialise(self):
+        """
+        Copy the array into the memory of this process.
+        """
+        a = np.array(self.attach())
+        self.close()
+        return a
+
+    def free(self):
+        """
+        Remove the segment or file. Call once, after the last reader.
+        """
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            return
+        shm = self._shm if self._shm is not None else shared_memory.SharedMemory(self.name)
+        self._shm = None
+        try:
+            shm.close()
+        except BufferError:
+            pass
+        shm.unlink()
+
+
+class Transport:
+    """
+    Arguments:
+        threshold - arrays of fewer bytes are pickled
+        directory - put arrays in memory-mapped files here instead of
+            shared memory, for when `/dev/shm` is small
+    """
+    def __init__(self, threshold=64 * 2**10, directory=None):
+        self.threshold = threshold
+        self.directory = directory
+
+    def prepare(self):
+        """
+        Start the resource tracker before the pool is made, so the workers
+        share it with the main process, which frees the segments.
+        """
+        if self.directory is None:
+            resource_tracker.ensure_running()
+
+    def shares(self, value):
+        return isinstance(value, np.ndarray) and not value.dtype.hasobject \
+            and value.nbytes >= self.threshold
+
+    def export(self, value):
+        """
+        Put `value` in shared memory if it's worth it.
+
+        Returns: SharedArray, or `value` itself
+        """
+        if not self.shares(value):
+            return value
+
+        name = "noodles-{0}".format(uuid.uuid4().hex[:16])
+        if self.directory is not None:
+            path = os.path.join(self.directory, name)
+            target = np.memmap(path, dtype=value.dtype, mode='w+', shape=value.shape)
+            target[...] = value
+            target.flush()
+            del target
+            return SharedArray(name, value.shape, value.dtype.str, path)
+
+        shm = shared_memory.SharedMemory(name, create=True, size=max(value.nbytes, 1))
+        target = np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)
+        target[...] = value
+        del target
+        shm.close()
+        return SharedArray(name, value.shape, value.dtype.str)
+
+    def run(self, node, inputs):
+        """
+        Compute `node` in a worker: map the shared inputs, and share the
+        large outputs.
+        """
+        shared = []
+
+        def attach(v):
+            if isinstance(v, SharedArray):
+                shared.append(v)
+                return v.attach()
+            if isinstance(v, list):
+                return [attach(x) for x in v]
+            return v
+
+        # an input with several links is a list
+        inputs = dict((k, attach(v)) for k, v in inputs.items())
+        outputs = node.compute(inputs)
+        outputs = dict((k, self.export(v)) for k, v in outputs.items())
+        del inputs
+        for v in shared:
+            v.close()
+        return outputs
+
+
+class SharedValues:
+    """
+    Bookkeeping of the shared outputs in the main process: how many links
+    still have to read each of them.
+    """
+    def __init__(self):
+        self.pending = {}       # output noodlet -> (SharedArray, readers left)
+        self.bytes_shared = 0
+
+    def add(self, noodlet, value, readers):
+        """
+        Start counting the readers of a new output.
+
+        Returns: the value to keep for now; a shared array without readers
+        is copied in and freed right away.
+        """
+        if not isinstance(value, SharedArray):
+            return value
+        self.bytes_shared += value.nbytes
+        if readers == 0:
+            return self._collect(value)
+        self.pending[noodlet] = (value, readers)
+        return value
+
+    def holds(self, values):
+        """
+        Are any of `values`, the inputs or outputs of a node, in shared
+        memory?
+        """
+        return any(isinstance(v, SharedArray) or
+                   (isinstance(v, list) and any(isinstance(x, SharedArray) for x in v))
+                   for v in values.values())
+
+    def release(self, noodlet):
+        """
+        One link from `noodlet` was read.
+
+        Returns: the materialised value once the last link was read, else
+        None
+        """
+        if noodlet not in self.pending:
+            return None
+        value, readers = self.pending[noodlet]
+        if readers > 1:
+            self.pending[noodlet] = (value, readers - 1)
+            return None
+        del self.pending[noodlet]
+        return self._collect(value)
+
+    def _collect(self, value):
+        a = value.materialise()
+        value.free()
+        return a
+
+    def discard(self, outputs):
+        """
+        Free the shared `outputs` of a node that nobody will read, after a
+        failed run.
+        """
+        for v in outputs.values():
+            if isinstance(v, SharedArray):
+                v.free()
+
+    def clear(self):
+        """
+        Free everything that is left, after a failed run.
+        """
+        for value, _ in self.pending.values():
+            value.free()
+        self.pending.clear()
@@ -0,0 +1,47 @@
+"""
+Checks on a workflow before it is run: the link dictionaries should agree
+with each other and with the nodes, the types of linked noodlets should
+fit, the workflow should be free of cycles, and every input noodlet should
+either be linked or have a value.
+"""
+
+from data.types import mismatches, port_type, type_name
+
+from .schedule import topological_order, CycleError
+
+
+def problems(model):
+    """
+    Generate a description of everything that would keep `model` from
+    running. An empty result means the workflow is fine.
+    """
+    nodes = model._nodes
+
+    for a, b in model.all_links():
+        if a[0] not in nodes or b[0] not in nodes:
+            yield "Link {0} -> {1} refers to a node that doesn't exist.".format(a, b)
+        elif a not in model._inverse_links.get(b, ()):
+            yield "Link {0} -> {1} is missing from the inverse links.".format(a, b)
+
+    for b, sources in model._inverse_links.items():
+        for a in sources:
+            if b not in model._links.get(a, ()):
+                yield "Inverse link {0} <- {1} is missing from the links.".format(b, a)
+
+    if all(a[0] in nodes and b[0] in nodes for a, b in model.all_links()):
+        for a, b in mismatches(model):
+            yield "Link {0} -> {1} connects a {2} to a {3}.".format(
+                a, b, type_name(port_type(nodes[a[0]], a[1], 'out')),
+                type_name(port_type(nodes[b[0]], b[1], 'in')))
+
+    try:
+        topological_order(model)
+    except CycleError as e:
+        yield str(e)
+
+    for i, node in model.all_nodes():
+        values = getattr(node, 'values', {})
+        for s in node.input_noodlets():
+            if not model._inverse_links.get((i, s.name)) and s.name not in values:
+                yield "Input '{0}' of node {1} ({2}) is not linked and has no value." \
+                    .format(s.name, i, node.name)
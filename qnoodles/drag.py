@@ -0,0 +1,67 @@
+import time
+
+from PySide import QtCore
+
+from .nodebox import NodeBox
+
+
+class DragMove:
+    """
+    Moving one or more nodes with the mouse. Every item of a dragged node
+    (the `NodeItem`, or the proxy and the noodlets of a `NodeBox`) is put
+    at its start position plus the offset of the mouse, with `setPos`; no
+    item is re-parented and no widget is moved, so nothing gets laid out
+    again. The data model is only written to when the drag ends, for all
+    nodes at once with `DataModel.move_nodes`.
+
+    Every `moveTo` is a frame; the time it takes, including rebuilding the
+    links on the hot tile, is kept in `frame_times` and passed to the
+    scene's `frame_hook`, if set.
+    """
+    def __init__(self, scene, nodes, origin):
+        self.scene = scene
+        self.nodes = set(nodes)
+        self.origin = QtCore.QPointF(origin)
+        self.delta = QtCore.QPointF(0, 0)
+        self.frame_times = []
+
+        model = scene.data_model
+        self.start = dict((i, model._nodes[i].location) for i in self.nodes
+                          if model._nodes[i].location is not None)
+        self.items = []
+        for i in self.nodes:
+            for item in (scene.nodes.get(i), scene.editors.get(i)):
+                if isinstance(item, NodeBox):
+                    self.items.extend((x, x.pos()) for x in [item.proxy] + item.noodlets)
+                elif item is not None:
+                    self.items.append((item, item.pos()))
+
+    def moveTo(self, pos):
+        t0 = time.perf_counter()
+        self.delta = pos - self.origin
+        for item, start in self.items:
+            item.setPos(start + self.delta)
+        self.scene.links.hot.rebuild(self.scene.noodletPos)
+
+        dt = time.perf_counter() - t0
+        self.frame_times.append(dt)
+        if self.scene.frame_hook is not None:
+            self.scene.frame_hook(dt)
+
+    def locations(self):
+        """
+        Where the dragged nodes end up.
+
+        Returns: dictionary of node index to location
+        """
+        dx, dy = int(round(self.delta.x())), int(round(self.delta.y()))
+        return dict((i, [x + dx, y + dy]) for i, (x, y) in self.start.items())
+
+    def stats(self):
+        """
+        Returns: (number of frames, mean and worst frame time in seconds)
+        """
+        times = self.frame_times
+        if not times:
+            return 0, None, None
+        return len(times), sum(times) / len(times), max(times)
@@ -0,0 +1,268 @@
+import math
+
+from PySide import QtGui, QtCore
+from PySide.QtCore import Qt
+
+from .style import traffic_pen
+
+#: number of link widths in the profiling overlay
+TRAFFIC_LEVELS = 8
+
+
+def link_path(path, a, b):
+    """
+    Add a link from point `a` to point `b` to a `QPainterPath`, as a cubic
+    curve leaving `a` to the right and arriving at `b` from the left.
+    """
+    dx = max(abs(b.x() - a.x()) / 2, 40)
+    path.moveTo(a)
+    path.cubicTo(a.x() + dx, a.y(), b.x() - dx, b.y(), b.x(), b.y())
+
+
+class LinkTile(QtGui.QGraphicsItem):
+    """
+    All links starting in one tile of the scene, painted as a single
+    cached `QPainterPath`.
+    """
+    pen = QtGui.QPen(QtGui.QBrush(Qt.black), 1.5)
+
+    def __init__(self, pen=None):
+        super(LinkTile, self).__init__()
+        self.links = set()
+        self.path = QtGui.QPainterPath()
+        self.setZValue(-1)
+        if pen is not None:
+            self.pen = pen
+
+    def rebuild(self, position):
+        """
+        Recompute the path, where `position(noodlet, direction)` gives the
+        scene position of a noodlet.
+        """
+        self.prepareGeometryChange()
+        self.path = QtGui.QPainterPath()
+        for a, b in self.links:
+            link_path(self.path, position(a, 'out'), position(b, 'in'))
+        self.update()
+
+    def boundingRect(self):
+        w = self.pen.widthF()
+        return self.path.controlPointRect().adjusted(-w, -w, w, w)
+
+    def paint(self, painter, option, widget):
+        painter.setRenderHints(painter.Antialiasing)
+        painter.strokePath(self.path, self.pen)
+
+
+class LinkLayer:
+    """
+    Draws the links of the data model. Instead of one item per link, links
+    are batched into one `LinkTile` per square tile of the scene, by the
+    location of their source node. Moving a node only rebuilds the tiles
+    holding its links.
+
+    While a node is being dragged, its links are taken out of their tiles
+    and drawn on a separate tile of their own, so that each mouse move only
+    rebuilds the links touching the moving nodes, found through `_links`
+    and `_inverse_links`.
+
+    In a lazy scene, the links of a node are only placed once the node
+    first comes into view (see `reveal`), so opening a large workflow
+    doesn't touch every link and node; a link is drawn as soon as one of
+    its ends was in view.
+
+    The profiling overlay draws the links that carried data over the
+    others, on one tile per width, see `showTraffic`.
+    """
+    def __init__(self, scene, tile_size=1024):
+        self.scene = scene
+        self.model = scene.data_model
+        self.tile_size = tile_size
+        self.tiles = {}         # (int, int) -> LinkTile
+        self.tile_of = {}       # link -> tile key
+        self.dragging = set()   # nodes being dragged
+        self.hot = LinkTile(QtGui.QPen(QtGui.QBrush(Qt.darkBlue), 2))
+        scene.addItem(self.hot)
+        self.traffic = []       # tiles of the profiling overlay
+        self.lazy = getattr(scene, 'lazy', False)
+        self.revealed = set()   # nodes whose links are placed, in a lazy scene
+
+        if not self.lazy:
+            for a, b in self.model.all_links():
+                self._place(a, b)
+            for tile in self.tiles.values():
+                tile.rebuild(scene.noodletPos)
+
+    def _key(self, a):
+        p = self.scene.noodletPos(a, 'out')
+        return (int(p.x() // self.tile_size), int(p.y() // self.tile_size))
+
+    def _place(self, a, b):
+        key = self._key(a)
+        if key not in self.tiles:
+            self.tiles[key] = LinkTile()
+            self.scene.addItem(self.tiles[key])
+        self.tiles[key].links.add((a, b))
+        self.tile_of[(a, b)] = key
+        return key
+
+    def _unplace(self, a, b):
+        key = self.tile_of.pop((a, b))
+        self.tiles[key].links.discard((a, b))
+        return key
+
+    def links_of(self, i):
+        """
+        All links into or out of node `i`.
+        """
+        node = self.model._nodes[i]
+        links = set()
+        for s in node.output_noodlets():
+            links.update(((i, s.name), b) for b in self.model._links[(i, s.name)])
+        for s in node.input_noodlets():
+            links.update((a, (i, s.name)) for a in self.model._inverse_links[(i, s.name)])
+        return links
+
+    def reveal(self, nodes):
+        """
+        Place the links of `nodes`, which came into view, unless that was
+        done before. Only used in a lazy scene.
+        """
+        touched = set()
+        for i in nodes:
+            if i in self.revealed:
+                continue
+            self.revealed.add(i)
+            for link in self.links_of(i):
+                if link not in self.tile_of and link not in self.hot.links:
+                    touched.add(self._place(*link))
+        self._rebuild(touched)
+
+    def _rebuild(self, keys):
+        for key in keys:
+            self.tiles[key].rebuild(self.scene.noodletPos)
+
+    def apply(self, added=(), removed=(), moved=()):
+        """
+        Add and remove links, and follow moved nodes, rebuilding every
+        affected tile only once at the end. Links of nodes that are being
+        dragged go to the hot tile.
+        """
+        touched = set()
+        hot = False
+
+        for a, b in removed:
+            if (a, b) in self.hot.links:
+                self.hot.links.discard((a, b))
+                hot = True
+            elif (a, b) in self.tile_of:
+                touched.add(self._unplace(a, b))
+
+        for i in moved:
+            if i in self.dragging:
+                hot = True
+                continue
+            for link in self.links_of(i):
+                if link in self.tile_of:
+                    touched.add(self._unplace(*link))
+                    touched.add(self._place(*link))
+
+        for a, b in added:
+            if (a, b) in self.hot.links or (a, b) in self.tile_of:
+                continue
+            if self.lazy and a[0] not in self.revealed and b[0] not in self.revealed:
+                continue    # placed when one of its nodes comes into view
+            if a[0] in self.dragging or b[0] in self.dragging:
+                self.hot.links.add((a, b))
+                hot = True
+            else:
+                touched.add(self._place(a, b))
+
+        self._rebuild(touched)
+        if hot:
+            self.hot.rebuild(self.scene.noodletPos)
+        if self.traffic and (removed or set(moved) - self.dragging):
+            self._rebuildTraffic(removed)
+
+    def addLink(self, a, b):
+        self.apply(added=[(a, b)])
+
+    def removeLink(self, a, b):
+        self.apply(removed=[(a, b)])
+
+    def remap(self, table):
+        """
+        Apply a table of old to new node indices to all links, without
+        rebuilding any paths; the geometry doesn't change.
+        """
+        def f(noodlet):
+            return (table.get(noodlet[0], noodlet[0]), noodlet[1])
+
+        for tile in list(self.tiles.values()) + [self.hot] + self.traffic:
+            tile.links = set((f(a), f(b)) for a, b in tile.links)
+        self.tile_of = dict(((f(a), f(b)), key) for (a, b), key in self.tile_of.items())
+        self.dragging = set(table.get(i, i) for i in self.dragging)
+        self.revealed = set(table[i] for i in self.revealed if i in table)
+
+    def beginDrag(self, nodes):
+        """
+        Move the links of `nodes` from their tiles to the hot tile.
+        """
+        self.dragging.update(nodes)
+        touched = set()
+        for i in nodes:
+            for link in self.links_of(i):
+                if link in self.tile_of:
+                    touched.add(self._unplace(*link))
+                    self.hot.links.add(link)
+        self._rebuild(touched)
+        self.hot.rebuild(self.scene.noodletPos)
+
+    def endDrag(self):
+        """
+        Put the links of the dragged nodes back in their (new) tiles.
+        """
+        touched = set(self._place(a, b) for a, b in self.hot.links)
+        self.hot.links = set()
+        self.dragging = set()
+        self._rebuild(touched)
+        self.hot.rebuild(self.scene.noodletPos)
+        if self.traffic:
+            self._rebuildTraffic()
+
+    def nodeMoved(self, i):
+        self.apply(moved=[i])
+
+    def showTraffic(self, links):
+        """
+        Overlay the links that carried data in a profiled run, given as a
+        dictionary of link to bytes: the more bytes, on a log scale, the
+        wider and redder the link.
+        """
+        self.clearTraffic()
+        links = dict((link, n) for link, n in links.items()
+                     if n > 0 and (link in self.tile_of or link in self.hot.links))
+        if not links:
+            return
+
+        top = math.log1p(max(links.values()))
+        levels = {}
+        for link, n in links.items():
+            levels.setdefault(int(round(TRAFFIC_LEVELS * math.log1p(n) / top)), set()).add(link)
+        for level, members in sorted(levels.items()):
+            tile = LinkTile(traffic_pen(level / TRAFFIC_LEVELS))
+            tile.links = members
+            tile.setZValue(-0.5)
+            self.scene.addItem(tile)
+            self.traffic.append(tile)
+        self._rebuildTraffic()
+
+    def clearTraffic(self):
+        for tile in self.traffic:
+            self.scene.removeItem(tile)
+        self.traffic = []
+
+    def _rebuildTraffic(self, removed=()):
+        for tile in self.traffic:
+            tile.links.difference_update(removed)
+            tile.rebuild(self.scene.noodletPos)
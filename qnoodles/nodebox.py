@@ -3,6 +3,8 @@ from PySide import QtGui, QtCore
 from PySide.QtCore import Qt
 
 from .noodlet import Noodlet
+from data.types import port_type
+from .style import noodlet_label, label_metrics, heat_color
 
 class MySeparator(QtGui.QWidget):
     """
@@ -31,7 +33,8 @@ class MyFrame(QtGui.QWidget):
     Maybe if I understand better how Qt+CSS works we can revert to using
     `QFrame`.
     """
-    
+    heat = None     # tint of the profiling overlay, see `style.heat_color`
+
     def __init__(self, parent=None):
         super(MyFrame, self).__init__(parent)
         self.setAutoFillBackground(False)
@@ -55,12 +58,16 @@ class MyFrame(QtGui.QWidget):
         w, h = self.size().toTuple()
         
         path = QtGui.QPainterPath()
-        brush = QtGui.QBrush(Qt.gray)
+        brush = QtGui.QBrush(heat_color(self.heat))
         pen = QtGui.QPen(QtGui.QBrush(Qt.black), 0.5)
         path.addRoundedRect(1, 1, w-2, h-2, 8, 8)
         pt.fillPath(path, brush)
         pt.strokePath(path, pen)
 
+    def setHeat(self, heat):
+        self.heat = heat
+        self.update()
+
 def _make_widget(noodlet):
     """
     Arguments:
@@ -71,13 +78,16 @@ def _make_widget(noodlet):
         a QWidget
     """
     
-    w = QtGui.QLabel("{name} [{dtype}]".format(name=noodlet.name, dtype=noodlet.dtype.__name__))
+    w = QtGui.QLabel(noodlet_label(noodlet))
     if noodlet.direction == 'out':
         w.setAlignment(QtCore.Qt.AlignRight)
     
     w.setProperty('labelClass', 'noodlet')
     w.setSizePolicy(QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Preferred)
     w.setContentsMargins(5, 2, 5, 2)
+
+    width, height = label_metrics(noodlet)
+    w.setMinimumSize(width + 10, height + 4)
     return w
     
 class NodeBox(MyFrame):
@@ -86,17 +96,16 @@ class NodeBox(MyFrame):
     creates the Noodlets needed for this node, but those are added to the
     QGraphicsScene independently. This seems necesary for the noodlets to
     recieve the mouse events.
-    Only during the dragging of a node are the Noodlets grouped with the node
-    so that they move in unison with the node. Once the mouse button is
-    released the group is descroyed so that the noodlets recieve their own
-    events once more.
+    While dragging, the proxy and the noodlets are moved together as
+    separate scene items, see `drag.DragMove`.
     """
-    def __init__(self, node, scene):
+    def __init__(self, node, scene, index=None):
         super(NodeBox, self).__init__()
         self.scene = scene
         self.data  = node
+        self.index = index
+        self.heat  = scene.heat.get(index)
         
-        style = str(open("static/qt-style.css", "r").read())
         #self.setFrameStyle(self.StyledPanel | self.Plain)
         self.box = QtGui.QVBoxLayout()
         self.setLayout(self.box)
@@ -125,21 +134,29 @@ class NodeBox(MyFrame):
         #self.group = QtGui.QGraphicsItemGroup(self.proxy, scene)
         #self.group.addToGroup(self.proxy)
         
-        self.noodlets = [Noodlet(*self.output_item_pos(i)) for i in self.output_items] \
-                      + [Noodlet(*self.input_item_pos(i)) for i in self.input_items]
+        self.noodlets = [Noodlet(*self.output_item_pos(i), noodlet=(index, s.name),
+                                 direction='out', dtype=port_type(node, s.name, 'out'))
+                         for i, s in zip(self.output_items, self.data.output_noodlets())] \
+                      + [Noodlet(*self.input_item_pos(i), noodlet=(index, s.name),
+                                 direction='in', dtype=port_type(node, s.name, 'in'))
+                         for i, s in zip(self.input_items, self.data.input_noodlets())]
                       
+        self.noodlet_items = dict(
+            zip([('out', s.name) for s in self.data.output_noodlets()]
+                + [('in', s.name) for s in self.data.input_noodlets()],
+                self.noodlets))
+
         for n in self.noodlets:
             scene.addItem(n)
             n.signal.pressed.connect(scene.noodletPressed)
             n.signal.released.connect(scene.noodletReleased)
             n.setZValue(10)
         #    self.group.addToGroup(n)
+        scene.addNoodlets(self.noodlets)
 
         #scene.addItem(self.group)
         
         #self.setProperty('frameClass', 'blue')
-        self.setStyleSheet(style)
-        self.dragging = False
         self.show()
         
     def input_item_pos(self, item):
@@ -152,33 +169,44 @@ class NodeBox(MyFrame):
         y = item.y() + item.height()/2 + self.y()
         return x, y
         
-    #class manual_drag:            
-    def mousePressEvent(self, event):
-        self.group = QtGui.QGraphicsItemGroup(self.proxy, self.scene)
+    def remap(self, table):
+        """
+        Apply a table of old to new node indices, see `DataModel.compact`.
+        """
+        self.index = table.get(self.index, self.index)
         for n in self.noodlets:
-            n.setZValue(20)
-            self.group.addToGroup(n)
-        self.proxy.setZValue(19)
-            
-        self.dragging = True
-        self.drag_pos = (event.x(), event.y())
-        #print("draging... ({0}, {1}) ".format(*self.drag_pos), end='', flush=True)
-        
-    def mouseMoveEvent(self, event):
-        if self.dragging:
-            x = self.x(); y = self.y()
-            #self.scene.update(x-10, y-10, self.width() + 20, self.height()+20)
-            #for n in self.noodlets:
-                #n.update()
-            x += (event.x() - self.drag_pos[0])
-            y += (event.y() - self.drag_pos[1])
-            self.move(x, y)
-            
-    def mouseReleaseEvent(self, event):
-        self.scene.destroyItemGroup(self.group)
+            n.remap(table)
+
+    def location(self):
+        return [int(self.proxy.x()), int(self.proxy.y())]
+
+    def moveTo(self, x, y):
+        """
+        Move the box and its noodlets, when the node was moved in the data
+        model.
+        """
+        dx, dy = x - self.proxy.x(), y - self.proxy.y()
+        self.proxy.setPos(x, y)
         for n in self.noodlets:
-            n.setZValue(10)
-        self.proxy.setZValue(0)
-        self.dragging = False
-        #rint("drop")
+            n.moveBy(dx, dy)
+
+    def detach(self):
+        """
+        Remove the proxy and the noodlets from the scene.
+        """
+        self.scene.removeNoodlets(self.noodlets)
+        for n in self.noodlets:
+            self.scene.removeItem(n)
+        self.scene.removeItem(self.proxy)
 
+    def _scenePos(self, event):
+        return self.proxy.mapToScene(QtCore.QPointF(event.pos()))
+
+    def mousePressEvent(self, event):
+        self.scene.nodeDragStarted(self.index, self._scenePos(event))
+
+    def mouseMoveEvent(self, event):
+        self.scene.nodeDragMoved(self._scenePos(event))
+
+    def mouseReleaseEvent(self, event):
+        self.scene.nodeDragFinished(self.index)
@@ -0,0 +1,192 @@
+from itertools import chain
+from PySide import QtGui, QtCore
+from PySide.QtCore import Qt
+
+from .style import noodlet_label, label_metrics, heat_color
+
+#: below this level of detail a node is drawn as a plain block
+LOD_BLOCK = 0.25
+#: below this level of detail only the outline and title are drawn
+LOD_TITLE = 0.6
+
+
+class NodeItem(QtGui.QGraphicsItem):
+    """
+    Lightweight rendering of a Node. Where the `NodeBox` is a full widget
+    with a layout and a label per noodlet, the `NodeItem` draws the same
+    thing into a `QPicture` once, and replays that on every paint. The
+    noodlets are drawn as part of the picture; to connect them the user
+    double-clicks the node, at which point the scene swaps in a real
+    `NodeBox` (see `NodeScene.edit`).
+
+    When zoomed out, the picture is replaced by simpler glyphs, see
+    `LOD_TITLE` and `LOD_BLOCK`.
+    """
+    padding = 5
+    radius = 6
+
+    def __init__(self, index, node, scene):
+        super(NodeItem, self).__init__()
+        self.scene = scene
+        self.index = index
+        self.data = node
+        self.heat = scene.heat.get(index)
+
+        self.setFlag(self.ItemIsSelectable)
+        self.setCacheMode(self.DeviceCoordinateCache)
+
+        self._picture = None
+        self._layout()
+        # placed before it sends geometry changes: this isn't a move
+        self.setPos(*(node.location or (0, 0)))
+        self.setFlag(self.ItemSendsGeometryChanges)
+        scene.addItem(self)
+
+    def _layout(self):
+        """
+        Compute the size of the node and the position of each row from the
+        font metrics, without creating any widgets.
+        """
+        self.font = QtGui.QFont()
+        self.title_font = QtGui.QFont(self.font)
+        self.title_font.setBold(True)
+        fm = QtGui.QFontMetrics(self.font)
+        title_fm = QtGui.QFontMetrics(self.title_font)
+
+        self.input_names = [s.name for s in self.data.input_noodlets()]
+        self.output_names = [s.name for s in self.data.output_noodlets()]
+        self.inputs = [noodlet_label(s) for s in self.data.input_noodlets()]
+        self.outputs = [noodlet_label(s) for s in self.data.output_noodlets()]
+        widths = [label_metrics(s, self.font)[0] for s in
+                  chain(self.data.input_noodlets(), self.data.output_noodlets())]
+
+        p = self.padding
+        self.row = fm.height() + 2 * p
+        width = max([title_fm.width(self.data.name)] + widths) + 4 * p
+        height = self.row * (1 + len(self.inputs) + len(self.outputs)) + 8 + 2 * p
+        self.rect = QtCore.QRectF(0, 0, width, height)
+
+    def boundingRect(self):
+        r = self.radius
+        return self.rect.adjusted(-r, 0, r, 0)
+
+    def input_pos(self, k):
+        return QtCore.QPointF(0, self.padding + self.row * (k + 1.5))
+
+    def output_pos(self, k):
+        return QtCore.QPointF(
+            self.rect.width(),
+            self.padding + self.row * (len(self.inputs) + k + 1.5) + 8)
+
+    def noodletPos(self, name, direction):
+        """
+        Scene position of a noodlet.
+        """
+        if direction == 'in':
+            p = self.input_pos(self.input_names.index(name))
+        else:
+            p = self.output_pos(self.output_names.index(name))
+        return self.mapToScene(p)
+
+    def remap(self, table):
+        """
+        Apply a table of old to new node indices, see `DataModel.compact`.
+        """
+        self.index = table.get(self.index, self.index)
+
+    def invalidate(self):
+        """
+        Throw away the cached picture, for instance after a rename.
+        """
+        self.prepareGeometryChange()
+        self._picture = None
+        self._layout()
+        self.update()
+
+    def setHeat(self, heat):
+        """
+        Tint for the profiling overlay, see `style.heat_color`.
+        """
+        self.heat = heat
+        self._picture = None
+        self.update()
+
+    def _frame(self, painter):
+        path = QtGui.QPainterPath()
+        path.addRoundedRect(self.rect.adjusted(1, 1, -1, -1), 8, 8)
+        painter.fillPath(path, QtGui.QBrush(heat_color(self.heat)))
+        painter.strokePath(path, QtGui.QPen(QtGui.QBrush(Qt.black), 0.5))
+
+    def _title(self, painter):
+        painter.setFont(self.title_font)
+        painter.drawText(QtCore.QRectF(0, self.padding, self.rect.width(), self.row),
+                         Qt.AlignCenter, self.data.name)
+
+    def _render(self):
+        picture = QtGui.QPicture()
+        pt = QtGui.QPainter(picture)
+        pt.setRenderHints(pt.Antialiasing)
+
+        self._frame(pt)
+        self._title(pt)
+
+        p = self.padding
+        w = self.rect.width()
+        pt.setFont(self.font)
+        for k, text in enumerate(self.inputs):
+            pt.drawText(QtCore.QRectF(2 * p, p + self.row * (k + 1), w - 4 * p, self.row),
+                        Qt.AlignLeft | Qt.AlignVCenter, text)
+
+        y = p + self.row * (len(self.inputs) + 1) + 4
+        pt.drawLine(QtCore.QPointF(4, y), QtCore.QPointF(w - 4, y))
+
+        for k, text in enumerate(self.outputs):
+            top = p + self.row * (len(self.inputs) + k + 1) + 8
+            pt.drawText(QtCore.QRectF(2 * p, top, w - 4 * p, self.row),
+                        Qt.AlignRight | Qt.AlignVCenter, text)
+
+        centres = [self.input_pos(k) for k in range(len(self.inputs))] \
+                + [self.output_pos(k) for k in range(len(self.outputs))]
+        r = self.radius
+        for c in centres:
+            pt.setBrush(QtGui.QBrush(QtGui.QColor(90, 90, 200)))
+            pt.setPen(QtGui.QPen(QtGui.QBrush(Qt.black), 0.6))
+            pt.drawEllipse(c, r, r)
+
+        pt.end()
+        return picture
+
+    def paint(self, painter, option, widget):
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+
+        if lod < LOD_BLOCK:
+            painter.fillRect(self.rect, heat_color(self.heat))
+            return
+
+        if lod < LOD_TITLE:
+            self._frame(painter)
+            self._title(painter)
+            return
+
+        if self._picture is None:
+            self._picture = self._render()
+        painter.drawPicture(0, 0, self._picture)
+
+    def itemChange(self, change, value):
+        if change == self.ItemPositionHasChanged:
+            self.scene.nodeMoved(self.index, [int(self.x()), int(self.y())])
+        return super(NodeItem, self).itemChange(change, value)
+
+    def mousePressEvent(self, event):
+        super(NodeItem, self).mousePressEvent(event)
+        self.scene.nodeDragStarted(self.index, event.scenePos())
+
+    def mouseMoveEvent(self, event):
+        self.scene.nodeDragMoved(event.scenePos())
+
+    def mouseReleaseEvent(self, event):
+        super(NodeItem, self).mouseReleaseEvent(event)
+        self.scene.nodeDragFinished(self.index)
+
+    def mouseDoubleClickEvent(self, event):
+        self.scene.edit(self.index)
@@ -8,11 +8,18 @@ class NoodletSignal(QtCore.QObject):
     released = QtCore.Signal((int,str))
 
 class Noodlet(QtGui.QGraphicsWidget):    
-    def __init__(self, x, y):
+    colors = {False: QtGui.QColor(90,90,200), True: QtGui.QColor(60,180,60)}
+
+    def __init__(self, x, y, noodlet=None, direction=None, dtype=None):
         super(Noodlet, self).__init__()
         self.signal = NoodletSignal()
         
-        self.noodlet = (random.randint(0, 65536), "dummy")
+        if noodlet is None or noodlet[0] is None:
+            noodlet = (random.randint(0, 65536), "dummy")
+        self.noodlet = noodlet
+        self.direction = direction
+        self.dtype = dtype
+        self.highlighted = False
         self.setAcceptHoverEvents(True)
         self.setAcceptedMouseButtons(Qt.LeftButton | Qt.RightButton)
         
@@ -24,10 +31,25 @@ class Noodlet(QtGui.QGraphicsWidget):
         self.inner_path = QtGui.QPainterPath()
         self.inner_path.addEllipse(-9, -9, 18, 18)
         
-        self.bg_color = QtGui.QColor(90,90,200)
+        self.bg_color = self.colors[False]
         self.inner_line_color = Qt.white
         self.outer_line_color = Qt.black        
         
+    def remap(self, table):
+        """
+        Apply a table of old to new node indices, see `DataModel.compact`.
+        """
+        i, name = self.noodlet
+        self.noodlet = (table.get(i, i), name)
+
+    def setHighlight(self, on):
+        """
+        Mark this noodlet as a place where the link being drawn can go.
+        """
+        self.highlighted = on
+        self.bg_color = self.colors[on]
+        self.update()
+
     def boundingRect(self):
         return QtCore.QRectF(-16, -16, 48, 48)
         
@@ -51,6 +73,6 @@ class Noodlet(QtGui.QGraphicsWidget):
         self.update()
     
     def hoverLeaveEvent(self, event):
-        self.bg_color = QtGui.QColor(90,90,200)
+        self.bg_color = self.colors[self.highlighted]
         self.update()
 
@@ -9,11 +9,20 @@
     @contact: j.hidding@esciencecenter.nl
 """
 
-import sys, os
+import sys, os, time
 from PySide import QtGui, QtCore
 from PySide.QtCore import Qt
 
+from data.spatial import GridIndex, node_rect
+from data.events import ChangeBus
+from data.types import INDEX, port_type
+from data.composite import CompositeNode, collapse, expand
+
 from .nodebox import NodeBox
+from .nodeitem import NodeItem
+from .linklayer import LinkLayer
+from .drag import DragMove
+from .style import apply_style
 #from .sourceview import SourceView
         
 class NodeView(QtGui.QGraphicsView):
@@ -21,34 +30,559 @@ class NodeView(QtGui.QGraphicsView):
         super(NodeView, self).__init__(scene)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        self.setTransformationAnchor(self.AnchorUnderMouse)
+        self.setViewportUpdateMode(self.SmartViewportUpdate)
+        self.setOptimizationFlags(self.DontSavePainterState | self.DontAdjustForAntialiasing)
+        self.setDragMode(self.RubberBandDrag)
+        self._band_origin = None
         self.show()
 
+    def mousePressEvent(self, event):
+        # only a press on the background starts a rubber band
+        self._band_origin = event.pos() if self.itemAt(event.pos()) is None else None
+        super(NodeView, self).mousePressEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        super(NodeView, self).mouseReleaseEvent(event)
+        if self._band_origin is not None and hasattr(self.scene(), 'selectRegion') \
+                and (event.pos() - self._band_origin).manhattanLength() > 4:
+            band = QtCore.QRect(self._band_origin, event.pos()).normalized()
+            self.scene().selectRegion(self.mapToScene(band).boundingRect())
+        self._band_origin = None
+
+    def visibleRect(self):
+        """
+        The part of the scene that is shown, in scene coordinates.
+        """
+        return self.mapToScene(self.viewport().rect()).boundingRect()
+
+    def _viewportChanged(self):
+        if getattr(self.scene(), 'lazy', False):
+            self.scene().showRegion(self.visibleRect())
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            f = 1.15 ** (event.delta() / 120.0)
+            self.scale(f, f)
+            self._viewportChanged()
+        else:
+            super(NodeView, self).wheelEvent(event)
+
+    def scrollContentsBy(self, dx, dy):
+        super(NodeView, self).scrollContentsBy(dx, dy)
+        self._viewportChanged()
+
+    def resizeEvent(self, event):
+        super(NodeView, self).resizeEvent(event)
+        self._viewportChanged()
+
+    def showEvent(self, event):
+        super(NodeView, self).showEvent(event)
+        self._viewportChanged()
+
 class NodeScene(QtGui.QGraphicsScene):
-    def __init__(self, data_model):
-        super(NodeScene, self).__init__()            
-        self.nodes = [NodeBox(n, self) for i, n in data_model.all_nodes()]
+    """
+    The scene can show the nodes in two ways:
+        - 'widget', every node is a `NodeBox` widget embedded in the scene
+        - 'item', every node is a lightweight `NodeItem`; only the nodes
+          the user is editing get a `NodeBox`. Use this for large graphs.
+
+    With `lazy=True` nodes are only created once they scroll into a view,
+    found through the spatial index of the data model. Nodes that have
+    been out of sight for `linger` seconds are dropped again.
+
+    Edits to the data model reach the scene through a `ChangeBus`, which
+    is flushed once per frame, see `modelChanged`.
+    """
+    #: (node index, state, worker) from a distributed run, see
+    #: `engine.distributed`; safe to emit from another thread
+    statusChanged = QtCore.Signal(int, str, str)
+
+    def __init__(self, data_model, mode='widget', lazy=False, linger=5.0):
+        super(NodeScene, self).__init__()
+        apply_style()
+        self.data_model = data_model
+        self.mode = mode
+        self.lazy = lazy
+        self.editors = {}
+        self.nodes = {}
+        self.selected = set()
+        self._syncing = False   # applying model changes to the scene
+        self._pressed = None    # noodlet where a new link starts
+        self.ports = {}         # (direction, type number) -> set of Noodlet
+        self._lit = []          # noodlets highlighted for the link being drawn
+        self._mouse = None      # last mouse position in the scene
+        self._drag = None       # the `DragMove` in progress
+        self.last_drag = None
+        self.frame_hook = None  # called with the seconds spent on every drag frame
+        self.heat = {}          # node index -> tint of the profiling overlay
+
+        if lazy:
+            self.index = getattr(data_model, '_spatial', None)
+            if self.index is None:
+                self.index = GridIndex.from_model(data_model)
+            bounds = self.index.bounds()
+            if bounds is not None:
+                x0, y0, x1, y1 = bounds
+                self.setSceneRect(x0, y0, x1 - x0, y1 - y0)
+
+            self.linger = linger
+            self._seen = {}
+            self._visible = None
+            self._reaper = QtCore.QTimer(self)
+            self._reaper.timeout.connect(self._dropOffscreen)
+            self._reaper.start(1000)
+        else:
+            for i, n in data_model.all_nodes():
+                self._materialise(i, n)
+
+        self.links = LinkLayer(self)
+        self.statusChanged.connect(self.showNodeStatus)
+
+        self.changes = None
+        if hasattr(data_model, '_observe'):
+            self._frame = QtCore.QTimer(self)
+            self._frame.setSingleShot(True)
+            self._frame.setInterval(16)
+            self.changes = ChangeBus(data_model, schedule=self._frame.start)
+            self._frame.timeout.connect(self.changes.flush)
+            self.changes.subscribe(self.modelChanged)
+
+    def _materialise(self, i, node):
+        if self.mode == 'widget':
+            self.nodes[i] = NodeBox(node, self, i)
+        else:
+            self.nodes[i] = NodeItem(i, node, self)
+
+        # the estimated link end points are replaced by real ones
+        if hasattr(self, 'links'):
+            self.links.nodeMoved(i)
+
+    def noodletPos(self, noodlet, direction):
+        """
+        Scene position of a noodlet, where `direction` is 'in' or 'out'.
+        For nodes that are not in the scene (yet), the position is estimated
+        from the location of the node.
+        """
+        i, name = noodlet
+        item = self.editors.get(i, self.nodes.get(i))
+
+        if isinstance(item, NodeBox):
+            return item.noodlet_items[(direction, name)].scenePos()
+        if isinstance(item, NodeItem):
+            return item.noodletPos(name, direction)
+
+        node = self.data_model._nodes[i]
+        x0, y0, x1, _ = node_rect(node)
+        if direction == 'in':
+            k = [s.name for s in node.input_noodlets()].index(name)
+            return QtCore.QPointF(x0, y0 + 40 + 25 * k)
+        k = [s.name for s in node.output_noodlets()].index(name)
+        n_in = sum(1 for _ in node.input_noodlets())
+        return QtCore.QPointF(x1, y0 + 48 + 25 * (n_in + k))
+
+    def _drop(self, i):
+        item = self.nodes.pop(i)
+        if self.lazy:
+            self._seen.pop(i, None)
+        if isinstance(item, NodeBox):
+            item.detach()
+        else:
+            self.removeItem(item)
+
+    def nodeMoved(self, i, location):
+        """
+        Called by a `NodeBox` or `NodeItem` when it is moved, to keep the
+        location in the data model and the spatial index up to date. Only
+        moves by the user get here; placing an item where its node already
+        is doesn't touch the model.
+        """
+        if self._syncing or (self._drag is not None and i in self._drag.nodes):
+            return
+        current = self.data_model._nodes[i].location
+        if current is not None and list(current) == list(location):
+            return
+
+        if hasattr(self.data_model, 'move_node'):
+            self.data_model.move_node(i, location)
+        else:
+            self.data_model._nodes[i].location = location
+            if self.lazy:
+                self.index.move(i, node_rect(self.data_model._nodes[i]))
+
+        if hasattr(self, 'links'):
+            self.links.nodeMoved(i)
+
+    def modelChanged(self, changes):
+        """
+        Bring the scene up to date with a `data.events.Changes` record,
+        holding the net changes to the model since the last frame.
+        """
+        nodes = self.data_model._nodes
+        moved = set()
+        self._syncing = True
+        try:
+            for i in changes.nodes_removed:
+                if i in self.editors:
+                    self.editors.pop(i).detach()
+                if i in self.nodes:
+                    self._drop(i)
+                self.selected.discard(i)
+
+            for i in changes.nodes_added:
+                if not self.lazy:
+                    self._materialise(i, nodes[i])
+            if self.lazy and changes.nodes_added and self._visible is not None:
+                self.showRegion(self._visible)
+
+            for i in changes.nodes_moved:
+                if nodes[i].location is None:
+                    continue
+                x, y = nodes[i].location
+                for item in (self.nodes.get(i), self.editors.get(i)):
+                    if isinstance(item, NodeBox):
+                        if item.location() != [x, y]:
+                            item.moveTo(x, y)
+                            moved.add(i)
+                    elif item is not None and (int(item.x()), int(item.y())) != (x, y):
+                        item.setPos(x, y)
+                        moved.add(i)
+                if i not in self.nodes:
+                    moved.add(i)
+
+            for i in changes.nodes_renamed:
+                if i in self.editors:
+                    self.editors[i].title.setText(nodes[i].name)
+                if i in self.nodes:
+                    self.nodes[i].invalidate()
+
+            self.links.apply(added=changes.links_added,
+                             removed=changes.links_removed, moved=moved)
+        finally:
+            self._syncing = False
+
+    def nodeDragStarted(self, i, pos):
+        """
+        Start dragging node `i`, or the whole selection if `i` is part of
+        it, from scene position `pos`.
+        """
+        nodes = set(self.selected) if i in self.selected else set([i])
+        self._drag = DragMove(self, nodes, pos)
+        self.links.beginDrag(nodes)
+
+    def nodeDragMoved(self, pos):
+        if self._drag is not None:
+            self._drag.moveTo(pos)
+
+    def nodeDragFinished(self, i):
+        """
+        Write the new locations of all dragged nodes to the data model, in
+        one go.
+        """
+        drag, self._drag = self._drag, None
+        if drag is None:
+            return
+
+        locations = drag.locations()
+        if hasattr(self.data_model, 'move_nodes'):
+            self.data_model.move_nodes(locations)
+        else:
+            for j, location in locations.items():
+                self.data_model._nodes[j].location = location
+                if self.lazy:
+                    self.index.move(j, node_rect(self.data_model._nodes[j]))
+        self.links.endDrag()
+        self.last_drag = drag
+
+    def showRegion(self, rect):
+        """
+        Make sure all nodes overlapping `rect` (in scene coordinates) exist.
+        """
+        self._visible = rect
+        now = time.monotonic()
+        nodes = self.data_model._nodes
+
+        shown = self.index.query((rect.left(), rect.top(), rect.right(), rect.bottom()))
+        for i in shown:
+            if i not in self.nodes:
+                self._materialise(i, nodes[i])
+            self._seen[i] = now
+        self.links.reveal(shown)
+
+    def _dropOffscreen(self):
+        if self._visible is None:
+            return
+
+        self.showRegion(self._visible)
+        now = time.monotonic()
+        for i, t in list(self._seen.items()):
+            if now - t > self.linger and i not in self.editors:
+                self._drop(i)
+
+    def edit(self, i):
+        """
+        Replace the `NodeItem` for node `i` by a `NodeBox`, so that the
+        user can work with its noodlets.
+        """
+        if i in self.editors:
+            return
+
+        item = self.nodes[i]
+        item.hide()
+        self.editors[i] = NodeBox(item.data, self, i)
+        self.links.nodeMoved(i)
+
+    def stopEditing(self):
+        """
+        Swap all `NodeBox` editors back to their `NodeItem`.
+        """
+        # the boxes have written their moves to the model already
+        self._syncing = True
+        try:
+            for i, box in self.editors.items():
+                box.detach()
+                item = self.nodes[i]
+                item.setPos(*box.location())
+                item.invalidate()
+                item.show()
+        finally:
+            self._syncing = False
+        edited, self.editors = self.editors, {}
+        for i in edited:
+            self.links.nodeMoved(i)
+
+    def mouseMoveEvent(self, event):
+        self._mouse = event.scenePos()
+        super(NodeScene, self).mouseMoveEvent(event)
+
+    def mousePressEvent(self, event):
+        if self.editors and self.itemAt(event.scenePos()) is None:
+            self.stopEditing()
+        super(NodeScene, self).mousePressEvent(event)
+
+    def compact(self):
+        """
+        Compact the node indices of the data model, and update the items in
+        the scene in place.
+        """
+        self.remap(self.data_model.compact())
+
+    def remap(self, table):
+        """
+        Apply a table of old to new node indices, as returned by
+        `DataModel.compact`, to everything in the scene.
+        """
+        for item in list(self.nodes.values()) + list(self.editors.values()):
+            item.remap(table)
+        self.nodes = dict((table[i], item) for i, item in self.nodes.items())
+        self.editors = dict((table[i], box) for i, box in self.editors.items())
+        self.selected = set(table[i] for i in self.selected)
+        self.heat = dict((table[i], h) for i, h in self.heat.items() if i in table)
+        if self.lazy:
+            self.index = self.data_model._spatial
+            self._seen = dict((table[i], t) for i, t in self._seen.items())
+        self.links.remap(table)
+
+    def selectRegion(self, rect):
+        """
+        Select all nodes overlapping `rect`, including the ones that have
+        not been created yet in a lazy scene.
+
+        Returns: set of node indices
+        """
+        selected = self.data_model.nodes_in(
+            (rect.left(), rect.top(), rect.right(), rect.bottom()))
+        for i, item in self.nodes.items():
+            if isinstance(item, NodeItem):
+                item.setSelected(i in selected)
+        self.selected = selected
+        return selected
+
+    def showStreamStats(self, stats):
+        """
+        Show the rate of every node and the fill of its input queues in a
+        streaming run as tool tips, to find the bottleneck; `stats` is
+        what `engine.stream.StreamRunner.stats` returns, and this can be
+        called from a timer while the run goes on.
+        """
+        fill = {}
+        for (a, b), link in stats['links'].items():
+            depth, capacity = link['depth'], link['capacity']
+            if depth * fill.get(b[0], (0, 1))[1] >= fill.get(b[0], (0, 1))[0] * capacity:
+                fill[b[0]] = (depth, capacity)
+
+        for i, s in stats['nodes'].items():
+            tip = "{0:.0f} items/s, {1} in, {2} out".format(
+                s['rate'], s['items_in'], s['items_out'])
+            if i in fill:
+                tip += ", fullest input queue {0}/{1}".format(*fill[i])
+            for item in (self.nodes.get(i), self.editors.get(i)):
+                if item is not None:
+                    item.setToolTip(tip)
+
+    def showNodeStatus(self, i, state, worker):
+        """
+        Show where node `i` runs in a distributed run: pass
+        `statusChanged.emit` as `on_status` to the `Coordinator`.
+        """
+        tip = {'running': "running on {0}", 'done': "done on {0}",
+               'retry': "lost with {0}, queued again"}[state].format(worker)
+        for item in (self.nodes.get(i), self.editors.get(i)):
+            if item is not None:
+                item.setToolTip(tip)
+
+    def showTrace(self, trace):
+        """
+        Overlay a profiled run, an `engine.trace.Trace`: every node is
+        tinted by its run time relative to the slowest node, and the links
+        are drawn by the bytes they carried. Tool tips give the numbers.
+        """
+        self.clearTrace()
+        self.heat = trace.heat()
+        for i, span in trace.nodes.items():
+            tip = "{0:.1f} ms, waited {1:.1f} ms for a worker".format(
+                span.duration * 1e3, span.wait * 1e3)
+            for item in (self.nodes.get(i), self.editors.get(i)):
+                if item is not None:
+                    item.setHeat(self.heat[i])
+                    item.setToolTip(tip)
+        self.links.showTraffic(trace.links)
+
+    def clearTrace(self):
+        for i in self.heat:
+            for item in (self.nodes.get(i), self.editors.get(i)):
+                if item is not None:
+                    item.setHeat(None)
+                    item.setToolTip("")
+        self.heat = {}
+        self.links.clearTraffic()
+
+    def collapseSelection(self, name=None):
+        """
+        Replace the selected nodes by a single composite node, see
+        `data.composite`. The scene follows through `modelChanged`.
+
+        Returns: index of the composite node, or None
+        """
+        if not self.selected:
+            return None
+        c = collapse(self.data_model, self.selected, name)
+        self.selected = set([c])
+        return c
+
+    def expandSelection(self):
+        """
+        Put the nodes of the selected composite nodes back in the scene.
+
+        Returns: set of node indices that came out of the composites
+        """
+        nodes = self.data_model._nodes
+        expanded = set()
+        for i in sorted(self.selected):
+            if isinstance(nodes.get(i), CompositeNode):
+                expanded.update(expand(self.data_model, i).values())
+        self.selected = expanded
+        return expanded
+
+    def noodletAt(self, pos, radius=20):
+        """
+        Find the noodlet closest to `pos`, to drop a link on. Only the nodes
+        near `pos` are looked at, found through the spatial index.
+
+        Returns: `Noodlet` item or None
+        """
+        x, y = pos.x(), pos.y()
+        best, best_d = None, radius
+        for i in self.data_model.nodes_in((x - radius, y - radius, x + radius, y + radius)):
+            box = self.editors.get(i, self.nodes.get(i))
+            for n in getattr(box, 'noodlets', ()):
+                d = QtCore.QLineF(n.pos(), pos).length()
+                if d <= best_d:
+                    best, best_d = n, d
+        return best
                 
+    def addNoodlets(self, noodlets):
+        """
+        Register the `Noodlet` items of a `NodeBox` by direction and type,
+        so that the ones a new link can go to are found without looking
+        at every noodlet in the scene.
+        """
+        for n in noodlets:
+            self.ports.setdefault((n.direction, INDEX.id(n.dtype)), set()).add(n)
+
+    def removeNoodlets(self, noodlets):
+        for n in noodlets:
+            key = (n.direction, INDEX.id(n.dtype))
+            self.ports.get(key, set()).discard(n)
+            if key in self.ports and not self.ports[key]:
+                del self.ports[key]
+        self._lit = [n for n in self._lit if n not in noodlets]
+
+    def highlight(self, noodlet):
+        """
+        Highlight every noodlet that `noodlet`, an `(i, name)` pair, can be
+        linked to, using the precomputed `data.types.INDEX`.
+        """
+        model = self.data_model
+        direction = 'out' if noodlet in model._links else 'in'
+        dtype = port_type(model._nodes[noodlet[0]], noodlet[1], direction)
+        if direction == 'out':
+            other, ids = 'in', INDEX.targets(dtype)
+        else:
+            other, ids = 'out', INDEX.sources(dtype)
+
+        self.unhighlight()
+        for (d, k), items in self.ports.items():
+            if d == other and k in ids:
+                for n in items:
+                    if n.noodlet[0] != noodlet[0]:
+                        n.setHighlight(True)
+                        self._lit.append(n)
+
+    def unhighlight(self):
+        for n in self._lit:
+            n.setHighlight(False)
+        self._lit = []
+
     def noodletPressed(self, i, s):
-        pass
-        #print("{0}-{1} pressed".format(i, s))
-        
+        self._pressed = (i, s)
+        self.highlight((i, s))
+
     def noodletReleased(self, i, s):
-        pass
-        #print("{0}-{1} released".format(i, s))
+        """
+        A link is dragged from the pressed noodlet to the one under the
+        mouse. The scene picks up the new link from the data model.
+        """
+        source, self._pressed = self._pressed, None
+        self.unhighlight()
+        target = self.noodletAt(self._mouse) if self._mouse is not None else None
+        if source is None or target is None:
+            return
+
+        model = self.data_model
+        a, b = source, target.noodlet
+        if a in model._inverse_links:
+            a, b = b, a
+        if a[0] != b[0] and a in model._links and b in model._inverse_links:
+            try:
+                model.add_link(a, b)
+            except TypeError:
+                # dropped on a noodlet that wasn't highlighted
+                pass
 
 class NoodlesWindow(QtGui.QMainWindow):    
-    def __init__(self, data_model):
+    def __init__(self, data_model, mode='widget', lazy=False):
         super(NoodlesWindow, self).__init__()
         
         self.data_model = data_model
+        self.mode = mode
+        self.lazy = lazy
         self.initUI()
         
     def initUI(self):
-        style = str(open("static/qt-style.css", "r").read())
-        self.nodeScene = NodeScene(self.data_model)
+        self.nodeScene = NodeScene(self.data_model, self.mode, self.lazy)
         self.nodeView = NodeView(self.nodeScene)
 
-        self.nodeView.setStyleSheet(style)
         
         #self.sourceView = SourceView()
         
@@ -74,6 +608,35 @@ class NoodlesWindow(QtGui.QMainWindow):
         menubar = self.menuBar()
         fileMenu = menubar.addMenu('&File')
         fileMenu.addAction(exitAction)
+
+        collapseAction = QtGui.QAction('&Collapse selection', self)
+        collapseAction.setShortcut('Ctrl+G')
+        collapseAction.setStatusTip('Replace the selected nodes by one composite node')
+        collapseAction.triggered.connect(self.collapseSelection)
+        expandAction = QtGui.QAction('&Expand selection', self)
+        expandAction.setShortcut('Ctrl+Shift+G')
+        expandAction.setStatusTip('Put the nodes of the selected composite nodes back')
+        expandAction.triggered.connect(self.expandSelection)
+
+        editMenu = menubar.addMenu('&Edit')
+        editMenu.addAction(collapseAction)
+        editMenu.addAction(expandAction)
+
+        profileAction = QtGui.QAction('&Profile', self)
+        profileAction.setShortcut('Ctrl+R')
+        profileAction.setStatusTip('Run the workflow and show where the time goes')
+        profileAction.triggered.connect(self.profile)
+        exportTraceAction = QtGui.QAction('E&xport trace...', self)
+        exportTraceAction.setStatusTip('Save the last profile as a Chrome trace')
+        exportTraceAction.triggered.connect(self.exportTrace)
+        clearTraceAction = QtGui.QAction('&Clear profile', self)
+        clearTraceAction.triggered.connect(self.nodeScene.clearTrace)
+        self.trace = None
+
+        runMenu = menubar.addMenu('&Run')
+        runMenu.addAction(profileAction)
+        runMenu.addAction(exportTraceAction)
+        runMenu.addAction(clearTraceAction)
         
         self.nodeRepository = QtGui.QToolBox()
         self.flowNodeList = QtGui.QListWidget()
@@ -82,12 +645,70 @@ class NoodlesWindow(QtGui.QMainWindow):
         self.nodeRepository.addItem(self.flowNodeList, "flow control")
         self.nodeRepository.addItem(self.libraryNodeList, "library nodes")
         self.nodeRepository.addItem(self.compositeNodeList, "composite nodes")
+        self.compositeNodeList.itemDoubleClicked.connect(self.expandComposite)
+        for i, node in self.data_model.all_nodes():
+            if isinstance(node, CompositeNode):
+                self.compositeNodeList.addItem(node.name)
         dockWidget = QtGui.QDockWidget("Noodles node repository")
         dockWidget.setWidget(self.nodeRepository)
         self.addDockWidget(Qt.RightDockWidgetArea, dockWidget)
 
         self.show()
 
+    def collapseSelection(self):
+        try:
+            c = self.nodeScene.collapseSelection()
+        except ValueError as e:
+            self.statusBar().showMessage(str(e))
+            return
+        if c is not None:
+            self.compositeNodeList.addItem(self.data_model._nodes[c].name)
+
+    def expandSelection(self):
+        names = [self.data_model._nodes[i].name for i in self.nodeScene.selected
+                 if isinstance(self.data_model._nodes.get(i), CompositeNode)]
+        self.nodeScene.expandSelection()
+        self._forgetComposites(names)
+
+    def expandComposite(self, item):
+        """
+        Expand the composite node picked from the node repository.
+        """
+        i = self.data_model.find_node(item.text())
+        if i is not None:
+            self.nodeScene.selected = set([i])
+            self.nodeScene.expandSelection()
+        self._forgetComposites([item.text()])
+
+    def profile(self):
+        from engine.executor import Executor
+        from engine.trace import Trace
+
+        trace = Trace()
+        try:
+            result = Executor(self.data_model, trace=trace).run()
+        except Exception as e:
+            self.statusBar().showMessage(str(e))
+            return
+        self.trace = trace
+        self.nodeScene.showTrace(trace)
+        self.statusBar().showMessage("Ran {0} nodes in {1:.3f}s".format(
+            len(result.computed), result.elapsed))
+
+    def exportTrace(self):
+        if self.trace is None:
+            self.statusBar().showMessage('Profile the workflow first')
+            return
+        path, _ = QtGui.QFileDialog.getSaveFileName(
+            self, 'Export trace', 'trace.json', 'Chrome trace (*.json)')
+        if path:
+            self.trace.save(path)
+
+    def _forgetComposites(self, names):
+        for name in names:
+            for item in self.compositeNodeList.findItems(name, Qt.MatchExactly):
+                self.compositeNodeList.takeItem(self.compositeNodeList.row(item))
+
     def closeEvent(self, event):
         pass
 #        reply = QtGui.QMessageBox.question(self, 'Message',
@@ -102,14 +723,14 @@ class NoodlesWindow(QtGui.QMainWindow):
         #self.sourceView.backend.stop()
                 
 
-def main(model):
+def main(model, mode='widget', lazy=False):
     app = QtGui.QApplication(sys.argv)
     
 #    Qode.backend.CodeCompletionWorker.providers.append(
 #        backend.DocumentWordsProvider())
 #    Qode.backend.serve_forever()
     
-    win = NoodlesWindow(model)
+    win = NoodlesWindow(model, mode, lazy)
     sys.exit(app.exec_())
 
 
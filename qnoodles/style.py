@@ -0,0 +1,90 @@
+"""
+Application-wide style and resources. The Qt stylesheet is read from disk
+once and set on the application, instead of on every widget; Qt then only
+has to parse it once. Text metrics of noodlet labels are cached per
+(name, dtype, direction), so that laying out a node doesn't need to measure
+the same label over and over.
+"""
+
+import os
+from PySide import QtGui, QtCore
+
+from data.types import type_name
+
+STATIC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static')
+STYLE_PATH = os.path.join(STATIC, 'qt-style.css')
+
+_stylesheets = {}
+_metrics = {}
+
+
+def noodlet_label(noodlet):
+    """
+    The text shown for a noodlet.
+    """
+    return "{name} [{dtype}]".format(name=noodlet.name, dtype=type_name(noodlet.dtype))
+
+
+def stylesheet(path=STYLE_PATH):
+    """
+    Contents of a stylesheet, read once per path.
+    """
+    try:
+        return _stylesheets[path]
+    except KeyError:
+        with open(path, 'r') as f:
+            style = _stylesheets[path] = str(f.read())
+        return style
+
+
+def apply_style(app=None, path=STYLE_PATH):
+    """
+    Set the stylesheet on the application, unless it is already there.
+    """
+    app = app or QtGui.QApplication.instance()
+    style = stylesheet(path)
+    if app.styleSheet() != style:
+        app.setStyleSheet(style)
+
+
+def label_metrics(noodlet, font=None):
+    """
+    Size of the label for a noodlet, as `(width, height)` in pixels.
+    """
+    key = (noodlet.name, noodlet.dtype, noodlet.direction,
+           font.key() if font is not None else None)
+    try:
+        return _metrics[key]
+    except KeyError:
+        fm = QtGui.QFontMetrics(font or QtGui.QApplication.font())
+        size = _metrics[key] = (fm.width(noodlet_label(noodlet)), fm.height())
+        return size
+
+
+def heat_color(heat):
+    """
+    Fill of a node in the profiling overlay, from gray for a node that
+    took no time (or wasn't profiled, `None`) to red for the slowest node.
+    """
+    if heat is None:
+        return QtGui.QColor(QtCore.Qt.gray)
+    h = min(max(heat, 0.0), 1.0)
+    return QtGui.QColor(int(160 + 80 * h), int(160 - 110 * h), int(164 - 124 * h))
+
+
+def traffic_pen(fraction):
+    """
+    Pen for a link in the profiling overlay, wider and redder the larger
+    `fraction` of the most bytes any link carried.
+    """
+    return QtGui.QPen(QtGui.QBrush(QtGui.QColor(int(120 + 100 * fraction), 40, 40)),
+                      1.5 + 6 * fraction)
+
+
+def clear_cache():
+    """
+    Forget the cached stylesheets and metrics, for instance after the
+    application font has changed.
+    """
+    _stylesheets.clear()
+    _metrics.clear()
@@ -6,6 +6,12 @@ class AdderNode(NodeTemplate):
     name = "Adder"
     input_vars = ["value-1", "value-2"]
     output_vars = ["sum"]
+    input_types = {"value-1": int, "value-2": int}
+    output_types = {"sum": int}
+
+    @staticmethod
+    def compute(inputs):
+        return {"sum": inputs["value-1"] + inputs["value-2"]}
 
     @staticmethod
     def new():
@@ -19,8 +25,9 @@ coordinates = [
 for j in range(5):
     n = AdderNode.new()
     n.location = coordinates[j]
+    n.values = {"value-1": j, "value-2": 1}
     i = test_model.add_node(n)
-    n.name = "Adder {0}".format(i)
+    test_model.rename_node(i, "Adder {0}".format(i))
     
 test_model.add_link((0, "sum"), (2, "value-1"))
 test_model.add_link((1, "sum"), (2, "value-2"))
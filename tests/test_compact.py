@@ -0,0 +1,17 @@
+from data.compact import CompactDataModel
+from testing.adder import AdderNode
+
+
+def test_deleting_a_missing_node_is_ignored(caplog):
+    model = CompactDataModel()
+    node = AdderNode.new()
+    i = model.add_node(node)
+
+    model.delete_node(AdderNode.new())
+    model.delete_node("no such node")
+    model.delete_node(i + 1)
+    assert len(caplog.records) == 3
+    assert list(model._nodes) == [i]
+
+    model.delete_node(node.name)
+    assert not model._nodes
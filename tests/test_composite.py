@@ -0,0 +1,149 @@
+import os
+
+import pytest
+
+from data.model import NodeTemplate, SimpleNode, DataModel
+from data.composite import collapse, expand
+from data.history import History
+from data import storage
+from engine.executor import Executor
+from engine.compiler import compile_model
+
+
+class Source(NodeTemplate):
+    name = "Source"
+    input_vars = ["x"]
+    output_vars = ["x"]
+
+    @staticmethod
+    def compute(inputs):
+        return {"x": inputs["x"]}
+
+
+class Collect(NodeTemplate):
+    name = "Collect"
+    input_vars = ["items"]
+    output_vars = ["items"]
+
+    @staticmethod
+    def compute(inputs):
+        items = inputs["items"]
+        return {"items": items if isinstance(items, list) else [items]}
+
+
+def fan_in(*names):
+    """
+    A `Source` per name, all linked to the input of one `Collect`, and
+    a last `Source` that passes the list on.
+    """
+    nodes = []
+    for k, name in enumerate(names):
+        node = SimpleNode(Source)
+        node.location = [0, k * 100]
+        node.values = {"x": name}
+        nodes.append(node)
+    collect = SimpleNode(Collect)
+    collect.location = [200, 0]
+    sink = SimpleNode(Source)
+    sink.location = [400, 0]
+    nodes += [collect, sink]
+
+    n = len(names)
+    model = DataModel()
+    model.extend(nodes, [((k, "x"), (n, "items")) for k in range(n)]
+                 + [((n, "items"), (n + 1, "x"))])
+    return model
+
+
+def collected(model):
+    (sink,) = [i for i, node in model.all_nodes()
+               if getattr(node, 'template', None) is Source and not model._links[(i, "x")]]
+    return Executor(model).run().values[(sink, "x")]
+
+
+@pytest.mark.parametrize("part", [[0], [1], [0, 3], [1, 3], [0, 1, 3], [1, 2, 3], [0, 1, 2, 3]])
+def test_collapse_and_expand_keep_the_order_of_links(part):
+    model = fan_in("a", "b", "c")
+    c = collapse(model, part)
+    assert collected(model) == ["a", "b", "c"]
+    expand(model, c)
+    assert collected(model) == ["a", "b", "c"]
+
+
+def test_undo_collapse_keeps_the_order_of_links():
+    model = fan_in("a", "b")
+    history = History(model)
+    with history.group():
+        c = collapse(model, [0])
+    with history.group():
+        expand(model, c)
+    assert collected(model) == ["a", "b"]
+    history.undo()
+    assert collected(model) == ["a", "b"]
+    history.undo()
+    assert collected(model) == ["a", "b"]
+    assert not model._fan_in
+
+
+def test_compaction_keeps_the_order_of_links():
+    model = fan_in("a", "b")
+    expand(model, collapse(model, [0]))
+    model.compact()
+    assert collected(model) == ["a", "b"]
+
+
+def test_order_of_links_is_saved(tmp_path):
+    model = fan_in("a", "b")
+    expand(model, collapse(model, [0]))
+    path = os.path.join(str(tmp_path), "fan-in.noodles")
+    storage.save(model, path)
+    loaded = storage.load(path)
+    assert loaded._fan_in == model._fan_in
+    assert storage.from_dict(storage.to_dict(model))._fan_in == model._fan_in
+
+
+@pytest.mark.parametrize("ext", [".noodles", ".yaml"])
+def test_saving_a_composite_asks_to_expand_it(tmp_path, ext):
+    model = fan_in("a", "b")
+    c = collapse(model, [0, 1, 2])
+    path = os.path.join(str(tmp_path), "composite" + ext)
+    save = storage.save_yaml if ext == ".yaml" else storage.save
+    with pytest.raises(ValueError, match="expand"):
+        save(model, path)
+    assert not os.path.exists(path)
+    expand(model, c)
+    save(model, path)
+
+
+def test_set_order_checks_the_sources():
+    model = fan_in("a", "b")
+    model.set_order((2, "items"), [(1, "x"), (0, "x")])
+    assert model.sources((2, "items")) == [(1, "x"), (0, "x")]
+    with pytest.raises(ValueError):
+        model.set_order((2, "items"), [(1, "x")])
+    model.delete_link((1, "x"), (2, "items"))
+    assert not model._fan_in
+
+
+def test_compiled_workflow_follows_set_order():
+    model = fan_in("a", "b")
+    assert compile_model(model)()[(3, "x")] == ["a", "b"]
+    model.set_order((2, "items"), [(1, "x"), (0, "x")])
+    assert compile_model(model)()[(3, "x")] == ["b", "a"]
+    assert collected(model) == ["b", "a"]
+
+
+
+def test_collapse_refuses_a_part_that_a_path_leaves_and_comes_back_to():
+    nodes = [SimpleNode(Source) for _ in range(4)]
+    nodes[0].values = {"x": "a"}
+    model = DataModel()
+    # 0 -> 1 -> 2 -> 3 and 0 -> 2: the part [0, 2] is left through 1
+    model.extend(nodes, [((0, "x"), (1, "x")), ((1, "x"), (2, "x")),
+                         ((0, "x"), (2, "x")), ((2, "x"), (3, "x"))])
+    version = model._version
+    with pytest.raises(ValueError):
+        collapse(model, [0, 2])
+    assert model._version == version
+    assert sorted(model._nodes) == [0, 1, 2, 3]
+    collapse(model, [0, 1, 2])
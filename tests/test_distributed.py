@@ -0,0 +1,97 @@
+import time
+import threading
+
+import pytest
+
+import engine.distributed
+from engine.cli import main
+from engine.distributed import Coordinator, Worker
+from data.model import NodeTemplate, SimpleNode, DataModel
+from testing.adder import AdderNode
+
+
+class Flaky(Worker):
+    """
+    A worker that fails to fetch the first input it needs from another one.
+    """
+    failures = 1
+
+    def _get(self, key, address):
+        if tuple(address) != tuple(self.data.address) and self.failures:
+            self.failures -= 1
+            return False, None
+        return super(Flaky, self)._get(key, address)
+
+
+def start(coordinator, worker_type, name):
+    worker = worker_type(coordinator.address, coordinator.authkey, name)
+    threading.Thread(target=worker.serve, daemon=True).start()
+    coordinator.wait_for_workers(len(coordinator.workers) + 1)
+
+
+def test_failed_fetch_keeps_the_worker_holding_the_input():
+    nodes = [AdderNode.new(), AdderNode.new()]
+    nodes[0].values = {"value-1": 1, "value-2": 1}
+    nodes[1].values = {"value-2": 1}
+    model = DataModel()
+    model.extend(nodes, [((0, "sum"), (1, "value-1"))])
+
+    # round robin: node 0 goes to 'good', node 1 to 'flaky'
+    coordinator = Coordinator(locality=False)
+    try:
+        start(coordinator, Worker, "good")
+        start(coordinator, Flaky, "flaky")
+        result = coordinator.run(model)
+        assert result.values == {(1, "sum"): 3}
+        assert sorted(coordinator.workers) == ["flaky", "good"]
+        assert result.retries == {0: 1, 1: 1}
+    finally:
+        coordinator.close()
+
+
+def test_worker_command_passes_the_host_on(monkeypatch):
+    calls = []
+    monkeypatch.setattr(engine.distributed, 'main', calls.append)
+    main(["worker", "coordinator:7313", "--name", "w", "--host", "10.0.0.5"])
+    assert calls == [["coordinator:7313", "--name", "w", "--host", "10.0.0.5"]]
+
+
+class Fail(NodeTemplate):
+    name = "Fail"
+    input_vars = ["x"]
+    output_vars = ["y"]
+
+    @staticmethod
+    def compute(inputs):
+        raise ArithmeticError("fails on purpose")
+
+
+def test_failed_run_drops_the_outputs_held_by_workers():
+    nodes = [AdderNode.new(), SimpleNode(Fail)]
+    nodes[0].values = {"value-1": 1, "value-2": 1}
+    model = DataModel()
+    model.extend(nodes, [((0, "sum"), (1, "x"))])
+
+    coordinator = Coordinator()
+    worker = Worker(coordinator.address, coordinator.authkey, "only")
+    threading.Thread(target=worker.serve, daemon=True).start()
+    coordinator.wait_for_workers(1)
+    try:
+        with pytest.raises(ArithmeticError):
+            coordinator.run(model)
+        deadline = time.time() + 10
+        while worker.data.values and time.time() < deadline:
+            time.sleep(0.01)
+        assert not worker.data.values
+    finally:
+        coordinator.close()
+
+
+def test_workers_with_the_same_name_are_told_apart():
+    coordinator = Coordinator()
+    try:
+        start(coordinator, Worker, "w")
+        start(coordinator, Worker, "w")
+        assert sorted(coordinator.workers) == ["w", "w-2"]
+    finally:
+        coordinator.close()
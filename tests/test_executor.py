@@ -0,0 +1,79 @@
+from data.model import NodeTemplate, SimpleNode, DataModel
+from data.composite import collapse
+from engine.cache import ResultCache
+from engine.executor import Executor
+from testing.adder import AdderNode
+
+
+class MulNode(NodeTemplate):
+    name = "Adder"      # the same name as `AdderNode`, on purpose
+    input_vars = ["value-1", "value-2"]
+    output_vars = ["sum"]
+
+    @staticmethod
+    def compute(inputs):
+        return {"sum": inputs["value-1"] * inputs["value-2"]}
+
+
+def single(template, a, b):
+    node = SimpleNode(template)
+    node.values = {"value-1": a, "value-2": b}
+    model = DataModel()
+    model.add_node(node)
+    return model
+
+
+def chain(n):
+    model = DataModel()
+    nodes = []
+    for k in range(n):
+        node = AdderNode.new()
+        node.location = [k * 200, 0]
+        node.values = {"value-1": 1, "value-2": 1}
+        nodes.append(node)
+    model.extend(nodes, [((k, "sum"), (k + 1, "value-1")) for k in range(n - 1)])
+    return model
+
+
+def test_cache_keys_on_template_not_name():
+    cache = ResultCache()
+    assert Executor(single(AdderNode, 3, 3), cache=cache).run().values[(0, "sum")] == 6
+    assert Executor(single(MulNode, 3, 3), cache=cache).run().values[(0, "sum")] == 9
+
+
+def test_cache_tells_composites_apart():
+    cache = ResultCache()
+    results = []
+    for a in (1, 2):
+        model = chain(3)
+        for i in range(3):
+            model.set_value((i, "value-2"), a)
+        collapse(model, [0, 1])
+        results.append(Executor(model, cache=cache).run().values[(2, "sum")])
+    assert results == [4, 7]
+
+
+def test_executors_on_one_model_see_all_edits():
+    model = chain(2)
+    first, second = Executor(model), Executor(model)
+    assert first.run().values[(1, "sum")] == 3
+    assert second.run().values[(1, "sum")] == 3
+
+    model.set_value((0, "value-2"), 101)
+    assert first.run().values[(1, "sum")] == 103
+    assert second.run().values[(1, "sum")] == 103
+
+
+def test_rerun_recomputes_only_edited_nodes():
+    model = chain(4)
+    executor = Executor(model)
+    executor.run()
+    assert executor.run().computed == set()
+
+    model.move_node(0, [10, 10])
+    assert executor.run().computed == set()
+
+    model.set_value((2, "value-2"), 5)
+    result = executor.run()
+    assert result.computed == set([2, 3])
+    assert result.values[(3, "sum")] == 9
@@ -0,0 +1,46 @@
+from data.events import ChangeBus
+from data.history import History
+from data.model import DataModel
+from data.spatial import node_rect
+from testing.adder import AdderNode
+
+
+def adders(n):
+    model = DataModel()
+    for k in range(n):
+        node = AdderNode.new()
+        node.location = [k * 200, 0]
+        model.add_node(node)
+    return model
+
+
+def test_rename_can_be_undone():
+    model = adders(2)
+    history = History(model)
+    old = model._nodes[1].name
+    model.rename_node(1, "Sum")
+    assert model.find_node("Sum") == 1
+
+    history.undo()
+    assert model._nodes[1].name == old
+    assert model.find_node(old) == 1 and model.find_node("Sum") is None
+    history.redo()
+    assert model.find_node("Sum") == 1
+
+
+def test_rename_is_delivered_to_the_scene():
+    model = adders(2)
+    bus = ChangeBus(model)
+    model.rename_node(0, "Sum")
+    changes = bus.flush()
+    assert changes.nodes_renamed == set([0])
+    assert not changes.nodes_moved
+
+
+def test_undo_puts_back_a_missing_extent():
+    model = adders(1)
+    history = History(model)
+    model.move_node(0, [10, 10], [80, 40])
+    history.undo()
+    assert model._nodes[0].extent is None
+    assert model._spatial.rect(0) == node_rect(model._nodes[0])
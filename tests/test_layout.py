@@ -0,0 +1,40 @@
+from data.history import History
+from data.layout import layered_layout, relayout, estimate_extent
+from data.spatial import node_rect
+
+from .test_executor import chain
+
+
+def test_layout_sets_extents_through_the_model():
+    model = chain(3)
+    for i, node in model.all_nodes():
+        node.extent = None
+    history = History(model)
+
+    layered_layout(model)
+    for i, node in model.all_nodes():
+        assert node.extent == estimate_extent(node)
+        assert i in model.nodes_in(node_rect(node))
+
+    while history.undo():
+        pass
+    assert all(node.extent is None for _, node in model.all_nodes())
+
+
+def test_relayout_sets_extents_through_the_model():
+    model = chain(3)
+    model._nodes[1].extent = None
+    version = model._version
+    relayout(model, [1], radius=0)
+    node = model._nodes[1]
+    assert node.extent == estimate_extent(node)
+    assert model._version > version
+    assert 1 in model.nodes_in(node_rect(node))
+
+
+def test_query_beyond_the_occupied_cells():
+    model = chain(5)
+    everything = set(i for i, _ in model.all_nodes())
+    assert model.nodes_in((-1e7, -1e7, 1e7, 1e7)) == everything
+    assert model.nodes_in((-1e7, -1e7, 10, 10)) == set([0])
+    assert model.nodes_in((1e6, 1e6, 1e7, 1e7)) == set()
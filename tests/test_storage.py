@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from data import storage
+from engine.cli import main
+from engine.executor import Executor
+from testing.adder import test_model
+
+
+@pytest.mark.parametrize("name", ["adder.noodles", "adder.yaml"])
+def test_exported_workflow_runs(tmp_path, capsys, name):
+    path = os.path.join(str(tmp_path), name)
+    assert main(["export", "testing.adder:test_model", path]) == 0
+    assert main(["validate", path]) == 0
+    capsys.readouterr()
+
+    assert main(["run", "--all", "testing.adder:test_model"]) == 0
+    expected = capsys.readouterr().out
+    assert main(["run", "--all", path]) == 0
+    assert capsys.readouterr().out == expected
+
+
+@pytest.mark.parametrize("save, load", [(storage.save, storage.load),
+                                        (storage.save_yaml, storage.load_yaml)])
+def test_values_are_saved(tmp_path, save, load):
+    path = os.path.join(str(tmp_path), "adder")
+    save(test_model, path)
+    loaded = load(path)
+    for i, node in test_model.all_nodes():
+        assert loaded._nodes[i].values == node.values
+    assert Executor(loaded).run().values == Executor(test_model).run().values
+
+
+def test_mapped_model_finds_nodes_by_object_and_name(tmp_path):
+    path = os.path.join(str(tmp_path), "adder.noodles")
+    storage.save(test_model, path)
+
+    model = storage.load(path)
+    node = model._nodes[1]
+    assert model.index_of(node) == 1
+    assert model.find_node("Adder 3") == 3
+    assert model.find_node("no such node") is None
+
+    model.delete_node(node)
+    model.delete_nodes(["Adder 3", model._nodes[4]])
+    assert sorted(i for i, _ in model.all_nodes()) == [0, 2]
+    model.rename_node(2, "Sum")
+    assert model.find_node("Sum") == 2
+    assert model.find_node("Adder 2") is None
@@ -0,0 +1,64 @@
+import itertools
+
+from data.model import NodeTemplate, SimpleNode, DataModel
+from engine.stream import StreamRunner
+
+
+class Count(NodeTemplate):
+    name = "Count"
+    input_vars = ["start"]
+    output_vars = ["n"]
+
+    @staticmethod
+    def stream(items):
+        for item in items:
+            for n in itertools.count(item["start"]):
+                yield {"n": n}
+
+
+class Double(NodeTemplate):
+    name = "Double"
+    input_vars = ["n"]
+    output_vars = ["n"]
+
+    @staticmethod
+    def compute(inputs):
+        return {"n": 2 * inputs["n"]}
+
+
+class Take(NodeTemplate):
+    name = "Take"
+    input_vars = ["n"]
+    output_vars = ["n"]
+
+    @staticmethod
+    def stream(items):
+        for item in itertools.islice(items, 3):
+            yield item
+
+
+def pipeline(*templates):
+    nodes = [SimpleNode(t) for t in templates]
+    nodes[0].values = {"start": 0}
+    model = DataModel()
+    model.extend(nodes, [((k, "n"), (k + 1, "n")) for k in range(len(nodes) - 1)])
+    return model
+
+
+def test_endless_source_stops_when_the_consumer_is_done():
+    seen = []
+    runner = StreamRunner(pipeline(Count, Double, Take), capacity=4,
+                          on_output=lambda i, out: seen.append(out["n"]))
+    runner.start()
+    result = runner.join(timeout=10)
+    assert not any(t.is_alive() for t in runner._threads)
+    assert seen == [0, 2, 4]
+    assert result.nodes[0].finished is not None
+
+
+def test_stop_ends_an_endless_source():
+    runner = StreamRunner(pipeline(Count, Double), capacity=4)
+    runner.start()
+    runner.stop()
+    runner.join(timeout=10)
+    assert not any(t.is_alive() for t in runner._threads)
@@ -0,0 +1,78 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from data.model import NodeTemplate, SimpleNode, DataModel
+from engine.cache import ResultCache
+from engine.executor import Executor
+from engine.transport import Transport
+
+
+class Big(NodeTemplate):
+    name = "Big"
+    input_vars = ["delay"]
+    output_vars = ["data"]
+
+    @staticmethod
+    def compute(inputs):
+        time.sleep(inputs["delay"])
+        return {"data": np.ones(2**16)}
+
+
+class Total(NodeTemplate):
+    name = "Total"
+    input_vars = ["data"]
+    output_vars = ["total"]
+
+    @staticmethod
+    def compute(inputs):
+        return {"total": float(inputs["data"].sum())}
+
+
+class Fail(NodeTemplate):
+    name = "Fail"
+    input_vars = []
+    output_vars = ["x"]
+
+    @staticmethod
+    def compute(inputs):
+        raise RuntimeError("failed on purpose")
+
+
+def segments(directory):
+    return [name for name in os.listdir(directory) if name.startswith("noodles-")]
+
+
+def workflow(*nodes, links=()):
+    model = DataModel()
+    model.extend(nodes, links)
+    return model
+
+
+def big(delay):
+    node = SimpleNode(Big)
+    node.values = {"delay": delay}
+    return node
+
+
+def test_failed_run_frees_outputs_of_running_nodes(tmp_path):
+    directory = str(tmp_path)
+    model = workflow(SimpleNode(Fail), big(0.5), SimpleNode(Total),
+                     links=[((1, "data"), (2, "data"))])
+    with pytest.raises(RuntimeError):
+        Executor(model, pool='process', workers=2,
+                 transport=Transport(directory=directory)).run()
+    time.sleep(1)       # until `Big` would have finished
+    assert segments(directory) == []
+
+
+def test_consumers_of_shared_inputs_are_not_cached(tmp_path):
+    cache = ResultCache()
+    model = workflow(big(0), SimpleNode(Total), links=[((0, "data"), (1, "data"))])
+    result = Executor(model, pool='process', cache=cache,
+                      transport=Transport(directory=str(tmp_path))).run()
+    assert result.values[(1, "total")] == 2**16
+    assert len(cache) == 0
+    assert segments(str(tmp_path)) == []